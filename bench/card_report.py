@@ -0,0 +1,99 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Builds the grammar cards (see cards.py) into the cache main.py reads them
+# from, and reports the tokens every card saves over its docstring and what
+# that does to the end-to-end latency of the docstring tool mode, in which the
+# model reads them. The corpus is run with the docstrings and with the cards
+# against the mock Ollama server, whose --prefill makes every prompt token
+# that is not in the prefix cache cost time like it does on a real server.
+#
+#   python bench/card_report.py                   # cards of the default budget
+#   python bench/card_report.py --budget 100      # smaller cards, fewer hints
+#   python bench/card_report.py --mode replay     # latency from recorded answers
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import cards
+from mock_ollama import CassetteResponder, ScriptedResponder
+from run import configure, load_corpus, run_corpus, start_mocks, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the grammar cards and report the tokens and time they save.")
+    parser.add_argument("--budget", type=int, default=cards.DEFAULT_BUDGET, help="Tokens a card may take.")
+    parser.add_argument("--corpus", default=os.path.join(BENCH_DIR, "corpus.jsonl"),
+                        help="JSONL of requests with the commands they should send.")
+    parser.add_argument("--mode", choices=["scripted", "replay", "record"], default="scripted",
+                        help="Where the model's answers come from, like bench/run.py --mode.")
+    parser.add_argument("--cassette", default=os.path.join(BENCH_DIR, "cassette.json"),
+                        help="Recorded model answers for replay and record.")
+    parser.add_argument("--upstream", default=os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434"),
+                        help="Real Ollama server to record from.")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds of simulated latency per LLM call.")
+    parser.add_argument("--prefill", type=float, default=0.3,
+                        help="Seconds per 1000 prompt tokens that are not in the prefix cache.")
+    parser.add_argument("--limit", type=int, help="Only run the first N requests.")
+    parser.add_argument("--no-latency", action="store_true", help="Only build the cards and count their tokens.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)[:args.limit]
+    if args.mode == "scripted":
+        responder = ScriptedResponder(corpus)
+    else:
+        responder = CassetteResponder(args.cassette, args.upstream if args.mode == "record" else None)
+    sway, ollama = start_mocks(responder, delay=args.delay, prefill=args.prefill)
+    import main as swaytalk
+
+    path = cards.default_path()
+    swaytalk.card_budget = args.budget
+    swaytalk.tool_cards = cards.load_or_compile(swaytalk.full_tools, swaytalk.grammars, args.budget, path)
+    tools = cards.report(swaytalk.full_tools, swaytalk.tool_cards, args.budget)
+    report: Dict[str, Any] = {"budget": args.budget, "cache": path, "tools": tools,
+                              "docstring_tokens": sum(row["docstring_tokens"] for row in tools),
+                              "card_tokens": sum(row["card_tokens"] for row in tools)}
+
+    if not args.no_latency:
+        from tree import TreeMirror
+        from windows import WindowIndex
+
+        swaytalk.fast_path = None
+        swaytalk.tree_mirror = TreeMirror(swaytalk.sway)
+        swaytalk.tree_mirror.start()
+        swaytalk.window_index = WindowIndex(swaytalk.tree_mirror)
+        latency = {}
+        for verbosity in ("full", "card"):
+            configure(swaytalk, "docstring", verbosity=verbosity)
+            summary = summarize(run_corpus(swaytalk, corpus, sway, ollama))
+            latency[verbosity] = {key: summary[key] for key in ("accuracy", "mean_prompt_tokens", "p50_seconds",
+                                                                "p95_seconds")}
+        report["latency"] = latency
+    sway.stop()
+    ollama.shutdown()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"\nGrammar cards (budget {args.budget} tokens, cached in {path}):")
+    print(f"  {'tool':<20} {'docstring':>9} {'card':>6} {'saved':>6}")
+    for row in tools:
+        flag = "  over budget" if row["over_budget"] else ""
+        print(f"  {row['tool']:<20} {row['docstring_tokens']:>9} {row['card_tokens']:>6} {row['saved']:>6}{flag}")
+    saved = report["docstring_tokens"] - report["card_tokens"]
+    print(f"  {'total':<20} {report['docstring_tokens']:>9} {report['card_tokens']:>6} {saved:>6} "
+          f"({saved / max(report['docstring_tokens'], 1):.0%})")
+    if "latency" in report:
+        full, card = report["latency"]["full"], report["latency"]["card"]
+        print(f"\nDocstring tool mode, prefill {args.prefill}s per 1000 uncached tokens:")
+        for key in full:
+            print(f"  {key:<20} {full[key]:>10} -> {card[key]:<10} ({card[key] - full[key]:+.4g})")
+
+
+if __name__ == "__main__":
+    main()
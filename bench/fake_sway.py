@@ -0,0 +1,205 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# A stand-in for sway's IPC socket. It answers the messages i3ipc sends with a
+# fixed tree, and records every command it is asked to run instead of running it.
+import json
+import os
+import socket
+import struct
+import threading
+from typing import Any, Dict, List, Optional
+
+MAGIC = b"i3-ipc"
+HEADER = struct.Struct("=II")
+
+RUN_COMMAND, GET_WORKSPACES, SUBSCRIBE, GET_OUTPUTS, GET_TREE, GET_MARKS = 0, 1, 2, 3, 4, 5
+GET_VERSION, GET_BINDING_MODES, GET_CONFIG, SEND_TICK = 7, 8, 9, 10
+
+# First words of the commands sway accepts, anything else is rejected like sway would
+COMMANDS = {
+    "allow_tearing", "border", "exit", "exec", "floating", "focus", "fullscreen", "gaps", "inhibit_idle",
+    "kill", "layout", "mark", "max_render_time", "move", "nop", "opacity", "reload", "rename", "resize",
+    "scratchpad", "shortcuts_inhibitor", "split", "splith", "splitv", "splitt", "sticky", "swap",
+    "title_format", "unmark", "urgent", "workspace",
+}
+
+
+def window(con_id: int, name: str, app_id: Optional[str] = None, window_class: Optional[str] = None,
+           focused: bool = False) -> Dict[str, Any]:
+    con = {"id": con_id, "type": "con", "name": name, "app_id": app_id, "focused": focused, "pid": 1000 + con_id}
+    if window_class:
+        # Only XWayland windows have window properties
+        con["window_properties"] = {"class": window_class, "instance": window_class.lower()}
+    return con
+
+
+def workspace(con_id: int, name: str, nodes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"id": con_id, "type": "workspace", "name": name, "num": int(name) if name.isdigit() else -1,
+            "layout": "splith", "nodes": nodes}
+
+
+DEFAULT_TREE = {
+    "id": 1, "type": "root", "name": "root", "nodes": [
+        {"id": 2, "type": "output", "name": "eDP-1", "nodes": [
+            workspace(3, "1", [
+                window(10, "Mozilla Firefox", app_id="firefox", focused=True),
+                window(11, "~/src/swaytalk", app_id="foot"),
+            ]),
+            workspace(4, "2", [
+                window(12, "Spotify Premium", window_class="Spotify"),
+                window(13, "emacs@host", window_class="Emacs"),
+            ]),
+        ]},
+    ],
+}
+
+
+def _fill(node: Dict[str, Any]):
+    """Add the fields i3ipc expects on every node."""
+    rect = {"x": 0, "y": 0, "width": 1920, "height": 1080}
+    for key in ("rect", "window_rect", "deco_rect", "geometry"):
+        node.setdefault(key, dict(rect))
+    node.setdefault("layout", "splith")
+    node.setdefault("border", "pixel")
+    node.setdefault("current_border_width", 2)
+    node.setdefault("floating", "auto_off")
+    node.setdefault("fullscreen_mode", 0)
+    node.setdefault("sticky", False)
+    node.setdefault("focused", False)
+    node.setdefault("urgent", False)
+    node.setdefault("marks", [])
+    node.setdefault("nodes", [])
+    node.setdefault("floating_nodes", [])
+    node.setdefault("focus", [child["id"] for child in node["nodes"] + node["floating_nodes"]])
+    for child in node["nodes"] + node["floating_nodes"]:
+        _fill(child)
+
+
+class FakeSway:
+    """Serves the i3-ipc protocol on a Unix socket.
+
+    Commands are split on ';' like sway does and recorded in `commands`.
+    Commands whose first word is not a sway command fail, and the ones after
+    them are not run, which is also what sway does.
+    """
+
+    def __init__(self, path: str, tree: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.tree = json.loads(json.dumps(tree or DEFAULT_TREE))
+        _fill(self.tree)
+        self.commands: List[str] = []
+        self.messages = 0
+        self.lock = threading.Lock()
+        self._socket: Optional[socket.socket] = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.bind(self.path)
+        self._socket.listen()
+        threading.Thread(target=self._accept, name="fake-sway", daemon=True).start()
+
+    def stop(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def reset(self) -> List[str]:
+        """Forget the recorded commands, returning them."""
+        with self.lock:
+            commands, self.commands = self.commands, []
+        return commands
+
+    def _accept(self):
+        while self._socket is not None:
+            try:
+                conn, _ = self._socket.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: socket.socket):
+        with conn:
+            while True:
+                header = self._read(conn, len(MAGIC) + HEADER.size)
+                if header is None:
+                    return
+                length, message_type = HEADER.unpack(header[len(MAGIC):])
+                payload = self._read(conn, length) if length else b""
+                if payload is None:
+                    return
+                reply = self._reply(message_type, payload.decode("utf-8"))
+                data = json.dumps(reply).encode("utf-8")
+                conn.sendall(MAGIC + HEADER.pack(len(data), message_type) + data)
+
+    @staticmethod
+    def _read(conn: socket.socket, size: int) -> Optional[bytes]:
+        data = b""
+        while len(data) < size:
+            try:
+                chunk = conn.recv(size - len(data))
+            except OSError:
+                return None
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def _reply(self, message_type: int, payload: str) -> Any:
+        if message_type == RUN_COMMAND:
+            return self._run(payload)
+        if message_type == GET_TREE:
+            return self.tree
+        if message_type == GET_WORKSPACES:
+            return self._workspaces()
+        if message_type == GET_OUTPUTS:
+            return [{"name": output["name"], "active": True, "rect": output["rect"]}
+                    for output in self.tree["nodes"]]
+        if message_type == GET_VERSION:
+            return {"major": 1, "minor": 10, "patch": 0, "human_readable": "1.10-fake",
+                    "loaded_config_file_name": ""}
+        if message_type == GET_MARKS:
+            return []
+        if message_type == GET_BINDING_MODES:
+            return ["default"]
+        if message_type == GET_CONFIG:
+            return {"config": ""}
+        # SUBSCRIBE, SEND_TICK and anything else
+        return {"success": True}
+
+    def _run(self, payload: str) -> List[Dict[str, Any]]:
+        replies = []
+        with self.lock:
+            self.messages += 1
+            for command in payload.split(";"):
+                command = " ".join(command.split())
+                if not command:
+                    continue
+                self.commands.append(command)
+                keyword = command.split("]", 1)[-1].split() if command.startswith("[") else command.split()
+                if not keyword or keyword[0] not in COMMANDS:
+                    replies.append({"success": False, "parse_error": True,
+                                    "error": f"Unknown/invalid command '{keyword[0] if keyword else command}'"})
+                    # sway stops at the first invalid command
+                    break
+                replies.append({"success": True})
+        return replies
+
+    def _workspaces(self) -> List[Dict[str, Any]]:
+        workspaces = []
+        for output in self.tree["nodes"]:
+            for ws in output["nodes"]:
+                focused = any(leaf.get("focused") for leaf in _leaves(ws))
+                workspaces.append({"id": ws["id"], "name": ws["name"], "num": ws["num"], "output": output["name"],
+                                   "focused": focused, "visible": focused, "urgent": False, "rect": ws["rect"]})
+        return workspaces
+
+
+def _leaves(node: Dict[str, Any]) -> List[Dict[str, Any]]:
+    children = node["nodes"] + node["floating_nodes"]
+    if not children:
+        return [node]
+    return [leaf for child in children for leaf in _leaves(child)]
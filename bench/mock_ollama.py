@@ -0,0 +1,291 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# A stand-in for the Ollama HTTP API. It answers /api/chat either from a
+# script (the tool calls each benchmark request should lead to) or from a
+# cassette of responses recorded from a real Ollama server.
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+# Rough number of characters per token, used when there is no real token count
+CHARS_PER_TOKEN = 4
+
+# (assistant message, prompt tokens, completion tokens)
+Response = Tuple[Dict[str, Any], int, int]
+
+
+def estimate_tokens(value: Any) -> int:
+    return max(1, len(json.dumps(value)) // CHARS_PER_TOKEN)
+
+
+def tool_call(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    return {"function": {"name": name, "arguments": arguments}}
+
+
+class ScriptedResponder:
+    """Answers like a model that always picks the corpus' expected tool calls.
+
+    The request is recognized by its last user message. With the docstring
+    tools the docstrings of all the tools needed are asked for in one turn
+    and execute_code is called for all of them in the next; with typed tools
+    every tool is called with the typed arguments given in the corpus, all in
+    one turn. The model answers "Done." once all calls have been made.
+    Requests with a JSON schema format get all the commands as JSON at once.
+    Like a real model, it cannot call tools it was not offered, or write
+    commands the schema does not admit, so binding too few tools shows.
+    """
+
+    estimated = True
+
+    def __init__(self, corpus: List[Dict[str, Any]]):
+        self.script = {entry["input"]: entry.get("calls", []) for entry in corpus}
+
+    def _plan(self, calls: List[Dict[str, Any]], tools: List[str]) -> List[List[Dict[str, Any]]]:
+        """Return the tool calls of each turn."""
+        docstrings, executions, typed = [], [], []
+        for call in calls:
+            if call["tool"] not in tools:
+                continue
+            window = {"window": call["window"]} if call.get("window") else {}
+            if "execute_code" in tools:
+                docstrings.append(tool_call("get_docstring", {"tool_name": call["tool"]}))
+                executions.append(tool_call("execute_code", {"tool_name": call["tool"],
+                                                             "arguments": call.get("arguments", ""), **window}))
+            else:
+                typed.append(tool_call(call["tool"], {**call.get("typed", {}), **window}))
+        return [turn for turn in (docstrings, executions, typed) if turn]
+
+    @staticmethod
+    def _pattern(schema: Dict[str, Any]) -> str:
+        try:
+            return schema["properties"]["commands"]["items"]["properties"]["command"]["pattern"]
+        except KeyError:
+            return ".*"
+
+    def respond(self, request: Dict[str, Any]) -> Response:
+        messages = request.get("messages", [])
+        user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+        text = messages[user].get("content", "") if user >= 0 else ""
+        tools = [t["function"]["name"] for t in request.get("tools") or []]
+        calls = self.script.get(text)
+
+        if calls is None:
+            message = {"role": "assistant", "content": "I do not know how to do that."}
+        elif isinstance(request.get("format"), dict):
+            commands = []
+            for call in calls:
+                command = call.get("arguments", "")
+                if command.split(" ", 1)[0] != call["tool"]:
+                    command = f"{call['tool']} {command}".strip()
+                # The executor takes a bare keyword like "focus" once the window picks the criteria
+                bare = call.get("window") and command == call["tool"]
+                if not bare and not re.fullmatch(self._pattern(request["format"]), command):
+                    continue
+                commands.append({"command": command, **({"window": call["window"]} if call.get("window") else {})})
+            message = {"role": "assistant", "content": json.dumps({"commands": commands})}
+        else:
+            plan = self._plan(calls, tools)
+            answered = sum(1 for m in messages[user + 1:] if m.get("role") == "tool")
+            turn = 0
+            while turn < len(plan) and answered >= len(plan[turn]):
+                answered -= len(plan[turn])
+                turn += 1
+            if turn < len(plan):
+                message = {"role": "assistant", "content": "", "tool_calls": plan[turn]}
+            else:
+                message = {"role": "assistant", "content": "Done."}
+        return message, estimate_tokens([messages, request.get("tools")]), estimate_tokens(message)
+
+
+class CassetteResponder:
+    """Replays responses recorded from a real Ollama server.
+
+    Requests are keyed by the model, messages, tools and format. With an
+    upstream URL, requests missing from the cassette are forwarded to it and
+    the responses are added to the cassette.
+    """
+
+    estimated = False
+
+    def __init__(self, path: str, upstream: Optional[str] = None):
+        self.path = path
+        self.upstream = upstream
+        self.lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.responses: Dict[str, Dict[str, Any]] = json.load(f)
+        except FileNotFoundError:
+            self.responses = {}
+
+    @staticmethod
+    def key(request: Dict[str, Any]) -> str:
+        relevant = {k: request.get(k) for k in ("model", "messages", "tools", "format")}
+        return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def respond(self, request: Dict[str, Any]) -> Response:
+        key = self.key(request)
+        with self.lock:
+            recorded = self.responses.get(key)
+        if recorded is None:
+            if not self.upstream:
+                raise KeyError("request not in the cassette; record it with --mode record")
+            recorded = self._forward(request)
+            with self.lock:
+                self.responses[key] = recorded
+                self.save()
+        return recorded["message"], recorded.get("prompt_eval_count", 0), recorded.get("eval_count", 0)
+
+    def _forward(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        body = json.dumps({**request, "stream": False}).encode("utf-8")
+        http_request = urllib.request.Request(self.upstream.rstrip("/") + "/api/chat", data=body,
+                                              headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(http_request) as response:
+            data = json.load(response)
+        return {k: data.get(k) for k in ("message", "prompt_eval_count", "eval_count")}
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.responses, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def _pieces(message: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Split an assistant message into the chunks Ollama would stream it in."""
+    content = message.get("content") or ""
+    pieces = [{"role": "assistant", "content": content[i:i + CHARS_PER_TOKEN]}
+              for i in range(0, len(content), CHARS_PER_TOKEN)]
+    pieces.extend({"role": "assistant", "content": "", "tool_calls": [call]} for call in message.get("tool_calls") or [])
+    return pieces or [{"role": "assistant", "content": ""}]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "MockOllama"
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+    def _send_json(self, status: int, data: Any):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._send_json(200, {"version": "0.0.0-mock"})
+        elif self.path == "/api/tags":
+            self._send_json(200, {"models": []})
+        else:
+            self._send_json(200, {"status": "Ollama is running"})
+
+    def do_POST(self):
+        if self.path != "/api/chat":
+            self._send_json(404, {"error": f"{self.path} is not supported by the mock"})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        start = time.perf_counter()
+        try:
+            message, prompt_tokens, completion_tokens = self.server.responder.respond(request)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        load, evaluated = self.server.prepare(request, prompt_tokens)
+        prefill = self.server.prefill * evaluated / 1000
+        time.sleep(load + prefill + self.server.delay)
+        if (request.get("options") or {}).get("num_predict") == 1:
+            # Warm-ups and speculative prefills, which are not part of a request
+            self.server.prefills += 1
+        else:
+            self.server.record(prompt_tokens, completion_tokens)
+        pieces = _pieces(message)
+
+        created_at = datetime.now(timezone.utc).isoformat()
+        done = {
+            "model": request.get("model"), "created_at": created_at,
+            "message": {"role": "assistant", "content": ""},
+            "done": True, "done_reason": "stop",
+            "total_duration": int((time.perf_counter() - start) * 1e9),
+            "load_duration": int(load * 1e9), "prompt_eval_duration": int(prefill * 1e9),
+            "prompt_eval_count": evaluated, "eval_count": completion_tokens,
+        }
+        if not request.get("stream", True):
+            time.sleep(self.server.tail)
+            self._send_json(200, {**done, "message": message})
+            return
+        # Streamed like Ollama: the content a few characters at a time, each
+        # tool call in one piece, then a final chunk with the counts. The tail
+        # is spread over the pieces after the first, as if they were generated.
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            for i, piece in enumerate(pieces + [None]):
+                if i and self.server.tail:
+                    time.sleep(self.server.tail / len(pieces))
+                chunk = done if piece is None else {"model": request.get("model"), "created_at": created_at,
+                                                    "message": piece, "done": False}
+                self.wfile.write(json.dumps(chunk).encode("utf-8") + b"\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading, like it does once it has a complete tool call
+            pass
+
+
+class MockOllama(ThreadingHTTPServer):
+    """Ollama-compatible HTTP server on localhost; records the token counts of every chat call.
+
+    delay adds a fixed latency before every response, to simulate the time
+    to the first token, and tail the time it takes to generate the rest.
+    load is the time the first request for a model takes to load it, and
+    prefill the time per 1000 prompt tokens that are not in the prefix cache,
+    which holds the last prompt sent to each model.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, responder, port: int = 0, delay: float = 0.0, tail: float = 0.0,
+                 load: float = 0.0, prefill: float = 0.0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.responder = responder
+        self.delay = delay
+        self.tail = tail
+        self.load = load
+        self.prefill = prefill
+        self.calls: List[Tuple[int, int]] = []
+        self.prefills = 0
+        self.prompts: Dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def prepare(self, request: Dict[str, Any], prompt_tokens: int) -> Tuple[float, int]:
+        """Seconds to load the model and the number of prompt tokens to evaluate, updating the cache."""
+        # Ollama's templates put the tools before the messages
+        prompt = json.dumps([request.get("tools"), request.get("messages")])
+        with self.lock:
+            cached = self.prompts.get(request.get("model"))
+            self.prompts[request.get("model")] = prompt
+        if cached is None:
+            return self.load, prompt_tokens
+        common = next((i for i, (a, b) in enumerate(zip(cached, prompt)) if a != b), min(len(cached), len(prompt)))
+        return 0.0, max(1, prompt_tokens * (len(prompt) - common) // len(prompt))
+
+    def record(self, prompt_tokens: int, completion_tokens: int):
+        with self.lock:
+            self.calls.append((prompt_tokens, completion_tokens))
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="mock-ollama", daemon=True).start()
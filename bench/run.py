@@ -0,0 +1,266 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Offline benchmark. Runs the agent on every request of a corpus against a
+# mock Ollama server and a fake sway socket, and reports how often the
+# commands sway received are exactly the expected ones, how many LLM calls
+# and tokens each request took, and the wall clock time percentiles. With the
+# scripted model, requests marked "required" in the corpus have to match, or
+# the run fails.
+#
+#   python bench/run.py                      # scripted model, checks the plumbing
+#   python bench/run.py --mode record        # record a real model's answers once
+#   python bench/run.py --mode replay        # replay them offline
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fake_sway import FakeSway
+from mock_ollama import CassetteResponder, MockOllama, ScriptedResponder
+from tracing import percentile
+
+
+def load_corpus(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip() and not line.startswith("#")]
+
+
+def normalize_command(command: str) -> str:
+    return " ".join(command.split())
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    seconds = [r["seconds"] for r in results]
+    count = len(results) or 1
+    return {
+        "requests": len(results),
+        "accuracy": round(sum(r["match"] for r in results) / count, 4),
+        "errors": sum(1 for r in results if r.get("error")),
+        "mean_round_trips": round(sum(r["round_trips"] for r in results) / count, 3),
+        "mean_prompt_tokens": round(sum(r["prompt_tokens"] for r in results) / count, 1),
+        "mean_completion_tokens": round(sum(r["completion_tokens"] for r in results) / count, 1),
+        "p50_seconds": round(percentile(seconds, 50), 4),
+        "p95_seconds": round(percentile(seconds, 95), 4),
+        "max_seconds": round(max(seconds, default=0.0), 4),
+    }
+
+
+def compare(summary: Dict[str, Any], baseline: Dict[str, Any]) -> bool:
+    """Print the change from a saved run; returns False if accuracy dropped or requests got chattier."""
+    print("\nChange from baseline:")
+    for key, value in summary.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if isinstance(baseline.get(key), (int, float)):
+            print(f"  {key:<24} {baseline[key]:>10} -> {value:<10} ({value - baseline[key]:+.4g})")
+    return (summary["accuracy"] >= baseline.get("accuracy", 0)
+            and summary["mean_round_trips"] <= baseline.get("mean_round_trips", float("inf")))
+
+
+def start_mocks(responder, **options: float) -> Tuple[FakeSway, MockOllama]:
+    """Start a fake sway and a MockOllama with options, and point main.py at them."""
+    sway = FakeSway(os.path.join(tempfile.mkdtemp(prefix="swaytalk-bench-"), "sway.sock"))
+    sway.start()
+    ollama = MockOllama(responder, **options)
+    ollama.start()
+    # main.py connects to sway and Ollama on import, so this has to happen first
+    os.environ["SWAYSOCK"] = sway.path
+    os.environ["I3SOCK"] = sway.path
+    os.environ["OLLAMA_HOST"] = ollama.url
+    return sway, ollama
+
+
+def configure(swaytalk, tool_mode: str, executor: str = "lean", top_k: int = 0, verbosity: str = "card",
+              stream: bool = False):
+    """Set main.py up like its command line options would, dropping the agents built before."""
+    swaytalk.tool_mode, swaytalk.executor_kind, swaytalk.stream = tool_mode, executor, stream
+    swaytalk.set_verbosity(verbosity)
+    swaytalk.top_k = top_k
+    swaytalk.tool_index = swaytalk.load_tool_index() if 0 < top_k < len(swaytalk.full_tools) else None
+    swaytalk.agent_executor = swaytalk.build_agent_executor(*swaytalk.TOOL_MODES[tool_mode])
+
+
+def run_corpus(swaytalk, corpus: List[Dict[str, Any]], sway: FakeSway, ollama: MockOllama,
+               loop: Optional[asyncio.AbstractEventLoop] = None,
+               speculate: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Handle every request of the corpus, through the asyncio pipeline if loop is given."""
+    results = []
+    for entry in corpus:
+        sway.reset()
+        if speculate is not None:
+            words = entry["input"].split()
+            for i in range(1, len(words) + 1):
+                swaytalk.speculator.update(" ".join(words[:i]))
+                if loop:
+                    loop.run_until_complete(asyncio.sleep(speculate))
+                else:
+                    time.sleep(speculate)
+        first_call = len(ollama.calls)
+        error: Optional[str] = None
+        reply: Dict[str, Any] = {}
+        start = time.perf_counter()
+        try:
+            if loop:
+                reply = loop.run_until_complete(swaytalk.ahandle(entry["input"]))
+            else:
+                reply = swaytalk.handle(entry["input"])
+        except Exception as e:
+            error = str(e)
+        elapsed = time.perf_counter() - start
+        sent = [normalize_command(c) for c in sway.reset()]
+        expected = [normalize_command(c) for c in entry["expected"]]
+        calls = ollama.calls[first_call:]
+        results.append({
+            "input": entry["input"],
+            "expected": expected,
+            "sent": sent,
+            "match": sent == expected,
+            "required": bool(entry.get("required")),
+            "round_trips": len(calls),
+            "prompt_tokens": sum(c[0] for c in calls),
+            "completion_tokens": sum(c[1] for c in calls),
+            "seconds": round(elapsed, 4),
+            "path": reply.get("path"),
+            "abandoned": sum(1 for t in reply.get("timings", []) if t.get("abandoned")),
+            "error": error,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SwayTalk against a mock Ollama server and a fake sway.")
+    parser.add_argument("--corpus", default=os.path.join(BENCH_DIR, "corpus.jsonl"),
+                        help="JSONL of requests with the commands they should send.")
+    parser.add_argument("--mode", choices=["scripted", "replay", "record"], default="scripted",
+                        help="scripted: a model that always calls the corpus' tools; replay: answers recorded "
+                             "from a real model; record: forward to --upstream and add to the cassette.")
+    parser.add_argument("--cassette", default=os.path.join(BENCH_DIR, "cassette.json"),
+                        help="Recorded model answers for replay and record.")
+    parser.add_argument("--upstream", default=os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434"),
+                        help="Real Ollama server to record from.")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds of simulated latency per LLM call.")
+    parser.add_argument("--tail", type=float, default=0.0,
+                        help="Seconds each answer takes to stream after its first chunk.")
+    parser.add_argument("--load", type=float, default=0.0,
+                        help="Seconds the first call to each model takes to load it.")
+    parser.add_argument("--prefill", type=float, default=0.0,
+                        help="Seconds per 1000 prompt tokens that are not in the prefix cache.")
+    parser.add_argument("--warmup", action="store_true",
+                        help="Load the model and cache the prompt before the first request, like main.py does.")
+    parser.add_argument("--speculate", type=float, metavar="SECONDS",
+                        help="Type every request a word at a time, pausing SECONDS after each word, and speculate "
+                             "on it like main.py --speculate.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Run commands as soon as the model has written them, like main.py --stream.")
+    parser.add_argument("--tool-mode", choices=["docstring", "typed", "grammar"], default="docstring")
+    parser.add_argument("--executor", choices=["lean", "agent"], default="lean")
+    parser.add_argument("--top-k", type=int, default=0, help="Bind only the k most relevant tools (0 binds all).")
+    parser.add_argument("--verbosity", choices=["full", "card", "terse"], default="card",
+                        help="How the tools are documented to the model, like main.py --verbosity.")
+    parser.add_argument("--no-tree", action="store_true", help="Do not give the agent the window layout.")
+    parser.add_argument("--fastpath", action="store_true",
+                        help="Run requests through the fast path first, like main.py does.")
+    parser.add_argument("--cascade", metavar="MODELS", help="Smaller models to try before the agent, like main.py.")
+    parser.add_argument("--cascade-threshold", type=float, default=0.5)
+    parser.add_argument("--cascade-samples", type=int, default=2)
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Run the requests through the asyncio pipeline, like main.py --async.")
+    parser.add_argument("--limit", type=int, help="Only run the first N requests.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    parser.add_argument("--save", metavar="FILE", help="Save the results, to compare later runs with.")
+    parser.add_argument("--compare", metavar="FILE", help="Compare with saved results; exit 1 on a regression.")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)[:args.limit]
+    if args.mode == "scripted":
+        responder = ScriptedResponder(corpus)
+    else:
+        responder = CassetteResponder(args.cassette, args.upstream if args.mode == "record" else None)
+
+    sway, ollama = start_mocks(responder, delay=args.delay, tail=args.tail, load=args.load, prefill=args.prefill)
+    import main as swaytalk
+    from tree import TreeMirror
+    from windows import WindowIndex
+
+    configure(swaytalk, args.tool_mode, args.executor, args.top_k, args.verbosity, args.stream)
+    if args.cascade:
+        models = [name.strip() for name in args.cascade.split(",") if name.strip()]
+        swaytalk.cascade = swaytalk.build_cascade(models, args.cascade_threshold,
+                                                  swaytalk.tool_index or swaytalk.load_tool_index(),
+                                                  args.cascade_samples)
+    if not args.fastpath:
+        swaytalk.fast_path = None
+    loop = asyncio.new_event_loop()
+    if args.use_async:
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(swaytalk.astart(not args.no_tree))
+    elif not args.no_tree:
+        swaytalk.tree_mirror = TreeMirror(swaytalk.sway)
+        swaytalk.tree_mirror.start()
+        swaytalk.window_index = WindowIndex(swaytalk.tree_mirror)
+
+    if args.warmup:
+        swaytalk.warm_up()
+    if args.speculate is not None:
+        import speculation
+        swaytalk.speculator = speculation.Speculator(swaytalk.speculative_stages, swaytalk.speculative_prefill,
+                                                     loop if args.use_async else None)
+
+    results = run_corpus(swaytalk, corpus, sway, ollama, loop if args.use_async else None, args.speculate)
+
+    summary = summarize(results)
+    summary["tokens_estimated"] = responder.estimated
+    summary["paths"] = dict(Counter(r["path"] for r in results))
+    summary["abandoned_streams"] = sum(r["abandoned"] for r in results)
+    summary["model"] = swaytalk.model_metrics.summary()["models"]
+    summary["prefills"] = ollama.prefills
+    if swaytalk.speculator:
+        summary["speculation"] = swaytalk.speculator.summary()
+    if swaytalk.cascade:
+        summary["cascade"] = swaytalk.cascade.summary()
+    settings = {k: getattr(args, k) for k in ("mode", "tool_mode", "executor", "top_k", "verbosity", "no_tree",
+                                              "fastpath", "cascade", "cascade_threshold", "cascade_samples",
+                                              "use_async", "stream", "tail",
+                                              "load", "prefill", "warmup", "speculate")}
+    if args.json:
+        print(json.dumps({"settings": settings, "summary": summary, "results": results}, indent=2))
+    else:
+        print()
+        for r in results:
+            mark = "ok  " if r["match"] else "FAIL"
+            detail = "" if r["match"] else f"  sent {r['sent']} expected {r['expected']}"
+            if r["error"]:
+                detail += f"  error: {r['error']}"
+            print(f"{mark} {r['round_trips']} calls {r['seconds']:.3f}s  {r['input']}{detail}")
+        print(f"\nSettings: {settings}")
+        for key, value in summary.items():
+            print(f"  {key:<24} {value}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "summary": summary, "results": results}, f, indent=2)
+    sway.stop()
+    ollama.shutdown()
+    # The scripted model always calls the right tools, so these only fail if the plumbing is broken
+    failed = [r["input"] for r in results if r["required"] and not r["match"]]
+    if args.mode == "scripted" and failed:
+        print("Required requests failed: " + "; ".join(failed))
+        sys.exit(1)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["summary"]
+        if not compare(summary, baseline):
+            print("Regression against the baseline.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
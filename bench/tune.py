@@ -0,0 +1,158 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Tunes the tool set for a model. Every combination of tool mode, number of
+# bound tools (top-k) and description verbosity is run on the benchmark
+# corpus, like bench/run.py does, and the one with the best command accuracy
+# and then the lowest latency (or fewest prompt tokens) is written to the
+# model's tool profile, which main.py starts with.
+#
+#   python bench/tune.py --model qwen2.5:7b --mode record   # tune on the real model
+#   python bench/tune.py --model qwen2.5:7b --mode replay   # again, from its recorded answers
+#   python bench/tune.py --prefill 0.5                      # the scripted model, to check the sweep
+#
+# The scripted model is not the one being tuned for, so its profile is only
+# written with --output, never where main.py would load it from.
+import argparse
+import itertools
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import profiles
+from mock_ollama import CassetteResponder, ScriptedResponder
+from run import configure, load_corpus, run_corpus, start_mocks, summarize
+
+# The summary values kept for every candidate
+MEASURED = ("accuracy", "errors", "mean_round_trips", "mean_prompt_tokens", "p50_seconds", "p95_seconds")
+
+
+def candidates(tool_modes: List[str], top_ks: List[int], verbosities: List[str]) -> List[Dict[str, Any]]:
+    """Every combination of the settings; grammar mode documents the tools the same way at any verbosity."""
+    combinations = []
+    for tool_mode, top_k, verbosity in itertools.product(tool_modes, top_ks, verbosities):
+        if tool_mode == "grammar" and verbosity != verbosities[0]:
+            continue
+        combinations.append({"tool_mode": tool_mode, "top_k": top_k, "verbosity": verbosity})
+    return combinations
+
+
+def best(rows: List[Dict[str, Any]], tolerance: float, prefer: str) -> Dict[str, Any]:
+    """The fastest or cheapest row among those within tolerance of the best accuracy."""
+    top = max(row["accuracy"] for row in rows)
+    eligible = [row for row in rows if row["accuracy"] >= top - tolerance and not row["errors"]] or rows
+    if prefer == "tokens":
+        return min(eligible, key=lambda row: (row["mean_prompt_tokens"], row["p50_seconds"], -row["accuracy"]))
+    return min(eligible, key=lambda row: (row["p50_seconds"], row["mean_prompt_tokens"], -row["accuracy"]))
+
+
+def numbers(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def names(value: str) -> List[str]:
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the tool set that works best for a model and save it "
+                                                 "as the model's tool profile.")
+    parser.add_argument("--model", default="mistral-nemo", help="Ollama model to tune for.")
+    parser.add_argument("--corpus", default=os.path.join(BENCH_DIR, "corpus.jsonl"),
+                        help="JSONL of requests with the commands they should send.")
+    parser.add_argument("--mode", choices=["scripted", "replay", "record"], default="scripted",
+                        help="scripted: a stand-in model that calls the corpus' tools if they are offered; replay: "
+                             "answers recorded from the model; record: ask --upstream and add to the cassette.")
+    parser.add_argument("--cassette", default=os.path.join(BENCH_DIR, "cassette.json"),
+                        help="Recorded model answers for replay and record.")
+    parser.add_argument("--upstream", default=os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434"),
+                        help="Real Ollama server to record from.")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds of simulated latency per LLM call.")
+    parser.add_argument("--prefill", type=float, default=0.0,
+                        help="Seconds per 1000 prompt tokens that are not in the prefix cache, so that the "
+                             "scripted model is slower with more tools like a real one.")
+    parser.add_argument("--tool-modes", type=names, default=["docstring", "typed", "grammar"],
+                        help="Comma-separated tool modes to try.")
+    parser.add_argument("--top-k", type=numbers, default=[0, 3, 6, 10],
+                        help="Comma-separated numbers of tools to bind (0 binds all of them).")
+    parser.add_argument("--verbosity", type=names, default=["full", "card", "terse"],
+                        help="Comma-separated verbosities to try.")
+    parser.add_argument("--executor", choices=["lean", "agent"], default="lean")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="Accuracy a candidate may give up against the most accurate one to be picked for "
+                             "being faster.")
+    parser.add_argument("--prefer", choices=["latency", "tokens"], default="latency",
+                        help="Among the most accurate candidates, pick the fastest or the one with the fewest "
+                             "prompt tokens.")
+    parser.add_argument("--limit", type=int, help="Only run the first N requests.")
+    parser.add_argument("--output", help="Where to write the profile (default: where main.py looks for the model's; "
+                                         "with --mode scripted it is only written if this is given).")
+    parser.add_argument("--dry-run", action="store_true", help="Do not write the profile.")
+    parser.add_argument("--json", action="store_true", help="Print the candidates and the profile as JSON.")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)[:args.limit]
+    if args.mode == "scripted":
+        responder = ScriptedResponder(corpus)
+    else:
+        responder = CassetteResponder(args.cassette, args.upstream if args.mode == "record" else None)
+    sway, ollama = start_mocks(responder, delay=args.delay, prefill=args.prefill)
+    import main as swaytalk
+    from tree import TreeMirror
+    from windows import WindowIndex
+
+    for setting, allowed in (("tool_modes", swaytalk.TOOL_MODES), ("verbosity", swaytalk.VERBOSITIES)):
+        unknown = [value for value in getattr(args, setting) if value not in allowed]
+        if unknown:
+            parser.error(f"unknown {setting}: {', '.join(unknown)}")
+    swaytalk.model, swaytalk.llm = args.model, None
+    # Only requests that need the model say anything about the tools
+    swaytalk.fast_path = None
+    swaytalk.tree_mirror = TreeMirror(swaytalk.sway)
+    swaytalk.tree_mirror.start()
+    swaytalk.window_index = WindowIndex(swaytalk.tree_mirror)
+
+    rows = []
+    for settings in candidates(args.tool_modes, args.top_k, args.verbosity):
+        configure(swaytalk, settings["tool_mode"], args.executor, settings["top_k"], settings["verbosity"])
+        summary = summarize(run_corpus(swaytalk, corpus, sway, ollama))
+        row = {**settings, **{key: summary[key] for key in MEASURED}}
+        rows.append(row)
+        if not args.json:
+            print(f"{row['tool_mode']:<10} top_k={row['top_k']:<3} {row['verbosity']:<6} "
+                  f"accuracy={row['accuracy']:<7} prompt_tokens={row['mean_prompt_tokens']:<8} "
+                  f"p50={row['p50_seconds']:.3f}s p95={row['p95_seconds']:.3f}s", file=sys.stderr)
+    sway.stop()
+    ollama.shutdown()
+
+    chosen = best(rows, args.tolerance, args.prefer)
+    profile = {
+        "model": args.model,
+        "settings": {key: chosen[key] for key in profiles.SETTINGS},
+        "measured": {key: chosen[key] for key in MEASURED},
+        "mode": args.mode,
+        "corpus": os.path.abspath(args.corpus),
+        "requests": len(corpus),
+        "tuned_at": datetime.now(timezone.utc).isoformat(),
+        "candidates": rows,
+    }
+    path = args.output or profiles.default_path(args.model)
+    if args.json:
+        print(json.dumps(profile, indent=2))
+    else:
+        print(f"\nBest for {args.model}: " + ", ".join(f"{k}={v}" for k, v in profile["settings"].items()))
+        for key, value in profile["measured"].items():
+            print(f"  {key:<24} {value}")
+    if args.mode == "scripted" and not args.output:
+        print("Not writing the profile of the scripted model; pass --output to keep it.", file=sys.stderr)
+    elif not args.dry_run:
+        profiles.save(profile, path)
+        print(f"Wrote {path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Remembers which tool calls the agent ran for a request, so that the next
+# time the same request comes in it can be run without the LLM.
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastpath import FILLER_WORDS, NUMBER_WORDS, normalize as normalize_words, rewrite
+
+# (tool_name, arguments) or (tool_name, arguments, window)
+ToolCall = Tuple[str, ...]
+
+CACHE_VERSION = 3
+
+
+def default_path() -> str:
+    cache_dir = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(cache_dir, "swaytalk", "commands.json")
+
+
+def fingerprint(tools: Dict[str, Callable]) -> str:
+    """Hash the tool names and docstrings, so the cache is dropped when the tools change."""
+    digest = hashlib.sha256()
+    for name in sorted(tools):
+        digest.update(name.encode("utf-8"))
+        digest.update((tools[name].__doc__ or "").encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _is_name(word: str, first: bool) -> bool:
+    """Whether word is quoted or typed with capitals, other than a sentence's first letter.
+
+    Filler and number words are never names, however they were typed.
+    """
+    if word[0] in "\"'" and word[-1] == word[0] and len(word) > 1:
+        return True
+    if word.lower().rstrip(".,;:!?") in FILLER_WORDS | NUMBER_WORDS.keys():
+        return False
+    return any(c.isupper() for c in (word[1:] if first else word))
+
+
+def normalize(text: str) -> str:
+    """Reduce a request to a cache key.
+
+    Case, punctuation, filler words and number words are canonicalized as on
+    the fast path, except in what reads like a name: quoted text and words
+    typed with capitals keep their case, since the calls of "rename
+    workspace to Code" are no answer to "... to code".
+    """
+    words = re.findall(r"(?<!\S)\"[^\"]*\"(?!\S)|(?<!\S)'[^']*'(?!\S)|\S+", text.strip().rstrip(".!?"))
+    parts, plain = [], []
+    for i, word in enumerate(words):
+        if _is_name(word, i == 0):
+            if plain:
+                parts.append(rewrite(normalize_words(" ".join(plain))))
+                plain = []
+            parts.append(word if word[0] in "\"'" else word.rstrip(".,;:!?"))
+        else:
+            plain.append(word)
+    if plain:
+        parts.append(rewrite(normalize_words(" ".join(plain))))
+    return " ".join(part for part in parts if part)
+
+
+class CommandCache:
+    """LRU cache from normalized requests to the tool calls that handled them.
+
+    Speculation looks requests up from a worker thread, so entries are only
+    touched under a lock.
+    """
+
+    def __init__(self, path: Optional[str], fingerprint: str, max_entries: int = 256,
+                 ttl: float = 30 * 24 * 3600):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, Tuple[float, List[ToolCall]]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Load the cache from disk, discarding it if the tools have changed since."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != CACHE_VERSION or data.get("fingerprint") != self.fingerprint:
+            return
+        now = time.time()
+        for entry in data.get("entries", []):
+            if now - entry["time"] < self.ttl:
+                self.entries[entry["key"]] = (entry["time"], [tuple(call) for call in entry["calls"]])
+        self._evict()
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {
+            "version": CACHE_VERSION,
+            "fingerprint": self.fingerprint,
+            "entries": [
+                {"key": key, "time": stored, "calls": [list(call) for call in calls]}
+                for key, (stored, calls) in self.entries.items()
+            ],
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, text: str) -> Optional[List[ToolCall]]:
+        key = normalize(text)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            stored, calls = entry
+            if time.time() - stored >= self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return calls
+
+    def put(self, text: str, calls: List[ToolCall]):
+        key = normalize(text)
+        if not key or not calls:
+            return
+        with self.lock:
+            self.entries[key] = (time.time(), list(calls))
+            self.entries.move_to_end(key)
+            self._evict()
+            self.save()
+
+    def invalidate(self, text: str):
+        with self.lock:
+            if self.entries.pop(normalize(text), None) is not None:
+                self.save()
+
+    def _evict(self):
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
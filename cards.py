@@ -0,0 +1,240 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Grammar cards: the tool docstrings are excerpts of sway(5), often hundreds
+# of tokens long, and whatever get_docstring returns is read again by the
+# model on every later call of the request. A card says the same in a few
+# lines: the forms of the command (forms that only differ in their last word
+# are merged), one or two examples, and as many one-line hints from the
+# docstring as fit in a token budget. Every card is checked against the
+# grammar of its docstring, and cached on disk by the docstring's hash.
+import hashlib
+import json
+import math
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from grammar import Choice, Grammar, Maybe, Placeholder, Repeat, Sequence, Synopsis
+
+CARD_VERSION = 1
+# Tokens a card may take; the forms of a command and one example are always included, even past it
+DEFAULT_BUDGET = 200
+# Rough number of characters per token, as in tree.py
+CHARS_PER_TOKEN = 4
+
+_HINT = "  # "
+
+
+def default_path() -> str:
+    cache_dir = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(cache_dir, "swaytalk", "cards.json")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _words(node, optional: bool, picks: Dict[int, int]) -> List[str]:
+    """An example of node, with or without its optional parts, taking the picked option of choices."""
+    if isinstance(node, Sequence):
+        return [word for item in node.items for word in _words(item, optional, picks)]
+    if isinstance(node, Maybe):
+        return _words(node.body, optional, picks) if optional else []
+    if isinstance(node, Repeat):
+        return []
+    if isinstance(node, Choice):
+        return _words(node.options[picks.get(id(node), 0)], optional, picks)
+    if isinstance(node, Placeholder):
+        return node.example()
+    return [node.word]
+
+
+def _choices(node) -> List[Choice]:
+    if isinstance(node, Choice):
+        return [node] + [choice for option in node.options for choice in _choices(option)]
+    if isinstance(node, Sequence):
+        return [choice for item in node.items for choice in _choices(item)]
+    if isinstance(node, Maybe):
+        return _choices(node.body)
+    return []
+
+
+def examples(synopsis: Synopsis) -> Tuple[str, str]:
+    """The shortest example of a form, and one with all of its optional parts."""
+    return " ".join(_words(synopsis.tree, False, {})), " ".join(_words(synopsis.tree, True, {}))
+
+
+def samples(synopsis: Synopsis) -> List[str]:
+    """Examples of a form that between them use every alternative of every choice in it."""
+    found = list(examples(synopsis))
+    for choice in _choices(synopsis.tree):
+        for i in range(1, len(choice.options)):
+            found.append(" ".join(_words(synopsis.tree, True, {id(choice): i})))
+    return found
+
+
+def hints(doc: Optional[str], grammar: Grammar) -> List[str]:
+    """The first sentence of the description under each synopsis line of a docstring."""
+    texts: List[List[str]] = []
+    forms = {synopsis.text for synopsis in grammar.synopses}
+    for line in (doc or "").splitlines():
+        stripped = line.strip()
+        if line.startswith("       ") and stripped in forms:
+            texts.append([])
+        elif texts and stripped:
+            texts[-1].append(stripped)
+    sentences = []
+    for lines in texts:
+        # Words the man page hyphenated at the end of a line
+        text = re.sub(r"‐\s+", "", " ".join(lines))
+        text = " ".join(text.split())
+        sentences.append(re.split(r"(?<=\.)\s", text, maxsplit=1)[0])
+    return sentences
+
+
+def merge_forms(name: str, grammar: Grammar) -> List[Tuple[str, int]]:
+    """The forms of a command without its name, each with the index of its first synopsis.
+
+    Forms that are the same up to a last word without optional parts are
+    merged into one whose last word takes any of their alternatives.
+    """
+    merged: Dict[Tuple[str, ...], Tuple[List[str], int]] = {}
+    forms: List[Tuple[str, ...]] = []
+    for i, synopsis in enumerate(grammar.synopses):
+        words = synopsis.text.split()[1:]
+        last = words[-1] if words else ""
+        if not re.fullmatch(r"[\w<>|-]+", last):
+            # Optional parts and repetitions are kept as they are
+            key: Tuple[str, ...] = ("#", str(i))
+            merged[key] = (words, i)
+        else:
+            key = tuple(words[:-1])
+            if key in merged:
+                alternatives = merged[key][0][-1].split("|")
+                words = words[:-1] + ["|".join(alternatives + [a for a in last.split("|") if a not in alternatives])]
+                merged[key] = (words, merged[key][1])
+            else:
+                merged[key] = (words, i)
+        if key not in forms:
+            forms.append(key)
+    return [(" ".join(merged[key][0]), merged[key][1]) for key in forms]
+
+
+def _card_forms(name: str, card: str) -> List[str]:
+    forms = []
+    for line in card.splitlines():
+        line = line.split(_HINT, 1)[0].strip()
+        if line.startswith(f"{name} ::= "):
+            forms.append(line[len(name) + 5:])
+        elif line.startswith("| "):
+            forms.append(line[2:])
+    return forms
+
+
+def check(name: str, card: str, grammar: Grammar) -> Optional[str]:
+    """Return how the card disagrees with the grammar, or None if the samples of each parse with the other."""
+    try:
+        card_grammar = Grammar(name, [Synopsis(f"{name} {form}".strip()) for form in _card_forms(name, card)])
+    except ValueError as e:
+        return f"unreadable form: {str(e)}"
+    if grammar.takes_arguments != card_grammar.takes_arguments:
+        return "the card and the docstring disagree on whether there are arguments"
+    for synopsis in grammar.synopses:
+        for example in samples(synopsis):
+            if not card_grammar.matches(example):
+                return f"'{example}' from the docstring is not a command of the card"
+    for synopsis in card_grammar.synopses:
+        for example in samples(synopsis):
+            if not grammar.matches(example):
+                return f"'{example}' from the card is not a command of the docstring"
+    for line in card.splitlines():
+        if line.startswith("e.g. "):
+            for example in line[5:].split("; "):
+                if not grammar.matches(example):
+                    return f"the example '{example}' is not a command"
+    return None
+
+
+def compile_card(name: str, doc: Optional[str], grammar: Grammar, budget: int = DEFAULT_BUDGET) -> str:
+    """Summarize a docstring in the forms of its command, examples and hints, within budget tokens."""
+    sentences = hints(doc, grammar)
+    if not grammar.takes_arguments:
+        # A sentence like "This function exits the window manager."
+        return " ".join((doc or "").split()) or name
+
+    forms = merge_forms(name, grammar)
+    lines = [f"{name} ::= {forms[0][0]}"] + [f"{' ' * (len(name) + 3)}| {form}" for form, _ in forms[1:]]
+    # The first form in full, and the shortest example of another form that takes a value
+    chosen = [examples(grammar.synopses[0])[1]]
+    for synopsis in grammar.synopses[1:]:
+        short = examples(synopsis)[0]
+        takes_value = any(isinstance(item, Placeholder) for item in synopsis.tree.items)
+        if takes_value and short.split()[:2] != chosen[0].split()[:2]:
+            chosen.append(short)
+            break
+    if len(chosen) > 1 and estimate_tokens("\n".join(lines + ["e.g. " + "; ".join(chosen)])) > budget:
+        chosen = chosen[:1]
+    lines.append("e.g. " + "; ".join(chosen))
+
+    # Hints in the order of the forms, while they fit
+    for i, (_, first) in enumerate(forms):
+        hint = sentences[first] if first < len(sentences) else ""
+        if not hint:
+            continue
+        candidate = lines[:i] + [lines[i] + _HINT + hint] + lines[i + 1:]
+        if estimate_tokens("\n".join(candidate)) > budget:
+            break
+        lines = candidate
+    return "\n".join(lines)
+
+
+def _key(name: str, doc: Optional[str], budget: int) -> str:
+    data = f"{CARD_VERSION}\0{budget}\0{name}\0{doc or ''}".encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def load_or_compile(tools: Dict[str, Callable], grammars: Dict[str, Grammar], budget: int = DEFAULT_BUDGET,
+                    path: Optional[str] = None) -> Dict[str, str]:
+    """The card of every tool, compiling and caching the ones whose docstring or budget changed.
+
+    A card that fails check() is replaced by the synopsis lines of its grammar.
+    """
+    cached: Dict[str, str] = {}
+    if path and os.path.exists(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CARD_VERSION:
+                cached = data.get("cards", {})
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    cards, keys = {}, {}
+    for name, function in tools.items():
+        keys[name] = _key(name, function.__doc__, budget)
+        card = cached.get(keys[name])
+        if card is None:
+            card = compile_card(name, function.__doc__, grammars[name], budget)
+            error = check(name, card, grammars[name])
+            if error:
+                print(f"Grammar card of {name} rejected: {error}")
+                card = "\n".join(synopsis.text for synopsis in grammars[name].synopses) or name
+        cards[name] = card
+
+    if path and set(cached) != set(keys.values()):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CARD_VERSION, "cards": {keys[name]: card for name, card in cards.items()}}, f)
+        os.replace(tmp_path, path)
+    return cards
+
+
+def report(tools: Dict[str, Callable], cards: Dict[str, str], budget: int) -> List[Dict[str, object]]:
+    """Tokens of every docstring and of its card."""
+    rows = []
+    for name, function in tools.items():
+        raw, card = estimate_tokens(function.__doc__ or ""), estimate_tokens(cards[name])
+        rows.append({"tool": name, "docstring_tokens": raw, "card_tokens": card, "saved": raw - card,
+                     "over_budget": card > budget})
+    return rows
@@ -0,0 +1,262 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# A cascade of models. Small, fast models get the first try at a request;
+# their tool calls are only run if they are valid sway commands and the
+# cascade is confident in them. Otherwise the request escalates to the next
+# tier, and finally to the full agent.
+import asyncio
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, ToolMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.tools import BaseTool
+
+from retrieval import ToolIndex
+from tracing import percentile
+
+# (tool_name, arguments) or (tool_name, arguments, window), as run by execute_tool
+ToolCall = Tuple[str, ...]
+# Turns a tool name and its typed arguments into a ToolCall, or returns why they are invalid
+Validator = Callable[[str, Dict[str, Any]], Tuple[Optional[ToolCall], Optional[str]]]
+
+# Confidence in a tool by how the tool index ranks it for the request
+RANK_CONFIDENCE = (1.0, 0.75, 0.75)
+UNRANKED_CONFIDENCE = 0.25
+# Temperature of the samples that are compared with a tier's proposal
+SAMPLE_TEMPERATURE = 0.7
+# Model turns a tier may take to propose the commands of one request
+MAX_TURNS = 4
+
+
+class Tier:
+    """One model of the cascade, bound to the typed tools."""
+
+    def __init__(self, name: str, llm: BaseChatModel, tools: List[BaseTool], prompt: ChatPromptTemplate):
+        self.name = name
+        self.llm = llm
+        # The same model sampling at a temperature, for answers that can disagree with llm's
+        self.sampler = llm.model_copy(update={"temperature": SAMPLE_TEMPERATURE}) if hasattr(llm, "temperature") else llm
+        self.tools = tools
+        self.prompt = prompt
+        self._bound: Dict[Tuple[bool, Tuple[str, ...]], Runnable] = {}
+
+    def bound(self, names: Optional[List[str]] = None, sample: bool = False) -> Runnable:
+        """The model, or the sampler if sample, bound to the named tools or to all of them."""
+        tools = [t for t in self.tools if names is None or t.name in names]
+        key = (sample, tuple(t.name for t in tools))
+        if key not in self._bound:
+            self._bound[key] = (self.sampler if sample else self.llm).bind_tools(tools)
+        return self._bound[key]
+
+
+class TierStats:
+    def __init__(self):
+        self.attempts = 0
+        self.accepted = 0
+        self.escalated = Counter()
+        self.seconds: List[float] = []
+        # (retrieval, agreement) confidence of every valid proposal
+        self.confidence: List[Tuple[float, float]] = []
+
+    def as_dict(self) -> Dict[str, Any]:
+        def mean(values: List[float]) -> float:
+            return round(sum(values) / len(values), 4) if values else 0.0
+
+        return {
+            "attempts": self.attempts,
+            "accepted": self.accepted,
+            "hit_rate": self.accepted / self.attempts if self.attempts else 0.0,
+            "escalated": dict(self.escalated),
+            "confidence": {
+                "retrieval": mean([retrieval for retrieval, _ in self.confidence]),
+                "agreement": mean([agreement for _, agreement in self.confidence]),
+                "combined": mean([min(both) for both in self.confidence]),
+            },
+            "p50_seconds": round(percentile(self.seconds, 50), 4),
+            "p95_seconds": round(percentile(self.seconds, 95), 4),
+        }
+
+
+class Cascade:
+    """Asks each tier for tool calls until one proposes calls it can trust.
+
+    A tier is asked again after every turn with tool calls, with each call
+    answered as if it had run, until it answers without calling a tool, so
+    that a request needing several commands gets all of them; nothing is run
+    before the whole proposal is accepted. A proposal is accepted when the
+    model called at least one tool, every call passes validate (schema and
+    command grammar), and its confidence is at least threshold.
+
+    Confidence is the lower of two scores, both recorded per tier. The
+    retrieval score is a heuristic on the request alone: how highly the tool
+    index ranks each chosen tool (without an index, 1). A small model
+    picking a tool the index finds unrelated is the usual sign of it having
+    misunderstood. The agreement score comes from the tier's own output:
+    with samples above 1, the tier is asked samples - 1 more times at
+    SAMPLE_TEMPERATURE, and the score is the share of these samples that
+    made the same calls. A model that is unsure of a request rarely answers
+    it the same way twice. (Ollama does not return token logprobs to
+    LangChain.)
+    """
+
+    def __init__(self, tiers: List[Tier], validate: Validator, index: Optional[ToolIndex] = None,
+                 threshold: float = 0.5, samples: int = 1):
+        self.tiers = tiers
+        self.validate = validate
+        self.index = index
+        self.threshold = threshold
+        self.samples = samples
+        self.stats: Dict[str, TierStats] = {}
+
+    def tier_stats(self, name: str) -> TierStats:
+        return self.stats.setdefault(name, TierStats())
+
+    def retrieval_confidence(self, text: str, calls: List[ToolCall]) -> float:
+        if self.index is None:
+            return 1.0
+        ranking = self.index.search(text, len(RANK_CONFIDENCE))
+        return min(RANK_CONFIDENCE[ranking.index(call[0])] if call[0] in ranking else UNRANKED_CONFIDENCE
+                   for call in calls)
+
+    @staticmethod
+    def agreement(calls: List[ToolCall], samples: List[Optional[List[ToolCall]]]) -> float:
+        """The share of the samples that made the same calls, or 1 without samples."""
+        return sum(sample == calls for sample in samples) / len(samples) if samples else 1.0
+
+    def _judge(self, tier: str, text: str, calls: Optional[List[ToolCall]], error: Optional[str],
+               samples: List[Optional[List[ToolCall]]]) -> Tuple[Optional[List[ToolCall]], str]:
+        if error:
+            return None, error
+        if not calls:
+            return None, "no_call"
+        scores = (self.retrieval_confidence(text, calls), self.agreement(calls, samples))
+        self.tier_stats(tier).confidence.append(scores)
+        if min(scores) < self.threshold:
+            return None, "low_confidence"
+        return calls, "accepted"
+
+    def _plan(self, message, calls: List[ToolCall], messages: List[BaseMessage]) -> Optional[str]:
+        """Add the valid calls of a turn to calls and answer them in messages, or return why they are not."""
+        turn = []
+        for tool_call in message.tool_calls:
+            call, error = self.validate(tool_call["name"], tool_call["args"])
+            if error:
+                return "invalid"
+            turn.append(call)
+        calls.extend(turn)
+        messages.append(message)
+        messages.extend(ToolMessage(content=f"Ran {call[1] or call[0]}", tool_call_id=tool_call["id"])
+                        for tool_call, call in zip(message.tool_calls, turn))
+        return None
+
+    def _turns(self, model: Runnable, messages: List[BaseMessage],
+               config: Optional[RunnableConfig]) -> Tuple[Optional[List[ToolCall]], Optional[str]]:
+        """Ask model until it answers without calling a tool, returning its calls or why it failed."""
+        calls: List[ToolCall] = []
+        for _ in range(MAX_TURNS):
+            try:
+                message = model.invoke(messages, config=config)
+            except Exception as e:
+                return None, f"error: {str(e)}"
+            if not message.tool_calls:
+                return calls, None
+            error = self._plan(message, calls, messages)
+            if error:
+                return None, error
+        return None, "max_turns"
+
+    async def _aturns(self, model: Runnable, messages: List[BaseMessage],
+                      config: Optional[RunnableConfig]) -> Tuple[Optional[List[ToolCall]], Optional[str]]:
+        calls: List[ToolCall] = []
+        for _ in range(MAX_TURNS):
+            try:
+                message = await model.ainvoke(messages, config=config)
+            except Exception as e:
+                return None, f"error: {str(e)}"
+            if not message.tool_calls:
+                return calls, None
+            error = self._plan(message, calls, messages)
+            if error:
+                return None, error
+        return None, "max_turns"
+
+    def _propose(self, tier: Tier, text: str, inputs: Dict[str, Any], config: Optional[RunnableConfig],
+                 tool_names: Optional[List[str]]) -> Tuple[Optional[List[ToolCall]], str]:
+        calls, error = self._turns(tier.bound(tool_names), tier.prompt.format_messages(**inputs, agent_scratchpad=[]),
+                                   config)
+        samples = []
+        if calls:
+            samples = [self._turns(tier.bound(tool_names, sample=True),
+                                   tier.prompt.format_messages(**inputs, agent_scratchpad=[]), config)[0]
+                       for _ in range(self.samples - 1)]
+        return self._judge(tier.name, text, calls, error, samples)
+
+    async def _apropose(self, tier: Tier, text: str, inputs: Dict[str, Any], config: Optional[RunnableConfig],
+                        tool_names: Optional[List[str]]) -> Tuple[Optional[List[ToolCall]], str]:
+        calls, error = await self._aturns(tier.bound(tool_names),
+                                          tier.prompt.format_messages(**inputs, agent_scratchpad=[]), config)
+        samples = []
+        if calls:
+            # The samples are independent, so they are asked for at once
+            answers = await asyncio.gather(*(
+                self._aturns(tier.bound(tool_names, sample=True),
+                             tier.prompt.format_messages(**inputs, agent_scratchpad=[]), config)
+                for _ in range(self.samples - 1)))
+            samples = [sample for sample, _ in answers]
+        return self._judge(tier.name, text, calls, error, samples)
+
+    def _attempted(self, tier: Tier, calls: Optional[List[ToolCall]], reason: str, start: float):
+        stats = self.tier_stats(tier.name)
+        stats.seconds.append(time.perf_counter() - start)
+        print(f"Cascade tier {tier.name}: {reason}" + (f" {calls}" if calls else ""))
+        if not calls:
+            stats.escalated[reason.split(":", 1)[0]] += 1
+
+    def propose(self, text: str, inputs: Dict[str, Any], config: Optional[RunnableConfig] = None,
+                tool_names: Optional[List[str]] = None) -> Tuple[Optional[List[ToolCall]], Optional[str]]:
+        """Return the first accepted tool calls and the tier that proposed them, or (None, None).
+
+        tool_names limits the tools offered to the tiers.
+        """
+        for tier in self.tiers:
+            self.tier_stats(tier.name).attempts += 1
+            start = time.perf_counter()
+            calls, reason = self._propose(tier, text, inputs, config, tool_names)
+            self._attempted(tier, calls, reason, start)
+            if calls:
+                return calls, tier.name
+        return None, None
+
+    async def apropose(self, text: str, inputs: Dict[str, Any], config: Optional[RunnableConfig] = None,
+                       tool_names: Optional[List[str]] = None) -> Tuple[Optional[List[ToolCall]], Optional[str]]:
+        """propose() for the event loop."""
+        for tier in self.tiers:
+            self.tier_stats(tier.name).attempts += 1
+            start = time.perf_counter()
+            calls, reason = await self._apropose(tier, text, inputs, config, tool_names)
+            self._attempted(tier, calls, reason, start)
+            if calls:
+                return calls, tier.name
+        return None, None
+
+    def rejected(self, tier: str):
+        """Record that sway rejected the calls a tier proposed, so the request escalated after all."""
+        self.tier_stats(tier).escalated["failed"] += 1
+
+    def accepted(self, tier: str):
+        """Record that the calls a tier proposed were run successfully."""
+        self.tier_stats(tier).accepted += 1
+
+    def record(self, tier: str, ok: bool, seconds: float):
+        """Record a request handled by a tier outside the cascade, such as the full agent."""
+        stats = self.tier_stats(tier)
+        stats.attempts += 1
+        stats.accepted += ok
+        stats.seconds.append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
@@ -0,0 +1,62 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Thin client for the SwayTalk daemon, meant to be bound to a sway keybinding:
+#   bindsym $mod+t exec python /path/to/swaytalk/client.py
+# It deliberately imports nothing heavy so the prompt shows up immediately.
+import argparse
+import sys
+from typing import Callable, Optional
+
+import daemon
+import frontends
+
+
+def speculate(path: Optional[str]) -> Callable[[str], None]:
+    def send(text: str):
+        try:
+            daemon.send({"command": "speculate", "input": text}, path=path, wait=False)
+        except OSError:
+            # Not running yet; the request itself will say so
+            pass
+    return send
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send a request to the SwayTalk daemon.")
+    parser.add_argument("text", nargs="*", help="Request to send. Prompts with the frontend if omitted.")
+    parser.add_argument("--frontend", choices=["auto", *frontends.FRONTENDS], default="auto",
+                        help="How to ask for the request: auto picks fuzzel, dmenu, qt or stdin, "
+                             "whichever is available first.")
+    parser.add_argument("--speculate", action="store_true",
+                        help="Send the request to the daemon while it is typed, so it can get a head start "
+                             "(qt and stdin frontends; the daemon needs --speculate too).")
+    parser.add_argument("--wait", action="store_true", help="Wait for the daemon and print its reply.")
+    parser.add_argument("--socket", help="Path of the daemon socket.")
+    parser.add_argument("--stats", action="store_true", help="Print the daemon's request statistics.")
+    args = parser.parse_args()
+
+    if args.stats:
+        request = {"command": "stats"}
+        args.wait = True
+    else:
+        on_change = speculate(args.socket) if args.speculate else None
+        text = " ".join(args.text) or frontends.read_input(args.frontend, on_change)
+        if not text:
+            print("No input provided.")
+            return 1
+        request = {"command": "run", "input": text}
+
+    try:
+        reply = daemon.send(request, path=args.socket, wait=args.wait)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print("SwayTalk daemon is not running. Start it with: python main.py --daemon", file=sys.stderr)
+        return 1
+
+    if reply is not None:
+        print(reply.get("output", ""))
+        return 0 if reply.get("ok") else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Structured output instead of tool calls. The model answers with JSON whose
+# shape is fixed by a JSON schema passed as Ollama's `format`, and the schema
+# only admits commands that follow the grammars from the tool docstrings, so
+# every command the model can produce parses and there are no retries.
+import json
+import time
+from contextlib import aclosing, closing
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig
+
+from grammar import Grammar, json_pattern
+
+# (tool_name, arguments) or (tool_name, arguments, window), as run by execute_tool
+ToolCall = Tuple[str, ...]
+
+# Most commands the model may send for one request
+MAX_COMMANDS = 3
+
+
+def command_schema(grammars: List[Grammar], max_commands: int = MAX_COMMANDS) -> Dict[str, Any]:
+    """JSON schema of a list of commands of the given tools, each with an optional window name."""
+    return {
+        "type": "object",
+        "properties": {
+            "commands": {
+                "type": "array",
+                "minItems": 1,
+                "maxItems": max_commands,
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "command": {"type": "string", "pattern": json_pattern(grammars)},
+                        "window": {"type": "string"},
+                    },
+                    "required": ["command"],
+                },
+            },
+        },
+        "required": ["commands"],
+    }
+
+
+def command_list(grammars: List[Grammar]) -> str:
+    """The synopsis lines of the given tools, to show the model the syntax the schema enforces."""
+    lines = []
+    for tool_grammar in grammars:
+        lines.extend(synopsis.text for synopsis in tool_grammar.synopses)
+        if not tool_grammar.takes_arguments:
+            lines.append(tool_grammar.name)
+    return "\n".join(lines)
+
+
+class CommandStream:
+    """Picks the complete items out of the commands array of a streamed answer.
+
+    feed() takes the answer a piece at a time and returns the items that
+    were closed by it; done is set once the array itself is closed.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.start: Optional[int] = None
+        self.done = False
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        items = []
+        offset = len(self.text)
+        self.text += text
+        for i in range(offset, len(self.text)):
+            char = self.text[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+                # {"commands": [{...}, ...]}
+                if self.depth == 3 and char == "{":
+                    self.start = i
+            elif char in "}]":
+                if self.depth == 3 and self.start is not None:
+                    items.append(json.loads(self.text[self.start:i + 1]))
+                    self.start = None
+                self.depth -= 1
+                if self.depth == 1 and char == "]":
+                    self.done = True
+        return items
+
+
+class ConstrainedExecutor:
+    """Handles a request with one structured-output LLM call.
+
+    select, if given, picks the tools offered for a request; run sends the
+    resulting calls to sway and returns an error message if any failed, and
+    arun does the same for ainvoke(). The schema and command list of every
+    tool selection are built once.
+
+    With stream, each command is run as soon as the model has finished
+    writing it instead of once the whole answer is in, and the answer is
+    abandoned once the list of commands is closed.
+    """
+
+    def __init__(self, llm: BaseChatModel, grammars: Dict[str, Grammar], prompt: ChatPromptTemplate,
+                 run: Callable[[List[ToolCall]], Optional[str]],
+                 select: Optional[Callable[[str], Optional[List[str]]]] = None,
+                 arun: Optional[Callable[[List[ToolCall]], Awaitable[Optional[str]]]] = None,
+                 stream: bool = False, verbose: bool = True):
+        self.llm = llm
+        self.grammars = grammars
+        self.prompt = prompt
+        self.run = run
+        self.select = select
+        self.arun = arun
+        self.stream = stream
+        self.verbose = verbose
+        self._schemas: Dict[Tuple[str, ...], Tuple[Dict[str, Any], str]] = {}
+
+    def schema_for(self, names: Optional[List[str]]) -> Tuple[Dict[str, Any], str]:
+        key = tuple(sorted(names if names is not None else self.grammars))
+        if key not in self._schemas:
+            grammars = [self.grammars[name] for name in key if name in self.grammars]
+            self._schemas[key] = (command_schema(grammars), command_list(grammars))
+        return self._schemas[key]
+
+    def parse_item(self, item: Dict[str, Any]) -> ToolCall:
+        command = " ".join(item["command"].split())
+        tool_name = command.split(" ", 1)[0]
+        if tool_name in self.grammars and not self.grammars[tool_name].takes_arguments:
+            # Tools like reload take no arguments
+            command = ""
+        window = (item.get("window") or "").strip()
+        return (tool_name, command, window) if window else (tool_name, command)
+
+    def parse(self, content: str) -> List[ToolCall]:
+        return [self.parse_item(item) for item in json.loads(content)["commands"][:MAX_COMMANDS]]
+
+    def messages(self, inputs: Dict[str, Any]) -> Tuple[Dict[str, Any], list]:
+        """The schema and the messages the model is given for inputs."""
+        text = inputs.get("input", "")
+        schema, commands = self.schema_for(self.select(text) if self.select else None)
+        return schema, self.prompt.format_messages(**inputs, commands=commands, agent_scratchpad=[])
+
+    def _calls(self, content: str) -> Tuple[List[ToolCall], Optional[str]]:
+        try:
+            return [call for call in self.parse(content) if call[0] in self.grammars], None
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            # Only possible if the server ignored the schema
+            return [], f"Could not parse the model's answer: {str(e)}"
+
+    def _result(self, inputs: Dict[str, Any], calls: List[ToolCall], output: Optional[str],
+                start: float, llm_seconds: float, ipc_seconds: float, abandoned: bool = False) -> Dict[str, Any]:
+        if not calls and output is None:
+            output = "The model did not produce a command."
+        total = time.perf_counter() - start
+        timings = [{"step": 0, "kind": "llm", "seconds": llm_seconds},
+                   {"step": 0, "kind": "ipc", "seconds": ipc_seconds}]
+        if abandoned:
+            timings[0]["abandoned"] = True
+        if self.verbose:
+            print(f"> {calls} -> {output}")
+            print(f"Stopped after 1 LLM call in {total:.2f}s: llm={llm_seconds:.3f}s, ipc={ipc_seconds:.3f}s")
+        return {
+            "input": inputs.get("input", ""),
+            "output": output,
+            "steps": [(call[0], call[1:], output) for call in calls],
+            "stop_reason": "done" if calls else "answer",
+            "timings": timings,
+            "seconds": total,
+        }
+
+    def _ran(self, calls: List[ToolCall], error: Optional[str]) -> str:
+        return error or "Ran " + "; ".join(call[1] or call[0] for call in calls)
+
+    def invoke(self, inputs: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+        if self.stream:
+            return self._invoke_streaming(inputs, config)
+        start = time.perf_counter()
+        schema, messages = self.messages(inputs)
+        message = self.llm.invoke(messages, format=schema, config=config)
+        llm_seconds = time.perf_counter() - start
+        calls, output = self._calls(message.content)
+
+        run_start = time.perf_counter()
+        if calls:
+            output = self._ran(calls, self.run(calls))
+        return self._result(inputs, calls, output, start, llm_seconds, time.perf_counter() - run_start)
+
+    def _invoke_streaming(self, inputs: Dict[str, Any], config: Optional[RunnableConfig]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        schema, messages = self.messages(inputs)
+        commands = CommandStream()
+        calls: List[ToolCall] = []
+        error = output = None
+        ipc_seconds = 0.0
+        abandoned = False
+        try:
+            with closing(iter(self.llm.stream(messages, format=schema, config=config))) as chunks:
+                for chunk in chunks:
+                    for item in commands.feed(chunk.content):
+                        call = self.parse_item(item)
+                        if call[0] not in self.grammars or len(calls) == MAX_COMMANDS:
+                            continue
+                        calls.append(call)
+                        run_start = time.perf_counter()
+                        error = self.run([call])
+                        ipc_seconds += time.perf_counter() - run_start
+                        if error:
+                            break
+                    if error or commands.done:
+                        abandoned = True
+                        break
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            output = f"Could not parse the model's answer: {str(e)}"
+        if calls:
+            output = self._ran(calls, error)
+        llm_seconds = time.perf_counter() - start - ipc_seconds
+        return self._result(inputs, calls, output, start, llm_seconds, ipc_seconds, abandoned)
+
+    async def ainvoke(self, inputs: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+        """invoke() for the event loop; the commands are sent with arun if it is given."""
+        if self.stream:
+            return await self._ainvoke_streaming(inputs, config)
+        start = time.perf_counter()
+        schema, messages = self.messages(inputs)
+        message = await self.llm.ainvoke(messages, format=schema, config=config)
+        llm_seconds = time.perf_counter() - start
+        calls, output = self._calls(message.content)
+
+        run_start = time.perf_counter()
+        if calls:
+            output = self._ran(calls, await self.arun(calls) if self.arun else self.run(calls))
+        return self._result(inputs, calls, output, start, llm_seconds, time.perf_counter() - run_start)
+
+    async def _ainvoke_streaming(self, inputs: Dict[str, Any], config: Optional[RunnableConfig]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        schema, messages = self.messages(inputs)
+        commands = CommandStream()
+        calls: List[ToolCall] = []
+        error = output = None
+        ipc_seconds = 0.0
+        abandoned = False
+        try:
+            async with aclosing(aiter(self.llm.astream(messages, format=schema, config=config))) as chunks:
+                async for chunk in chunks:
+                    for item in commands.feed(chunk.content):
+                        call = self.parse_item(item)
+                        if call[0] not in self.grammars or len(calls) == MAX_COMMANDS:
+                            continue
+                        calls.append(call)
+                        run_start = time.perf_counter()
+                        error = await self.arun([call]) if self.arun else self.run([call])
+                        ipc_seconds += time.perf_counter() - run_start
+                        if error:
+                            break
+                    if error or commands.done:
+                        abandoned = True
+                        break
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            output = f"Could not parse the model's answer: {str(e)}"
+        if calls:
+            output = self._ran(calls, error)
+        llm_seconds = time.perf_counter() - start - ipc_seconds
+        return self._result(inputs, calls, output, start, llm_seconds, ipc_seconds, abandoned)
@@ -0,0 +1,202 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# This module only uses the standard library so that client.py can import it
+# without paying for the langchain/PyQt6 imports.
+import asyncio
+import inspect
+import json
+import os
+import socket
+import socketserver
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+def socket_path() -> str:
+    """Return the path of the Unix socket the daemon listens on."""
+    override = os.environ.get("SWAYTALK_SOCKET")
+    if override:
+        return override
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR", "/tmp")
+    return os.path.join(runtime_dir, f"swaytalk-{os.getuid()}.sock")
+
+
+def encode(message: Dict[str, Any]) -> bytes:
+    return (json.dumps(message) + "\n").encode("utf-8")
+
+
+def decode(line: bytes) -> Dict[str, Any]:
+    return json.loads(line.decode("utf-8"))
+
+
+def dispatch(request: Dict[str, Any], handler: Callable[[str], Any],
+             stats: Optional[Callable[[], Dict[str, Any]]] = None,
+             speculate: Optional[Callable[[str], None]] = None) -> Any:
+    """Answer a request, returning whatever handler returns for "run" requests.
+
+    "speculate" requests carry the text typed so far and are answered at once.
+    """
+    command = request.get("command", "run")
+    if command == "ping":
+        return {"ok": True, "output": "pong"}
+    if command == "stats":
+        stats = stats() if stats else {}
+        return {"ok": True, "output": json.dumps(stats, indent=2), "stats": stats}
+    if command == "speculate":
+        if speculate is None:
+            return {"ok": False, "output": "Speculation is off; start the daemon with --speculate."}
+        speculate(request.get("input", ""))
+        return {"ok": True, "output": ""}
+    if command == "run":
+        text = request.get("input", "").strip()
+        if not text:
+            return {"ok": False, "output": "No input provided."}
+        return handler(text)
+    return {"ok": False, "output": f"Unknown command '{command}'"}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = decode(line)
+            reply = self.server.dispatch(request)
+        except Exception as e:
+            reply = {"ok": False, "output": f"Error: {str(e)}"}
+        try:
+            self.wfile.write(encode(reply))
+        except (BrokenPipeError, ConnectionResetError):
+            # Fire-and-forget clients close their end straight away.
+            pass
+
+
+class SwayTalkServer(socketserver.UnixStreamServer):
+    """Unix socket server that keeps the agent resident between requests.
+
+    Requests are handled one at a time on purpose: they all share the single
+    sway connection and the same agent.
+    """
+
+    def __init__(self, path: str, handler: Callable[[str], Dict[str, Any]],
+                 stats: Optional[Callable[[], Dict[str, Any]]] = None,
+                 speculate: Optional[Callable[[str], None]] = None):
+        self.handler = handler
+        self.stats = stats
+        self.speculate = speculate
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, _RequestHandler)
+        os.chmod(path, 0o600)
+
+    def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return dispatch(request, self.handler, self.stats, self.speculate)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def serve(handler: Callable[[str], Dict[str, Any]], path: Optional[str] = None,
+          stats: Optional[Callable[[], Dict[str, Any]]] = None,
+          speculate: Optional[Callable[[str], None]] = None):
+    """Serve requests on the daemon socket until interrupted."""
+    path = path or socket_path()
+    with SwayTalkServer(path, handler, stats, speculate) as server:
+        print(f"SwayTalk daemon listening on {path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+class AsyncSwayTalkServer:
+    """Serves the daemon socket from an asyncio event loop.
+
+    Requests are read while others are being handled. A new "run" request
+    cancels those still in flight, since they are stale once the user has
+    asked for something else; their clients are told they were cancelled.
+    The same request again is not a correction but a repetition ("grow it",
+    "grow it"), so both run.
+    """
+
+    def __init__(self, handler: Callable[[str], Awaitable[Dict[str, Any]]],
+                 stats: Optional[Callable[[], Dict[str, Any]]] = None,
+                 speculate: Optional[Callable[[str], None]] = None):
+        self.handler = handler
+        self.stats = stats
+        self.speculate = speculate
+        # The requests in flight, with their text
+        self.running: Dict[asyncio.Task, str] = {}
+
+    async def run(self, text: str) -> Dict[str, Any]:
+        for task, running_text in self.running.items():
+            if running_text != text:
+                task.cancel()
+        task = asyncio.ensure_future(self.handler(text))
+        self.running[task] = text
+        try:
+            await asyncio.wait([task])
+        finally:
+            self.running.pop(task, None)
+        if task.cancelled():
+            return {"ok": False, "output": "Cancelled by a newer request.", "cancelled": True}
+        return task.result()
+
+    async def client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                reply = dispatch(decode(line), self.run, self.stats, self.speculate)
+                if inspect.isawaitable(reply):
+                    reply = await reply
+            except Exception as e:
+                reply = {"ok": False, "output": f"Error: {str(e)}"}
+            writer.write(encode(reply))
+            await writer.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # Fire-and-forget clients close their end straight away.
+            pass
+        finally:
+            writer.close()
+
+
+async def aserve(handler: Callable[[str], Awaitable[Dict[str, Any]]], path: Optional[str] = None,
+                 stats: Optional[Callable[[], Dict[str, Any]]] = None,
+                 speculate: Optional[Callable[[str], None]] = None):
+    """serve() on the running event loop, for a coroutine handler."""
+    path = path or socket_path()
+    if os.path.exists(path):
+        os.unlink(path)
+    server = AsyncSwayTalkServer(handler, stats, speculate)
+    unix_server = await asyncio.start_unix_server(server.client, path)
+    os.chmod(path, 0o600)
+    print(f"SwayTalk daemon listening on {path}")
+    try:
+        async with unix_server:
+            await unix_server.serve_forever()
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def send(request: Dict[str, Any], path: Optional[str] = None, wait: bool = True,
+         timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Send a request to a running daemon, optionally waiting for its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(timeout)
+        conn.connect(path or socket_path())
+        conn.sendall(encode(request))
+        if not wait:
+            return None
+        conn.shutdown(socket.SHUT_WR)
+        with conn.makefile("rb") as reply:
+            line = reply.readline()
+    return decode(line) if line else None
@@ -0,0 +1,273 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# A small replacement for AgentExecutor. LeanExecutor gives the whole request
+# a budget of model calls and time, sends the sway commands of one model turn
+# together and stops as soon as they have all succeeded, without asking the
+# model for a final answer.
+import asyncio
+import json
+import time
+from contextlib import aclosing, closing, nullcontext
+from typing import Any, AsyncContextManager, Callable, Collection, ContextManager, Dict, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, ToolMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+
+# Tools whose output only depends on their arguments, so asking twice is pointless
+IDEMPOTENT_TOOLS = {"get_docstring"}
+
+
+class LeanExecutor:
+    """Runs the tool calling loop until a model turn's commands have all succeeded.
+
+    The prompt asks for every command of a request like "make this
+    fullscreen and then focus the terminal" in the same turn, as parallel
+    tool calls, so once each call to a dispatch tool (those that send
+    commands to sway) in a turn has sent its commands and none failed, the
+    request is done. Otherwise the loop goes on until the model answers
+    without calling a tool, and handled() tells whether the request was then
+    done or just answered. The loop also ends after max_steps model calls,
+    or once max_seconds have passed, which also bounds the model call in
+    progress. If batch is given,
+    the tool calls of one model turn run inside batch(), so their sway
+    commands are sent together; commands that failed are reported back to the
+    model as errors of the tool call that sent them. abatch is the same for
+    ainvoke().
+
+    With stream, the model's answer is read as it is generated, and once it
+    has called a dispatch tool and goes on to write text instead of more tool
+    calls, the rest of the answer is abandoned and the calls are run.
+    """
+
+    def __init__(self, llm: BaseChatModel, tools: List[BaseTool], prompt: ChatPromptTemplate,
+                 handled: Callable[[], bool], max_steps: int = 4, max_seconds: float = 30.0,
+                 batch: Optional[Callable[[], ContextManager]] = None,
+                 abatch: Optional[Callable[[], AsyncContextManager]] = None, stream: bool = False,
+                 dispatch: Collection[str] = (), verbose: bool = True):
+        self.llm = llm.bind_tools(tools)
+        self.tools = {t.name: t for t in tools}
+        self.prompt = prompt
+        self.handled = handled
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.batch = batch
+        self.abatch = abatch
+        self.stream = stream
+        self.dispatch = set(dispatch)
+        self.verbose = verbose
+
+    def _log(self, message: str):
+        if self.verbose:
+            print(message)
+
+    def _run_tool(self, name: str, args: Dict[str, Any], config: Optional[RunnableConfig] = None) -> str:
+        if name not in self.tools:
+            return f"Tool '{name}' not found. Available tools: {', '.join(self.tools)}"
+        try:
+            return str(self.tools[name].invoke(args, config=config))
+        except Exception as e:
+            return f"Error executing {name}: {str(e)}"
+
+    def _dispatch_names(self) -> str:
+        """Name the dispatch tools the model was given, for telling it to call one."""
+        names = sorted(self.dispatch & set(self.tools))
+        if not names:
+            return "a tool that runs the command"
+        if len(names) > 3:
+            return "one of " + ", ".join(names)
+        return " or ".join(names)
+
+    def _past_calls(self, message: Optional[BaseMessage], chunk: BaseMessage) -> bool:
+        """Whether the answer so far called a dispatch tool and chunk is text rather than another call."""
+        return (message is not None and bool(chunk.content) and not chunk.tool_calls
+                and any(call["name"] in self.dispatch for call in message.tool_calls))
+
+    def _succeeded(self, observations: list, batch) -> bool:
+        """Whether the turn called a dispatch tool and every such call sent commands that all succeeded."""
+        dispatched = [(first, last) for call, _, first, last in observations if call["name"] in self.dispatch]
+        if not dispatched:
+            return False
+        if not batch:
+            return self.handled()
+        return all(last > first and all(r.success for r in batch.results[first:last]) for first, last in dispatched)
+
+    def _ask(self, messages: List[BaseMessage], config: Optional[RunnableConfig],
+             deadline: float) -> Tuple[BaseMessage, bool]:
+        """Return the model's answer and whether it was cut short once it called a dispatch tool.
+
+        A streamed answer is given up at the deadline; a whole one relies on
+        the timeout of the model's client.
+        """
+        if not self.stream:
+            return self.llm.invoke(messages, config=config), False
+        message = None
+        with closing(iter(self.llm.stream(messages, config=config))) as chunks:
+            for chunk in chunks:
+                if self._past_calls(message, chunk):
+                    return message, True
+                message = chunk if message is None else message + chunk
+                if time.perf_counter() > deadline:
+                    raise TimeoutError("the model did not answer in time")
+        return message, False
+
+    async def _aask(self, messages: List[BaseMessage], config: Optional[RunnableConfig]) -> Tuple[BaseMessage, bool]:
+        if not self.stream:
+            return await self.llm.ainvoke(messages, config=config), False
+        message = None
+        async with aclosing(aiter(self.llm.astream(messages, config=config))) as chunks:
+            async for chunk in chunks:
+                if self._past_calls(message, chunk):
+                    return message, True
+                message = chunk if message is None else message + chunk
+        return message, False
+
+    def _call_tools(self, message: BaseMessage, step: int, batch, seen: Dict[Tuple[str, str], int],
+                    timings: List[Dict[str, Any]], config: Optional[RunnableConfig]) -> Tuple[list, bool]:
+        """Run the tool calls of one model turn, returning their observations and whether the model is looping."""
+        repeated = False
+        observations = []
+        for call in message.tool_calls:
+            name, args = call["name"], call["args"]
+            key = (name, json.dumps(args, sort_keys=True))
+            first_command = len(batch.commands) if batch else 0
+            tool_start = time.perf_counter()
+            if name in IDEMPOTENT_TOOLS and key in seen:
+                seen[key] += 1
+                repeated = seen[key] > 2
+                observation = (f"You already called {name} with these arguments; its output is above. "
+                               f"Call {self._dispatch_names()} now.")
+            else:
+                seen[key] = 1
+                observation = self._run_tool(name, args, config)
+            timings.append({"step": step, "kind": "tool", "name": name,
+                            "seconds": time.perf_counter() - tool_start})
+            last_command = len(batch.commands) if batch else 0
+            observations.append((call, observation, first_command, last_command))
+        return observations, repeated
+
+    def _observe(self, observations: list, batch, steps: list, messages: List[BaseMessage]):
+        """Report the tool calls back to the model, with the errors of the sway commands they sent."""
+        for call, observation, first_command, last_command in observations:
+            if batch:
+                errors = [r.error for r in batch.results[first_command:last_command] if not r.success]
+                if errors:
+                    observation = f"Error executing {call['name']}: {'; '.join(errors)}"
+            self._log(f"> {call['name']}({call['args']}) -> {observation}")
+            steps.append((call["name"], call["args"], observation))
+            messages.append(ToolMessage(content=observation, tool_call_id=call["id"]))
+
+    def _result(self, inputs: Dict[str, Any], start: float, output: Optional[str], steps: list,
+                stop_reason: str, timings: List[Dict[str, Any]]) -> Dict[str, Any]:
+        total = time.perf_counter() - start
+        llm_calls = sum(1 for t in timings if t["kind"] == "llm")
+        self._log(f"Stopped after {llm_calls} LLM calls ({stop_reason}) in {total:.2f}s: "
+                  + ", ".join(f"{t.get('name', t['kind'])}={t['seconds']:.3f}s" for t in timings))
+        if output is None:
+            output = steps[-1][2] if steps else ""
+        return {
+            "input": inputs.get("input"),
+            "output": output,
+            "steps": steps,
+            "stop_reason": stop_reason,
+            "timings": timings,
+            "seconds": total,
+        }
+
+    def invoke(self, inputs: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+        """Handle one request. config is passed on to the model and tool calls, e.g. for callbacks."""
+        start = time.perf_counter()
+        messages: List[BaseMessage] = self.prompt.format_messages(**inputs, agent_scratchpad=[])
+        timings: List[Dict[str, Any]] = []
+        steps: List[Tuple[str, Dict[str, Any], str]] = []
+        seen: Dict[Tuple[str, str], int] = {}
+        output: Optional[str] = None
+        stop_reason = "max_steps"
+
+        for step in range(self.max_steps):
+            if time.perf_counter() - start > self.max_seconds:
+                stop_reason = "timeout"
+                break
+
+            llm_start = time.perf_counter()
+            try:
+                message, abandoned = self._ask(messages, config, start + self.max_seconds)
+            except TimeoutError:
+                stop_reason = "timeout"
+                break
+            timings.append({"step": step, "kind": "llm", "seconds": time.perf_counter() - llm_start})
+            if abandoned:
+                timings[-1]["abandoned"] = True
+            messages.append(message)
+            if not message.tool_calls:
+                output = message.content
+                stop_reason = "done" if self.handled() else "answer"
+                break
+
+            with (self.batch() if self.batch else nullcontext()) as batch:
+                observations, repeated = self._call_tools(message, step, batch, seen, timings, config)
+                ipc_start = time.perf_counter()
+            if batch and batch.results:
+                timings.append({"step": step, "kind": "ipc", "seconds": time.perf_counter() - ipc_start})
+            self._observe(observations, batch, steps, messages)
+
+            if self._succeeded(observations, batch):
+                stop_reason = "done"
+                break
+            if repeated:
+                stop_reason = "repeated"
+                break
+
+        return self._result(inputs, start, output, steps, stop_reason, timings)
+
+    async def ainvoke(self, inputs: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+        """invoke() for the event loop. The model calls are awaited, and so are the sway commands if abatch is given.
+
+        Cancelling the task stops the request at the next model call or IPC message.
+        """
+        start = time.perf_counter()
+        messages: List[BaseMessage] = self.prompt.format_messages(**inputs, agent_scratchpad=[])
+        timings: List[Dict[str, Any]] = []
+        steps: List[Tuple[str, Dict[str, Any], str]] = []
+        seen: Dict[Tuple[str, str], int] = {}
+        output: Optional[str] = None
+        stop_reason = "max_steps"
+
+        for step in range(self.max_steps):
+            remaining = self.max_seconds - (time.perf_counter() - start)
+            if remaining <= 0:
+                stop_reason = "timeout"
+                break
+
+            llm_start = time.perf_counter()
+            try:
+                message, abandoned = await asyncio.wait_for(self._aask(messages, config), remaining)
+            except asyncio.TimeoutError:
+                stop_reason = "timeout"
+                break
+            timings.append({"step": step, "kind": "llm", "seconds": time.perf_counter() - llm_start})
+            if abandoned:
+                timings[-1]["abandoned"] = True
+            messages.append(message)
+            if not message.tool_calls:
+                output = message.content
+                stop_reason = "done" if self.handled() else "answer"
+                break
+
+            async with (self.abatch() if self.abatch else nullcontext()) as batch:
+                observations, repeated = self._call_tools(message, step, batch, seen, timings, config)
+                ipc_start = time.perf_counter()
+            if batch and batch.results:
+                timings.append({"step": step, "kind": "ipc", "seconds": time.perf_counter() - ipc_start})
+            self._observe(observations, batch, steps, messages)
+
+            if self._succeeded(observations, batch):
+                stop_reason = "done"
+                break
+            if repeated:
+                stop_reason = "repeated"
+                break
+
+        return self._result(inputs, start, output, steps, stop_reason, timings)
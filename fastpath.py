@@ -0,0 +1,116 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Rule based matcher for requests that are (almost) sway commands already,
+# such as "fullscreen", "focus left" or "toggle floating". These are sent
+# straight to sway instead of going through the LLM.
+import re
+from typing import Dict, Optional, Tuple
+
+from grammar import NUMERIC_PLACEHOLDERS, REST_PLACEHOLDERS, Grammar, Roles, split_words
+
+# Tools that are never run without the agent, even when the request is an exact match.
+EXCLUDED_TOOLS = {"exit"}
+
+FILLER_WORDS = {
+    "please", "can", "could", "would", "you", "kindly", "now", "the", "a", "an",
+    "it", "this", "that", "my", "currently", "focused", "for", "of", "by",
+}
+
+NUMBER_WORDS = {
+    "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4", "five": "5",
+    "six": "6", "seven": "7", "eight": "8", "nine": "9", "ten": "10",
+}
+
+# Rewrites applied in order after the filler words are removed.
+REWRITES = [
+    (r"(?<=\d) ?pixels?\b", " px"),
+    (r"\bpercent(age points?)?\b|%", " ppt"),
+    (r"\b(-?\d+)(px|ppt)\b", r"\1 \2"),
+    (r"\bwindows?\b", ""),
+    (r"\bon\b(?= (left|right|up|down)\b)", ""),
+    (r"\bto (?=(left|right|up|down)\b)", ""),
+    (r"^go ", "focus "),
+    (r"^(turn|switch) on (\w+)$", r"\2 enable"),
+    (r"^(turn|switch) off (\w+)$", r"\2 disable"),
+    (r"^(turn|switch) (\w+) on$", r"\2 enable"),
+    (r"^(turn|switch) (\w+) off$", r"\2 disable"),
+    (r"^(make|set) (floating|fullscreen|sticky)$", r"\2 enable"),
+    (r"^set (\w+) to ", r"\1 "),
+    (r"^(exit|leave|quit) fullscreen$", "fullscreen disable"),
+    (r"^(unfloat|tile)$", "floating disable"),
+    (r"^(toggle|enable|disable) (\w+)(.*)$", r"\2 \1\3"),
+    (r"^(grow|shrink) ", r"resize \1 "),
+    (r"^(show|open) scratchpad$", "scratchpad"),
+    (r"^split (vertically|horizontally)$", lambda m: "split " + m.group(1)[:-2]),
+]
+
+
+def normalize(text: str) -> str:
+    """Lowercase the request and strip punctuation and filler words."""
+    text = text.lower()
+    text = re.sub(r"[^\w%\- ]+", " ", text)
+    words = [NUMBER_WORDS.get(word, word) for word in text.split() if word not in FILLER_WORDS]
+    return " ".join(words)
+
+
+def as_typed(text: str, command: str, roles: Roles) -> Optional[str]:
+    """Put the names in command, which text was normalized and rewritten to, back as they were typed.
+
+    roles says which placeholder each word of command fills. Returns None if
+    a name cannot be told apart, or command has free text that normalizing
+    would have changed.
+    """
+    typed = text.split()
+    words = split_words(command)
+    for i, role in enumerate(roles):
+        if not role or role in NUMERIC_PLACEHOLDERS:
+            continue
+        # Titles and new names are free text that normalizing would change
+        if role in REST_PLACEHOLDERS:
+            return None
+        # A name has to be a word of the request that only differs in case
+        originals = {word for word in typed if word.lower() == words[i]}
+        if len(originals) != 1:
+            return None
+        words[i] = originals.pop()
+    return " ".join(words)
+
+
+def rewrite(text: str) -> str:
+    for pattern, replacement in REWRITES:
+        text = re.sub(pattern, replacement, text)
+        text = " ".join(text.split())
+    return text
+
+
+class FastPath:
+    """Maps a request onto a tool call when it matches a tool's grammar exactly."""
+
+    def __init__(self, grammars: Dict[str, Grammar]):
+        self.grammars = {name: g for name, g in grammars.items() if name not in EXCLUDED_TOOLS}
+
+    def match(self, text: str) -> Optional[Tuple[str, str]]:
+        """Return the (tool_name, arguments) pair for a request, or None to abstain.
+
+        The request is matched in its normalized form, but names and other
+        words filling a placeholder are sent as they were typed.
+        """
+        command = rewrite(normalize(text))
+        if not command:
+            return None
+        tool_name = command.split()[0]
+        grammar = self.grammars.get(tool_name)
+        if grammar is None:
+            return None
+
+        if not grammar.takes_arguments:
+            return (tool_name, "") if command == tool_name else None
+
+        roles = grammar.roles(command)
+        if roles is not None:
+            arguments = as_typed(text, command, roles)
+            return (tool_name, arguments) if arguments is not None else None
+        # A bare "floating" or "sticky" means the same as toggling it.
+        if command == tool_name and grammar.matches(command + " toggle"):
+            return tool_name, command + " toggle"
+        return None
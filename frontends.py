@@ -0,0 +1,146 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Ways of asking the user for a request. Like daemon.py this only uses the
+# standard library, so client.py can import it; the Qt dialog imports PyQt6
+# only when it is actually shown. Frontends are given on_change, which the Qt
+# dialog and the terminal call with the text typed so far whenever typing
+# pauses; fuzzel and dmenu do not tell anyone what is being typed.
+import codecs
+import os
+import select
+import shutil
+import subprocess
+import sys
+from importlib.util import find_spec
+from typing import Callable, Dict, List, Optional
+
+PROMPT = "> "
+# Seconds without a keypress after which on_change is called
+PAUSE_SECONDS = 0.3
+
+OnChange = Optional[Callable[[str], None]]
+
+
+def _menu(command: List[str]) -> Optional[str]:
+    """Run a dmenu-like program with no entries and return what was typed."""
+    try:
+        result = subprocess.run(command, input="", capture_output=True, text=True)
+    except FileNotFoundError:
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
+def fuzzel(on_change: OnChange = None) -> Optional[str]:
+    return _menu(["fuzzel", "-d", "-p", PROMPT])
+
+
+def dmenu(on_change: OnChange = None) -> Optional[str]:
+    return _menu(["dmenu", "-p", PROMPT])
+
+
+def _keypresses(on_change: Callable[[str], None]) -> Optional[str]:
+    """Read a line from the terminal a keypress at a time, calling on_change when typing pauses."""
+    import termios
+    import tty
+
+    fd = sys.stdin.fileno()
+    saved = termios.tcgetattr(fd)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    text, changed = "", False
+    sys.stdout.write(PROMPT)
+    sys.stdout.flush()
+    try:
+        # TCSANOW keeps what was typed before the prompt appeared
+        tty.setcbreak(fd, termios.TCSANOW)
+        while True:
+            if not select.select([fd], [], [], PAUSE_SECONDS)[0]:
+                if changed:
+                    on_change(text)
+                    changed = False
+                continue
+            keys = decoder.decode(os.read(fd, 64))
+            if keys.startswith("\x1b"):
+                # Arrow keys and the like
+                continue
+            for key in keys:
+                if key in "\r\n":
+                    return text.strip() or None
+                if key == "\x04" and not text:
+                    return None
+                if key in "\x7f\b" and text:
+                    text = text[:-1]
+                    sys.stdout.write("\b \b")
+                elif key.isprintable():
+                    text += key
+                    sys.stdout.write(key)
+                else:
+                    continue
+                changed = True
+            sys.stdout.flush()
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, saved)
+        print()
+
+
+def stdin(on_change: OnChange = None) -> Optional[str]:
+    if on_change is not None and sys.stdin.isatty():
+        return _keypresses(on_change)
+    try:
+        text = input(PROMPT) if sys.stdin.isatty() else sys.stdin.readline()
+    except EOFError:
+        return None
+    return text.strip() or None
+
+
+def qt(on_change: OnChange = None) -> Optional[str]:
+    from PyQt6.QtCore import QTimer
+    from PyQt6.QtWidgets import QApplication, QInputDialog
+
+    # The dialog needs an application to exist while it runs
+    _app = QApplication([])
+    dialog = QInputDialog()
+    dialog.setWindowTitle("Input Dialog")
+    dialog.setLabelText("Enter your text:")
+    if on_change is not None:
+        pause = QTimer(dialog)
+        pause.setSingleShot(True)
+        pause.setInterval(int(PAUSE_SECONDS * 1000))
+        pause.timeout.connect(lambda: on_change(dialog.textValue()))
+        dialog.textValueChanged.connect(lambda _: pause.start())
+    if not dialog.exec():
+        return None
+    return dialog.textValue().strip() or None
+
+
+FRONTENDS: Dict[str, Callable[[OnChange], Optional[str]]] = {
+    "fuzzel": fuzzel,
+    "dmenu": dmenu,
+    "stdin": stdin,
+    "qt": qt,
+}
+
+
+def _graphical() -> bool:
+    return bool(os.environ.get("WAYLAND_DISPLAY") or os.environ.get("DISPLAY"))
+
+
+def available(name: str) -> bool:
+    if name in ("fuzzel", "dmenu"):
+        return _graphical() and shutil.which(name) is not None
+    if name == "qt":
+        return _graphical() and find_spec("PyQt6") is not None
+    return name == "stdin"
+
+
+def choose(name: str = "auto") -> str:
+    """Resolve "auto" to the first available frontend: fuzzel, dmenu, Qt, then stdin."""
+    if name != "auto":
+        return name
+    return next((candidate for candidate in ("fuzzel", "dmenu", "qt") if available(candidate)), "stdin")
+
+
+def read_input(name: str = "auto", on_change: OnChange = None) -> Optional[str]:
+    """Ask for a request with the named frontend, returning None if nothing was entered."""
+    return FRONTENDS[choose(name)](on_change)
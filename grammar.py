@@ -0,0 +1,387 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Compiles the command synopses in the tool docstrings (the lines copied from
+# sway(5), e.g. "floating enable|disable|toggle") into regular expressions, so
+# commands can be checked locally without asking sway or the LLM.
+import re
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+# Placeholders that only ever hold a number.
+NUMERIC_PLACEHOLDERS = {"n", "px", "amount", "msec", "width", "height", "pos_x", "pos_y"}
+# Placeholders that may contain spaces and therefore run to the end of the command.
+REST_PLACEHOLDERS = {"format", "new_name"}
+
+NUMBER_PATTERN = "-?[0-9]+"
+# A quoted string, which may contain spaces, or a single word
+WORD_PATTERN = "(?:\"[^\"]*\"|'[^']*'|[^ ]+)"
+REST_PATTERN = ".+"
+
+_NUMBER = re.compile(NUMBER_PATTERN)
+_TOKEN = re.compile(r"\[|\]|[^\s\[\]]+")
+_WORD = re.compile(r"\"[^\"]*\"|'[^']*'|\S+")
+_CRITERIA = re.compile(r"^\s*(\[[^\]]*\])\s*")
+
+# For every word of a command, the placeholder it fills or "" for a keyword
+Roles = Tuple[str, ...]
+
+
+class Node:
+    def pattern(self) -> str:
+        raise NotImplementedError
+
+    def example(self) -> List[str]:
+        """Return the words of the shortest command matched by this node."""
+        raise NotImplementedError
+
+    def advance(self, words: List[str], positions: Set[int]) -> Set[int]:
+        """Return the positions in words after matching this node from any of positions.
+
+        Past the end of words every node matches without consuming anything,
+        so reaching len(words) means words is a prefix of a valid command.
+        """
+        raise NotImplementedError
+
+    def assign(self, words: List[str], states: Dict[int, Roles]) -> Dict[int, Roles]:
+        """Like advance, but for whole words only, with the placeholder each word went to.
+
+        states maps a position in words to the roles of the words before it:
+        the name of the placeholder a word filled, or "" for a keyword.
+        """
+        raise NotImplementedError
+
+
+def split_words(command: str) -> List[str]:
+    """Split a command into words, keeping a quoted string as one word."""
+    return _WORD.findall(command)
+
+
+def keywords(node: Node) -> Set[str]:
+    """The literal words of a grammar tree."""
+    if isinstance(node, Literal):
+        return {node.word}
+    if isinstance(node, (Choice, Sequence)):
+        children = node.options if isinstance(node, Choice) else node.items
+        return set().union(*(keywords(child) for child in children))
+    if isinstance(node, (Maybe, Repeat)):
+        return keywords(node.body)
+    return set()
+
+
+class Literal(Node):
+    def __init__(self, word: str):
+        self.word = word
+
+    def pattern(self) -> str:
+        return re.escape(self.word)
+
+    def example(self) -> List[str]:
+        return [self.word]
+
+    def advance(self, words: List[str], positions: Set[int]) -> Set[int]:
+        return {p + 1 if p < len(words) else p for p in positions if p == len(words) or words[p] == self.word}
+
+    def assign(self, words: List[str], states: Dict[int, Roles]) -> Dict[int, Roles]:
+        return {p + 1: roles + ("",) for p, roles in states.items() if p < len(words) and words[p] == self.word}
+
+
+class Placeholder(Node):
+    def __init__(self, name: str):
+        self.name = name
+
+    def pattern(self) -> str:
+        if self.name in NUMERIC_PLACEHOLDERS:
+            return NUMBER_PATTERN
+        if self.name in REST_PLACEHOLDERS:
+            return REST_PATTERN
+        return WORD_PATTERN
+
+    def example(self) -> List[str]:
+        if self.name in NUMERIC_PLACEHOLDERS:
+            return ["10"]
+        return [self.name.upper()]
+
+    def advance(self, words: List[str], positions: Set[int]) -> Set[int]:
+        result = set()
+        for p in positions:
+            if p == len(words):
+                result.add(p)
+            elif self.name in REST_PLACEHOLDERS:
+                result.update(range(p + 1, len(words) + 1))
+            elif self.name not in NUMERIC_PLACEHOLDERS or _NUMBER.fullmatch(words[p]):
+                result.add(p + 1)
+        return result
+
+    def assign(self, words: List[str], states: Dict[int, Roles]) -> Dict[int, Roles]:
+        result: Dict[int, Roles] = {}
+        for p, roles in states.items():
+            if p == len(words):
+                continue
+            if self.name in REST_PLACEHOLDERS:
+                for end in range(p + 1, len(words) + 1):
+                    result.setdefault(end, roles + (self.name,) * (end - p))
+            elif self.name not in NUMERIC_PLACEHOLDERS or _NUMBER.fullmatch(words[p]):
+                result.setdefault(p + 1, roles + (self.name,))
+        return result
+
+
+class Choice(Node):
+    def __init__(self, options: List[Node]):
+        self.options = options
+
+    def pattern(self) -> str:
+        return "(?:" + "|".join(option.pattern() for option in self.options) + ")"
+
+    def example(self) -> List[str]:
+        return self.options[0].example()
+
+    def advance(self, words: List[str], positions: Set[int]) -> Set[int]:
+        return set().union(*(option.advance(words, positions) for option in self.options))
+
+    def assign(self, words: List[str], states: Dict[int, Roles]) -> Dict[int, Roles]:
+        result: Dict[int, Roles] = {}
+        for option in self.options:
+            for p, roles in option.assign(words, states).items():
+                result.setdefault(p, roles)
+        return result
+
+
+class Sequence(Node):
+    def __init__(self, items: List[Node]):
+        self.items = items
+
+    def pattern(self) -> str:
+        # Every item carries its own leading space so optional items vanish cleanly.
+        return "".join(
+            item.pattern() if isinstance(item, (Maybe, Repeat)) else " " + item.pattern()
+            for item in self.items
+        )
+
+    def example(self) -> List[str]:
+        return [word for item in self.items for word in item.example()]
+
+    def advance(self, words: List[str], positions: Set[int]) -> Set[int]:
+        for item in self.items:
+            positions = item.advance(words, positions)
+        return positions
+
+    def assign(self, words: List[str], states: Dict[int, Roles]) -> Dict[int, Roles]:
+        for item in self.items:
+            states = item.assign(words, states)
+        return states
+
+
+class Maybe(Node):
+    def __init__(self, body: Sequence):
+        self.body = body
+
+    def pattern(self) -> str:
+        return "(?:" + self.body.pattern() + ")?"
+
+    def example(self) -> List[str]:
+        return []
+
+    def advance(self, words: List[str], positions: Set[int]) -> Set[int]:
+        return positions | self.body.advance(words, positions)
+
+    def assign(self, words: List[str], states: Dict[int, Roles]) -> Dict[int, Roles]:
+        result = dict(states)
+        for p, roles in self.body.assign(words, states).items():
+            result.setdefault(p, roles)
+        return result
+
+
+class Repeat(Node):
+    def __init__(self, body: Node):
+        self.body = body
+
+    def pattern(self) -> str:
+        inner = self.body.pattern()
+        if not isinstance(self.body, (Maybe, Repeat)):
+            inner = " " + inner
+        return "(?:" + inner + ")*"
+
+    def example(self) -> List[str]:
+        return []
+
+    def advance(self, words: List[str], positions: Set[int]) -> Set[int]:
+        result = set(positions)
+        frontier = set(positions)
+        while frontier:
+            frontier = self.body.advance(words, frontier) - result
+            result |= frontier
+        return result
+
+    def assign(self, words: List[str], states: Dict[int, Roles]) -> Dict[int, Roles]:
+        result = dict(states)
+        frontier = dict(states)
+        while frontier:
+            frontier = {p: roles for p, roles in self.body.assign(words, frontier).items() if p not in result}
+            result.update(frontier)
+        return result
+
+
+def _parse_word(word: str) -> Node:
+    options = []
+    for option in word.split("|"):
+        if option.startswith("<") and option.endswith(">"):
+            options.append(Placeholder(option[1:-1]))
+        else:
+            options.append(Literal(option))
+    return options[0] if len(options) == 1 else Choice(options)
+
+
+def _parse_sequence(tokens: List[str], pos: int) -> Tuple[Sequence, int]:
+    items = []
+    while pos < len(tokens) and tokens[pos] != "]":
+        token = tokens[pos]
+        if token == "[":
+            body, pos = _parse_sequence(tokens, pos + 1)
+            if pos >= len(tokens):
+                raise ValueError("Unbalanced '[' in synopsis")
+            items.append(Maybe(body))
+        elif token == "...":
+            if not items:
+                raise ValueError("'...' must follow an element")
+            items.append(Repeat(items[-1]))
+        else:
+            items.append(_parse_word(token))
+        pos += 1
+    return Sequence(items), pos
+
+
+def parse(synopsis: str) -> Sequence:
+    """Parse a sway(5) style synopsis into a grammar tree."""
+    tokens = _TOKEN.findall(synopsis)
+    tree, pos = _parse_sequence(tokens, 0)
+    if pos != len(tokens):
+        raise ValueError("Unbalanced ']' in synopsis")
+    return tree
+
+
+class Synopsis:
+    """One form of a command, e.g. 'focus output up|right|down|left'."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tree = parse(text)
+        # The first element is always the command keyword, which has no
+        # leading space in a real command.
+        self.pattern = "^" + self.tree.pattern()[1:] + "$"
+        self.regex = re.compile(self.pattern)
+
+    def matches(self, command: str) -> bool:
+        return self.regex.match(command) is not None
+
+    def example(self) -> str:
+        return " ".join(self.tree.example())
+
+    def prefix_length(self, words: List[str]) -> int:
+        """Return how many of the leading words can begin a command of this form."""
+        for k in range(len(words), 0, -1):
+            if k in self.tree.advance(words[:k], {0}):
+                return k
+        return 0
+
+    def roles(self, words: List[str]) -> Optional[Roles]:
+        """Return what each of words is in this form, or None if they are not a command of it."""
+        return self.tree.assign(words, {0: ()}).get(len(words))
+
+
+class Grammar:
+    """All the accepted forms of one tool's command."""
+
+    def __init__(self, name: str, synopses: List[Synopsis]):
+        self.name = name
+        self.synopses = synopses
+
+    @property
+    def takes_arguments(self) -> bool:
+        return bool(self.synopses)
+
+    @property
+    def keywords(self) -> Set[str]:
+        """Every literal word of the command's forms."""
+        return set().union(*(keywords(synopsis.tree) for synopsis in self.synopses))
+
+    def match(self, command: str) -> Optional[Synopsis]:
+        command = normalize(command)
+        for synopsis in self.synopses:
+            if synopsis.matches(command):
+                return synopsis
+        return None
+
+    def matches(self, command: str) -> bool:
+        return self.match(command) is not None
+
+    def roles(self, command: str) -> Optional[Roles]:
+        """Return what each word of a command is in the first form it matches, or None."""
+        words = split_words(normalize(command))
+        for synopsis in self.synopses:
+            if synopsis.matches(" ".join(words)):
+                roles = synopsis.roles(words)
+                if roles is not None:
+                    return roles
+        return None
+
+    @property
+    def pattern(self) -> str:
+        return "|".join(f"(?:{synopsis.pattern})" for synopsis in self.synopses)
+
+    def explain(self, command: str) -> str:
+        """Say where a command that does not match stops following the grammar."""
+        words = split_words(normalize(command))
+        valid = max((synopsis.prefix_length(words) for synopsis in self.synopses), default=0)
+        forms = "; ".join(synopsis.text for synopsis in self.synopses)
+        if not words:
+            return f"missing command, expected: {forms}"
+        if valid == len(words):
+            return f"'{' '.join(words)}' is incomplete, expected: {forms}"
+        if valid == 0:
+            return f"'{words[0]}' is not a {self.name} command, expected: {forms}"
+        return f"unexpected '{words[valid]}' after '{' '.join(words[:valid])}', expected: {forms}"
+
+
+def split_criteria(command: str) -> Tuple[str, str]:
+    """Split a leading '[criteria]' from a command."""
+    match = _CRITERIA.match(command)
+    if not match:
+        return "", command.strip()
+    return match.group(1), command[match.end():].strip()
+
+
+def normalize(command: str) -> str:
+    """Collapse whitespace and drop any leading criteria."""
+    _, command = split_criteria(command)
+    return " ".join(command.split())
+
+
+def from_docstring(name: str, doc: Optional[str]) -> Grammar:
+    """Build the grammar of a tool from the synopsis lines in its docstring."""
+    synopses = []
+    line_regex = re.compile(r"^ {7}(" + re.escape(name) + r"(?: .*)?)$")
+    for line in (doc or "").splitlines():
+        match = line_regex.match(line.rstrip())
+        if match:
+            synopses.append(Synopsis(match.group(1)))
+    return Grammar(name, synopses)
+
+
+def compile_tools(tools: Dict[str, Callable]) -> Dict[str, Grammar]:
+    """Compile the grammar of every tool in full_tools."""
+    return {name: from_docstring(name, function.__doc__) for name, function in tools.items()}
+
+
+def json_pattern(grammars: List[Grammar]) -> str:
+    """One anchored regex accepting any command of the given grammars.
+
+    Written in the regex subset that JSON schema string patterns are turned
+    into sampling grammars with (llama.cpp, and so Ollama), which has plain
+    groups but no '(?:' groups.
+    """
+    alternatives = []
+    for tool_grammar in grammars:
+        if tool_grammar.takes_arguments:
+            alternatives.extend(synopsis.pattern[1:-1] for synopsis in tool_grammar.synopses)
+        else:
+            alternatives.append(re.escape(tool_grammar.name))
+    return re.sub(r"(?<!\\)\(\?:", "(", "^(" + "|".join(alternatives) + ")$")
@@ -0,0 +1,145 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Keeping the model loaded and its prompt cached. Ollama unloads a model after
+# keep_alive without requests, and reuses the evaluated prompt of the previous
+# request as far as the new one starts the same way; the agent prompts put the
+# tools and the static system message first for this. warm_up() loads the
+# model and evaluates that prefix before the first request, and ModelMetrics
+# records how long every call spent loading the model and evaluating the prompt.
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+from uuid import UUID
+
+from tracing import percentile
+
+# How long Ollama keeps the model loaded after a request; the server default is 5m
+DEFAULT_KEEP_ALIVE = "30m"
+# A call that spent longer than this loading the model found it unloaded
+COLD_LOAD_SECONDS = 0.25
+
+
+def parse_keep_alive(value: str) -> Union[int, str]:
+    """Ollama takes seconds as a number, or a duration like "10m"; -1 keeps the model loaded forever."""
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def _ms(values: List[float]) -> Dict[str, float]:
+    return {"p50": round(percentile(values, 50) * 1000, 2), "p95": round(percentile(values, 95) * 1000, 2),
+            "max": round(max(values, default=0.0) * 1000, 2)}
+
+
+class ModelMetrics:
+    """Load time, prompt evaluation (prefill) time and time to first token of every model call, by model.
+
+    Ollama only counts the prompt tokens it had to evaluate, so a falling
+    prompt_tokens_evaluated means the prefix cache is being hit.
+    """
+
+    def __init__(self):
+        self.calls: Dict[str, List[Dict[str, float]]] = {}
+        self.warmups: List[Dict[str, Any]] = []
+        self.lock = threading.Lock()
+
+    def record(self, model: Optional[str], info: Dict[str, Any], ttft: Optional[float] = None):
+        """Record a call from the final chunk's durations, which Ollama gives in nanoseconds."""
+        if "load_duration" not in info and "prompt_eval_duration" not in info:
+            return
+        call = {"load": (info.get("load_duration") or 0) / 1e9,
+                "prefill": (info.get("prompt_eval_duration") or 0) / 1e9,
+                "prompt_tokens": info.get("prompt_eval_count") or 0}
+        if ttft is not None:
+            call["ttft"] = ttft
+        with self.lock:
+            self.calls.setdefault(model or "unknown", []).append(call)
+
+    def warmed_up(self, model: Optional[str], seconds: float, info: Dict[str, Any]):
+        with self.lock:
+            self.warmups.append({"model": model, "seconds": round(seconds, 3),
+                                 "load_ms": round((info.get("load_duration") or 0) / 1e6, 2),
+                                 "prefix_tokens": info.get("prompt_eval_count")})
+
+    def summary(self) -> Dict[str, Any]:
+        with self.lock:
+            calls = {model: list(values) for model, values in self.calls.items()}
+            warmups = list(self.warmups)
+        models = {}
+        for model, values in calls.items():
+            models[model] = {
+                "calls": len(values),
+                "cold_loads": sum(1 for call in values if call["load"] > COLD_LOAD_SECONDS),
+                "load_ms": _ms([call["load"] for call in values]),
+                "prefill_ms": _ms([call["prefill"] for call in values]),
+                "ttft_ms": _ms([call["ttft"] for call in values if "ttft" in call]),
+                "prompt_tokens_evaluated": round(sum(call["prompt_tokens"] for call in values) / len(values), 1),
+            }
+        return {"models": models, "warmups": warmups}
+
+
+def callback_handler(metrics: ModelMetrics):
+    """Return a LangChain callback handler that records every chat model call in metrics."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class MetricsCallbackHandler(BaseCallbackHandler):
+        run_inline = True
+
+        def __init__(self):
+            self.runs: Dict[UUID, Dict[str, Any]] = {}
+
+        def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id: UUID, **kwargs: Any):
+            model = (kwargs.get("metadata") or {}).get("ls_model_name")
+            self.runs[run_id] = {"start": time.perf_counter(), "model": model}
+
+        def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any):
+            run = self.runs.get(run_id)
+            if run is not None and "first_token" not in run:
+                run["first_token"] = time.perf_counter()
+
+        def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any):
+            run = self.runs.pop(run_id, None)
+            if run is None or not response.generations or not response.generations[0]:
+                return
+            info = response.generations[0][0].generation_info or {}
+            ttft = run["first_token"] - run["start"] if "first_token" in run else None
+            metrics.record(run["model"], info, ttft)
+
+        def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+            # Abandoned streams never get the final chunk with the durations
+            self.runs.pop(run_id, None)
+
+    return MetricsCallbackHandler()
+
+
+def _single_token(model, kwargs: Dict[str, Any]):
+    """A copy of model that generates a single token, and the keyword arguments to call it with.
+
+    model may be bound to tools with bind_tools(), which are then sent too so
+    the cached prefix is the one requests start with.
+    """
+    bound = getattr(model, "bound", model)
+    # num_predict is a sampling option, so the loaded model is reused by requests
+    return bound.model_copy(update={"num_predict": 1}), {**getattr(model, "kwargs", {}), **kwargs}
+
+
+def warm_up(model, messages: List[Any], metrics: Optional[ModelMetrics] = None, **kwargs: Any) -> Dict[str, Any]:
+    """Load the model and have Ollama evaluate messages, returning the durations it reported."""
+    bound = getattr(model, "bound", model)
+    single, kwargs = _single_token(model, kwargs)
+    start = time.perf_counter()
+    message = single.invoke(messages, **kwargs)
+    seconds = time.perf_counter() - start
+    info = dict(getattr(message, "response_metadata", {}) or {})
+    if metrics is not None:
+        metrics.warmed_up(getattr(bound, "model", None), seconds, info)
+    print(f"Warmed up {getattr(bound, 'model', 'the model')} in {seconds:.2f}s "
+          f"(load {(info.get('load_duration') or 0) / 1e9:.2f}s, {info.get('prompt_eval_count')} prompt tokens)")
+    return info
+
+
+async def aprefill(model, messages: List[Any], **kwargs: Any):
+    """Have Ollama evaluate messages into its prompt cache; cancelling this stops the evaluation."""
+    single, kwargs = _single_token(model, kwargs)
+    await single.ainvoke(messages, **kwargs)
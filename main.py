@@ -1,19 +1,97 @@
 # SwayTalk - © Sarthak Shah (matchcase), 2025
 # Licensed under GPLv3 or Later.
-from langchain_ollama import ChatOllama
+import time
+# Taken before the heavy imports, to trace how long they take
+_import_start = time.perf_counter()
+
+from langchain_core.language_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import ConfigurableField
-from langchain_core.tools import tool, BaseTool
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from typing import List, Dict, Any, Optional, Callable, Type
-from langchain.callbacks.manager import CallbackManagerForToolRun
-from PyQt6.QtWidgets import QApplication, QInputDialog
-
-from i3ipc import Connection
-
-import subprocess
-
-sway = Connection()
+from langchain_core.tools import tool, BaseTool, StructuredTool
+from typing import List, Dict, Any, Optional, Callable, Tuple, Type, Union, TYPE_CHECKING
+from langchain_core.callbacks.manager import CallbackManagerForToolRun
+from pydantic import ValidationError
+
+from i3ipc import Connection, aio
+
+import argparse
+import asyncio
+import importlib
+import resource
+import sys
+import threading
+from collections import Counter
+
+import cache
+import cards
+import daemon
+import frontends
+import grammar
+import lifecycle
+import profiles
+import retrieval
+import scheduler
+import speculation
+import tracing
+from cache import CommandCache
+from cascade import Cascade, Tier
+from constrained import ConstrainedExecutor, command_list
+from executor import LeanExecutor
+from pipeline import CommandPipeline
+from tree import TreeMirror
+from validator import Validator
+from windows import WindowIndex
+from fastpath import FastPath
+from retrieval import ToolIndex
+from schemas import TOOL_SCHEMAS, terse_schema
+from tracing import tracer
+
+_import_end = time.perf_counter()
+
+if TYPE_CHECKING:
+    from langchain.agents import AgentExecutor
+
+# Imported on first use: a request the fast path or the cache handles needs
+# none of them, and they take most of the start-up time and memory
+LAZY_MODULES = ("langchain_ollama", "langchain.agents", "PyQt6.QtWidgets")
+
+
+def lazy_import(name: str):
+    """Import one of LAZY_MODULES, tracing how long it took the first time."""
+    if name in sys.modules:
+        return sys.modules[name]
+    with tracer.span("import", module=name):
+        return importlib.import_module(name)
+
+class LazyConnection:
+    """A sway Connection that connects on first use, so --profile-imports works without sway."""
+
+    def __init__(self):
+        self._connection: Optional[Connection] = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        with self._lock:
+            if self._connection is None:
+                self._connection = Connection()
+        return getattr(self._connection, name)
+
+
+sway = LazyConnection()
+pipeline = CommandPipeline(sway)
+
+
+def sway_command(command: str):
+    """Send a command to sway, raising an error if sway rejects any part of it."""
+    pipeline.send(command)
+
+
+def with_keyword(keyword: str, criteria: str) -> str:
+    """Put the command keyword in front of the arguments, after any [criteria], unless it is already there."""
+    prefix, command = grammar.split_criteria(criteria)
+    if command.split(" ", 1)[0] != keyword:
+        command = f"{keyword} {command}".strip()
+    return f"{prefix} {command}".strip()
 
 
 def border(criteria: str):
@@ -28,16 +106,15 @@ def border(criteria: str):
        border toggle
            Cycles through the available border styles.
     """
-    if "border" not in criteria:
-        criteria = "border " + criteria
-    sway.command(criteria)
+    criteria = with_keyword("border", criteria)
+    sway_command(criteria)
 
 
 def exit():
     """
     This function exits the window manager.
     """
-    sway.command("exit")
+    sway_command("exit")
 
 
 def floating(criteria: str):
@@ -46,9 +123,8 @@ def floating(criteria: str):
        floating enable|disable|toggle
            Make focused view floating, non-floating, or the opposite of what it is now.
     """
-    if "floating" not in criteria:
-        criteria = "floating " + criteria
-    sway.command(criteria)
+    criteria = with_keyword("floating", criteria)
+    sway_command(criteria)
     
 
 def focus(criteria: str):
@@ -83,9 +159,8 @@ def focus(criteria: str):
        focus mode_toggle
 	  Moves focus between the floating and tiled layers.
     """
-    if "focus" not in criteria:
-        criteria = "focus " + criteria
-    sway.command(criteria)
+    criteria = with_keyword("focus", criteria)
+    sway_command(criteria)
 
 
 def fullscreen(criteria: str):
@@ -95,9 +170,8 @@ def fullscreen(criteria: str):
            Makes focused view fullscreen, non-fullscreen, or the opposite of what it is now. If no argument  is  given,  it
            does the same as toggle. If global is specified, the view will be fullscreen across all outputs.
     """
-    if "fullscreen" not in criteria:
-        criteria = "fullscreen " + criteria
-    sway.command(criteria)
+    criteria = with_keyword("fullscreen", criteria)
+    sway_command(criteria)
 
 
 def gaps(criteria: str):
@@ -107,9 +181,8 @@ def gaps(criteria: str):
            Changes  the  inner  or outer gaps for either all workspaces or the current workspace. outer gaps can be altered
            per side with top, right, bottom, and left or per direction with horizontal and vertical.
     """
-    if "gaps" not in criteria:
-        criteria = "gaps" + criteria
-    sway.command(criteria)
+    criteria = with_keyword("gaps", criteria)
+    sway_command(criteria)
 
 
 def inhibit_idle(criteria: str):
@@ -124,9 +197,8 @@ def inhibit_idle(criteria: str):
            This can also be used with criteria to set an idle inhibitor for any existing view or  with  for_window  to  set
            idle inhibitors for future views.
     """
-    if "inhibit_idle" not in criteria:
-        criteria = "inhibit_idle" + criteria
-    sway.command(criteria)
+    criteria = with_keyword("inhibit_idle", criteria)
+    sway_command(criteria)
 
 
 def layout(criteria: str):
@@ -148,9 +220,8 @@ def layout(criteria: str):
        layout toggle [split|tabbed|stacking|splitv|splith] [split|tabbed|stacking|splitv|splith]...
            Cycles the layout mode of the focused container through a list of layouts.
     """
-    if "layout" not in criteria:
-        criteria = "layout" + criteria
-    sway.command(criteria)
+    criteria = with_keyword("layout", criteria)
+    sway_command(criteria)
 
 
 def max_render_time(max_criteria: str):
@@ -171,9 +242,8 @@ def max_render_time(max_criteria: str):
            2.  Put the target application in full-screen and have it continuously render something.
            3.  Start by setting max_render_time 1. If the application drops frames, increment by 1.
     """
-    if "max_render_time" not in max_criteria:
-        max_criteria = "max_render_time" + max_criteria
-    sway.command(max_criteria)
+    max_criteria = with_keyword("max_render_time", max_criteria)
+    sway_command(max_criteria)
 
 
 def allow_tearing(criteria: str):
@@ -186,9 +256,8 @@ def allow_tearing(criteria: str):
            When  yes  is  specified,  the application allows tearing regardless of the tearing hints. When no is specified,
            tearing will never be allowed on the application, regardless of the tearing hints.
     """
-    if "allow_tearing" not in criteria:
-        criteria = "allow_tearing" + criteria
-    sway.command(criteria)
+    criteria = with_keyword("allow_tearing", criteria)
+    sway_command(criteria)
     
 
 def move(criteria: str):
@@ -249,16 +318,15 @@ def move(criteria: str):
        move workspace to [output] up|right|down|left
 	  Moves the focused workspace to next output in the specified direction.
     """
-    if "move" not in criteria:
-        criteria = "move " + criteria
-    sway.command(criteria)
+    criteria = with_keyword("move", criteria)
+    sway_command(criteria)
 
 
 def reload():
     """
     This function reloads the sway config file and applies any changes.
     """
-    sway.command("reload")
+    sway_command("reload")
 
 
 def rename(criteria: str):
@@ -267,9 +335,8 @@ def rename(criteria: str):
        rename workspace [<old_name>] to <new_name>
            Rename either <old_name> or the focused workspace to the <new_name>
     """
-    if "rename" not in criteria:
-        criteria = "rename" + criteria
-    sway.command(criteria)
+    criteria = with_keyword("rename", criteria)
+    sway_command(criteria)
 
 
 def resize(criteria: str):
@@ -295,16 +362,15 @@ def resize(criteria: str):
            units  are  omitted, floating containers are resized in px and tiled containers by ppt. If width or height is 0,
            the container will not be resized on that axis.
     """
-    if "resize" not in criteria:
-        criteria = "resize" + criteria
-    sway.command(criteria)
+    criteria = with_keyword("resize", criteria)
+    sway_command(criteria)
 
 
 def scratchpad():
     """
     This commands shows the scratchpad.
     """
-    sway.command("scratchpad show")
+    sway_command("scratchpad show")
 
 
 def shortcuts_inhibitor(criteria: str):
@@ -318,9 +384,8 @@ def shortcuts_inhibitor(criteria: str):
            per-seat defaults established by the seat subcommand of the same name. See sway-input(5) for more ways to affect
            inhibitors.
     """
-    if "shortcuts_inhibitor" not in criteria:
-        criteria = "shortcuts_inhibitor" + criteria
-    sway.command(criteria)
+    criteria = with_keyword("shortcuts_inhibitor", criteria)
+    sway_command(criteria)
 
 
 def split(criteria: str):
@@ -331,9 +396,8 @@ def split(criteria: str):
            is undone if the current container is the only child of a split parent. When toggle is  specified,  the  current
            container is split opposite to the parent container's layout.
     """
-    if "split" not in criteria:
-        criteria = "split" + criteria
-    sway.command(criteria)
+    criteria = with_keyword("split", criteria)
+    sway_command(criteria)
 
 
 def sticky(criteria: str):
@@ -342,9 +406,8 @@ def sticky(criteria: str):
        sticky enable|disable|toggle
            "Sticks" a floating window to the current output so that it shows up on all workspaces.
     """
-    if "sticky" not in criteria:
-        criteria = "sticky" + criteria
-    sway.command(criteria)
+    criteria = with_keyword("sticky", criteria)
+    sway_command(criteria)
 
 
 def swap(criteria: str):
@@ -357,9 +420,8 @@ def swap(criteria: str):
            space  or  the  second  container  becomes fullscreen on the same workspace as the first container. In either of
            those cases, the second container will gain focus.
     """
-    if "swap" not in criteria:
-        criteria = "swap" + criteria
-    sway.command(criteria)
+    criteria = with_keyword("swap", criteria)
+    sway_command(criteria)
 
 
 def title_format(criteria: str):
@@ -383,9 +445,8 @@ def title_format(criteria: str):
 
            The default format is "%title".
     """
-    if "title_format" not in criteria:
-        criteria = "title_format" + criteria
-    sway.command(criteria)
+    criteria = with_keyword("title_format", criteria)
+    sway_command(criteria)
    
 # Create a dictionary to store full function objects with their docstrings
 full_tools = {
@@ -411,6 +472,11 @@ full_tools = {
     "title_format": title_format,
 }
 
+# Grammars compiled from the synopsis lines of each docstring
+grammars = grammar.compile_tools(full_tools)
+# Repairs or rejects arguments before they are sent to sway
+validator = Validator(grammars)
+
 # Create simplified versions of tools with minimal descriptions
 def create_simplified_tool(tool_name: str, tool_description: str) -> BaseTool:
     """Create a simplified version of a tool with just its name and a brief description."""
@@ -452,6 +518,28 @@ simplified_tools = [
     for name, desc in tool_descriptions.items()
 ]
 
+# "full" documents the tools with their docstrings and described schemas, "card"
+# with grammar cards compiled from the docstrings instead, and "terse" with only
+# the synopsis lines and bare schemas: fewer prompt tokens, fewer hints
+VERBOSITIES = ("full", "card", "terse")
+verbosity = "card"
+card_budget = cards.DEFAULT_BUDGET
+# Loaded from the cache, or compiled, by tool_documentation() when first needed
+tool_cards: Optional[Dict[str, str]] = None
+
+
+def tool_documentation(tool_name: str) -> str:
+    """What get_docstring tells the model about a tool, at the current verbosity."""
+    global tool_cards
+    if verbosity == "full":
+        return full_tools[tool_name].__doc__
+    if verbosity == "terse":
+        return command_list([grammars[tool_name]])
+    if tool_cards is None:
+        tool_cards = cards.load_or_compile(full_tools, grammars, card_budget, cards.default_path())
+    return tool_cards[tool_name]
+
+
 class GetDocstringTool(BaseTool):
     name: str = "get_docstring"
     description: str = "Get the full documentation for a specific tool"
@@ -472,9 +560,59 @@ class GetDocstringTool(BaseTool):
         if tool_name not in full_tools:
             return f"Tool '{tool_name}' not found. Available tools: {', '.join(full_tools.keys())}"
         
-        tool_doc = full_tools[tool_name].__doc__
+        tool_doc = tool_documentation(tool_name)
         return f"Documentation for {tool_name}:\n{tool_doc}\n\nNow you can execute this tool with: execute_code(tool_name=\"{tool_name}\", arguments=\"your_args\")"
 
+def target_window(tool_name: str, arguments: str, window: str) -> Tuple[str, Optional[str]]:
+    """Prefix a command with the criteria of the window a phrase like 'the browser' refers to."""
+    if window_index is None:
+        return arguments, "Window lookup is not available, leave out window to act on the focused window."
+    criteria = window_index.resolve(window)
+    if criteria is None:
+        names = ", ".join(sorted(set(window_index.names().values())))
+        return arguments, f"No window matches '{window}'. Open windows: {names}"
+    command = arguments.strip()
+    if command.split(" ", 1)[0] != tool_name:
+        command = f"{tool_name} {command}".strip()
+    return f"{criteria} {command}", None
+
+
+def execute_tool(tool_name: str, arguments: str = "", window: str = "") -> Optional[str]:
+    """Run an entry of full_tools, returning an error message if it fails."""
+    if tool_name not in full_tools:
+        return f"Tool '{tool_name}' not found. Available tools: {', '.join(full_tools.keys())}"
+
+    command, error = validator.check(tool_name, arguments, bare=bool(window))
+    if error:
+        return f"Invalid arguments for {tool_name}: {error}"
+    arguments = command
+
+    # Commands that succeed are recorded in pipeline.succeeded under this tag.
+    # The window phrase is kept instead of the con_id, which is only valid until the window closes.
+    pipeline.tag = (tool_name, arguments, window) if window else (tool_name, arguments)
+    if window and grammars[tool_name].takes_arguments:
+        arguments, error = target_window(tool_name, arguments, window)
+        if error:
+            pipeline.tag = None
+            return error
+    try:
+        if arguments:
+            return full_tools[tool_name](arguments)
+        else:
+            return full_tools[tool_name]()
+    except Exception as e:
+        return f"Error executing {tool_name}: {str(e)}"
+    finally:
+        pipeline.tag = None
+
+
+def ran(tool_name: str, arguments: str) -> str:
+    """Say which command ran, whether or not its arguments start with the keyword."""
+    _, command = grammar.split_criteria(arguments)
+    if command.split(" ", 1)[0] != tool_name:
+        command = f"{tool_name} {command}".strip()
+    return f"Ran {command}"
+
 class ExecuteToolTool(BaseTool):
     name: str = "execute_code"
     description: str = "Execute a tool after reviewing its documentation"
@@ -483,6 +621,7 @@ class ExecuteToolTool(BaseTool):
         self, 
         tool_name: str,
         arguments: str = "",
+        window: str = "",
         run_manager: Optional[CallbackManagerForToolRun] = None
     ) -> str:
         """Execute a tool with the provided arguments.
@@ -490,22 +629,59 @@ class ExecuteToolTool(BaseTool):
         Args:
             tool_name: The name of the tool to execute
             arguments: The arguments to pass to the tool
+            window: Name of the window to act on, such as "the browser". Leave empty for the focused window.
             
         Returns:
             The result of executing the tool
         """
-        if tool_name not in full_tools:
-            return f"Tool '{tool_name}' not found. Available tools: {', '.join(full_tools.keys())}"
-        
-        try:
-            if arguments:
-                return full_tools[tool_name](arguments)
-            else:
-                return full_tools[tool_name]()
-        except Exception as e:
-            return f"Error executing {tool_name}: {str(e)}"
-
-all_tools = simplified_tools + [GetDocstringTool(), ExecuteToolTool()]
+        return execute_tool(tool_name, arguments, window) or ran(tool_name, arguments)
+
+# The tools bound with any --top-k come first, so they stay in the prompt prefix Ollama has cached
+all_tools = [GetDocstringTool(), ExecuteToolTool()] + simplified_tools
+
+def typed_call(tool_name: str, kwargs: Dict[str, Any]) -> Tuple[Optional[Tuple[str, ...]], Optional[str]]:
+    """Turn typed tool arguments into the arguments of execute_tool, or return why they are invalid."""
+    if tool_name not in TOOL_SCHEMAS:
+        return None, f"Tool '{tool_name}' not found. Available tools: {', '.join(TOOL_SCHEMAS.keys())}"
+    try:
+        args = TOOL_SCHEMAS[tool_name](**kwargs)
+    except ValidationError as e:
+        return None, f"Invalid arguments for {tool_name}: {e}"
+    command = args.command()
+    window = getattr(args, "window", None) or ""
+    # A bare keyword like "focus" is valid once criteria pick the window
+    if command and not (window and command == tool_name) and not grammars[tool_name].matches(command):
+        return None, f"Invalid arguments for {tool_name}: '{command}'"
+    return ((tool_name, command, window) if window else (tool_name, command)), None
+
+
+# Create typed versions of tools that take their arguments directly
+def create_typed_tool(tool_name: str, tool_description: str, terse: bool = False) -> BaseTool:
+    """Create a tool whose arguments are described by a typed schema instead of a docstring.
+
+    With terse the model is only sent the bare JSON schema; the arguments are
+    validated against the typed schema by typed_call either way.
+    """
+    schema = TOOL_SCHEMAS[tool_name]
+
+    def run(**kwargs: Any) -> str:
+        call, error = typed_call(tool_name, kwargs)
+        if error:
+            return error
+        return execute_tool(*call) or ran(tool_name, call[1])
+
+    return StructuredTool.from_function(
+        func=run,
+        name=tool_name,
+        description=tool_description,
+        args_schema=terse_schema(schema) if terse else schema,
+        handle_validation_error=lambda e: f"Invalid arguments for {tool_name}: {e}",
+    )
+
+typed_tools = [
+    create_typed_tool(name, desc)
+    for name, desc in tool_descriptions.items()
+]
 
 prompt = ChatPromptTemplate.from_messages([
     ("system", """You are an LLM agent that runs commands to manage the Sway window manager.
@@ -524,29 +700,707 @@ If a user asks you to perform an action like "focus on the next window", you MUS
 1. First call get_docstring for the relevant tool (get_docstring(tool_name="focus"))
 2. Then call execute_code with the proper arguments (execute_code(tool_name="focus", arguments="next"))
 
+If the request asks for several things, such as "make this fullscreen and then focus the terminal",
+call get_docstring for all the tools needed in one response, then execute_code for all of them in the next,
+in the order they should run. The request is finished once they have run.
+
+To act on a window other than the focused one, also pass its name as window, for example:
+    execute_code(tool_name="move", arguments="to workspace 2", window="firefox")
+
 Remember: All outputs are strings. Only use the tools provided.
 **VERY IMPORTANT**:
 THE OUTPUTS SHOULD ONLY BE TOOL CALLS.
 DO NOT OUTPUT ANYTHING OTHER THAN CALL TOOLS.
-DO NOT PROVIDE MULTIPLE EXAMPLES, FOCUS ON ONLY EXECUTING THE BEST ACTION.
+DO NOT PROVIDE MULTIPLE EXAMPLES, FOCUS ON ONLY EXECUTING THE BEST ACTION FOR EACH THING ASKED.
 
 When what the user requested is ambiguous, assume that they are talking about the focused window and execute the most likely desired action.
 """), 
+    ("placeholder", "{context}"),
     ("human", "{input}"), 
     ("placeholder", "{agent_scratchpad}"),
 ])
 
-llm = ChatOllama(model="mistral-nemo", temperature=0)
+typed_prompt = ChatPromptTemplate.from_messages([
+    ("system", """You are an LLM agent that runs commands to manage the Sway window manager.
+This is VERY IMPORTANT: your response should be brief, and only contain tool calls.
 
-agent = create_tool_calling_agent(llm, all_tools, prompt)
-agent_executor = AgentExecutor(agent=agent, tools=all_tools, verbose=True)
+Every tool runs one sway command. Call the tool that performs the user's request with the right arguments.
+If the request asks for several things, call a tool for each of them, all in the same response and in the order they should run.
+Call each only once. After they have run, do not call any more tools and do not output anything else.
+To act on a window other than the focused one, pass its name as window, for example window="firefox".
 
-# result = subprocess.run(["fuzzel", "-d", "-p", "> "], capture_output=True, text=True)
-# if result.returncode == 0:
-#     agent_executor.invoke({"input": f"{result.stdout.strip()}"})
-app = QApplication([])
-text, ok = QInputDialog.getText(None, "Input Dialog", "Enter your text:")
-if ok:
-    agent_executor.invoke({"input": text})
-else:
-    print("No input provided.")
+When what the user requested is ambiguous, assume that they are talking about the focused window and execute the most likely desired action.
+"""),
+    ("placeholder", "{context}"),
+    ("human", "{input}"),
+    ("placeholder", "{agent_scratchpad}"),
+])
+
+grammar_prompt = ChatPromptTemplate.from_messages([
+    ("system", """You translate requests into commands for the Sway window manager.
+Answer with JSON only: {{"commands": [{{"command": "...", "window": "..."}}]}}.
+Use one command unless the request asks for several things. Every command must follow one of the forms listed below,
+with <placeholders> and [optional parts] filled in or left out and | choosing one alternative.
+Set window to the name of the window to act on, such as "firefox", or leave it out for the focused window.
+
+When what the user requested is ambiguous, assume that they are talking about the focused window and execute the most likely desired action.
+"""),
+    ("system", "Commands:\n{commands}"),
+    ("placeholder", "{context}"),
+    ("human", "{input}"),
+])
+
+# Tool mode -> (tools, prompt). "docstring" looks up the docstring before every
+# call, "typed" gives the model typed arguments so it can act in one call, and
+# "grammar" has the model write the command itself, constrained to the grammars.
+TOOL_MODES = {
+    "docstring": (all_tools, prompt),
+    "typed": (typed_tools, typed_prompt),
+    "grammar": ([], grammar_prompt),
+}
+
+model = "mistral-nemo"
+# Built by agent_llm() when the first request needs the model
+llm: Optional[BaseChatModel] = None
+# Sent with every model call, so Ollama keeps the model loaded this long after each request
+keep_alive: Union[int, str] = lifecycle.DEFAULT_KEEP_ALIVE
+
+
+def chat_model(name: str) -> BaseChatModel:
+    # The timeout bounds a model call that hangs, which the executors cannot interrupt
+    return lazy_import("langchain_ollama").ChatOllama(model=name, temperature=0, keep_alive=keep_alive,
+                                                      client_kwargs={"timeout": max_seconds})
+
+
+def agent_llm() -> BaseChatModel:
+    global llm
+    if llm is None:
+        llm = chat_model(model)
+    return llm
+
+
+# "lean" is LeanExecutor, with a step and time budget per request, "agent" is
+# LangChain's AgentExecutor
+executor_kind = "lean"
+max_steps = 4
+max_seconds = 30.0
+# Read the model's answer as it is generated and run commands as soon as they are complete
+stream = False
+# Print the tools selected for every request
+verbose = False
+
+
+def build_agent_executor(tools: List[BaseTool], agent_prompt: ChatPromptTemplate) -> Union["AgentExecutor", LeanExecutor, ConstrainedExecutor]:
+    llm = agent_llm()
+    if tool_mode == "grammar":
+        return ConstrainedExecutor(llm, grammars, agent_prompt, run=run_calls, select=relevant_tools, arun=arun_calls,
+                                   stream=stream)
+    if executor_kind == "lean":
+        # The tools whose calls send commands; in docstring mode the others only return documentation
+        dispatch = ["execute_code"] if tool_mode == "docstring" else [t.name for t in tools]
+        return LeanExecutor(llm, tools, agent_prompt, handled=lambda: bool(pipeline.succeeded),
+                            max_steps=max_steps, max_seconds=max_seconds, batch=pipeline.batch,
+                            abatch=pipeline.abatch, stream=stream, dispatch=dispatch)
+    agents = lazy_import("langchain.agents")
+    agent = agents.create_tool_calling_agent(llm, tools, agent_prompt)
+    return agents.AgentExecutor(agent=agent, tools=tools, verbose=True)
+
+
+tool_mode = "docstring"
+# The agent with all tools of the tool mode, built by default_agent() when first needed
+agent_executor: Optional[Union["AgentExecutor", LeanExecutor, ConstrainedExecutor]] = None
+
+
+# The warm-up and speculation threads build agents too
+_agent_lock = threading.RLock()
+
+
+def default_agent() -> Union["AgentExecutor", LeanExecutor, ConstrainedExecutor]:
+    global agent_executor
+    with _agent_lock:
+        if agent_executor is None:
+            agent_executor = build_agent_executor(*TOOL_MODES[tool_mode])
+        return agent_executor
+
+# When set, only the top_k tools most relevant to a request are bound to the agent. The
+# tools are rendered at the start of the prompt, so a different set for every request
+# misses the prefix cached by the warm-up and by speculation; 0 binds all of them.
+tool_index: Optional[ToolIndex] = None
+top_k = 0
+# Agents already built for a (tool mode, tool names) combination
+_selected_agents: Dict[Tuple[str, str, Tuple[str, ...]], Union["AgentExecutor", LeanExecutor]] = {}
+
+
+def load_tool_index() -> ToolIndex:
+    documents = retrieval.tool_documents(full_tools, tool_descriptions)
+    return retrieval.load_or_build(documents, retrieval.default_path(documents))
+
+
+def relevant_tools(text: str) -> Optional[List[str]]:
+    """The names of the top_k tools most relevant to a request, or None without an index."""
+    return tool_index.search(text, top_k) if tool_index is not None else None
+
+
+def agent_for(text: str) -> Union["AgentExecutor", LeanExecutor, ConstrainedExecutor]:
+    """Return an agent with the tools relevant to this request, or all of them without an index."""
+    if tool_index is None or tool_mode == "grammar":
+        # The constrained executor selects the tools itself
+        return default_agent()
+    relevant = set(relevant_tools(text))
+    tools, agent_prompt = TOOL_MODES[tool_mode]
+    selected = [t for t in tools if t.name in relevant or t.name not in full_tools]
+    key = (executor_kind, tool_mode, tuple(t.name for t in selected))
+    if verbose:
+        print(f"Selected tools: {', '.join(name for name in key[2] if name in full_tools)}")
+    with _agent_lock:
+        if key not in _selected_agents:
+            _selected_agents[key] = build_agent_executor(selected, agent_prompt)
+        return _selected_agents[key]
+
+
+def set_verbosity(level: str):
+    """Document the tools at this verbosity, dropping the agents built with the tools before."""
+    global agent_executor, typed_tools, verbosity
+    with _agent_lock:
+        verbosity = level
+        typed_tools = [create_typed_tool(name, desc, terse=level == "terse")
+                       for name, desc in tool_descriptions.items()]
+        TOOL_MODES["typed"] = (typed_tools, typed_prompt)
+        agent_executor = None
+        _selected_agents.clear()
+
+# Mirror of the sway tree, used to tell the agent what is on screen
+tree_mirror: Optional[TreeMirror] = None
+window_index: Optional[WindowIndex] = None
+context_tokens = 200
+
+
+def agent_inputs(text: str) -> Dict[str, Any]:
+    inputs: Dict[str, Any] = {"input": text}
+    if tree_mirror is not None:
+        inputs["context"] = [("system", "Current layout:\n" + tree_mirror.summary(context_tokens))]
+    return inputs
+
+
+# Smaller models that get to handle a request before the agent does
+cascade: Optional[Cascade] = None
+
+
+def cascade_call(tool_name: str, kwargs: Dict[str, Any]) -> Tuple[Optional[Tuple[str, ...]], Optional[str]]:
+    """Validate a tool call proposed by a cascade tier, including the window it names."""
+    call, error = typed_call(tool_name, kwargs)
+    if call and len(call) > 2 and (window_index is None or window_index.resolve(call[2]) is None):
+        return None, f"No window matches '{call[2]}'"
+    return call, error
+
+
+def build_cascade(models: List[str], threshold: float, index: ToolIndex, samples: int = 2) -> Cascade:
+    tiers = [Tier(name, chat_model(name), typed_tools, typed_prompt) for name in models]
+    return Cascade(tiers, cascade_call, index=index, threshold=threshold, samples=samples)
+
+
+# Load, prefill and first-token times of every model call
+model_metrics = lifecycle.ModelMetrics()
+# Passed to every agent invocation; --trace adds the tracing callbacks
+agent_config: Dict[str, Any] = {"callbacks": [lifecycle.callback_handler(model_metrics)]}
+
+
+def warm_up():
+    """Load the agent's and the cascade's models and have Ollama cache the static start of their prompts.
+
+    The prompt is the agent's own, with an empty request and no layout, and
+    is sent with the same tools, so it renders to the same prefix as the
+    requests that follow.
+    """
+    agent = default_agent()
+    inputs = {"input": "", "agent_scratchpad": []}
+    try:
+        if isinstance(agent, ConstrainedExecutor):
+            _, commands = agent.schema_for(None)
+            lifecycle.warm_up(agent.llm, agent.prompt.format_messages(**inputs, commands=commands), model_metrics)
+        elif isinstance(agent, LeanExecutor):
+            lifecycle.warm_up(agent.llm, agent.prompt.format_messages(**inputs), model_metrics)
+        else:
+            tools, agent_prompt = TOOL_MODES[tool_mode]
+            lifecycle.warm_up(agent_llm().bind_tools(tools), agent_prompt.format_messages(**inputs), model_metrics)
+        for tier in cascade.tiers if cascade else []:
+            lifecycle.warm_up(tier.bound(), tier.prompt.format_messages(**inputs), model_metrics)
+    except Exception as e:
+        # The first request will load the model instead
+        print(f"Warm-up failed: {str(e)}")
+
+
+def start_warm_up() -> threading.Thread:
+    thread = threading.Thread(target=warm_up, name="swaytalk-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def first_call(text: str) -> Tuple[Any, List[Any]]:
+    """The model, bound to its tools, and the messages of the first model call a request for text makes."""
+    inputs = {**agent_inputs(text), "agent_scratchpad": []}
+    if cascade is not None:
+        tier = cascade.tiers[0]
+        return tier.bound(relevant_tools(text)), tier.prompt.format_messages(**inputs)
+    agent = agent_for(text)
+    if isinstance(agent, ConstrainedExecutor):
+        return agent.llm, agent.messages(agent_inputs(text))[1]
+    if isinstance(agent, LeanExecutor):
+        return agent.llm, agent.prompt.format_messages(**inputs)
+    _, agent_prompt = TOOL_MODES[tool_mode]
+    return agent_llm().bind_tools(agent.tools), agent_prompt.format_messages(**inputs)
+
+
+def speculative_stages(text: str) -> Optional[speculation.Resolved]:
+    """The cheap stages of handling text: the path it takes without a model and its calls there, else select its tools."""
+    match = fast_path.match(text) if fast_path else None
+    if match:
+        return "fastpath", [match]
+    calls = command_cache.get(text) if command_cache else None
+    if calls:
+        return "cache", calls
+    agent_for(text)
+    return None
+
+
+async def speculative_prefill(text: str):
+    model, messages = first_call(text)
+    await lifecycle.aprefill(model, messages)
+
+
+# Speculates on requests while they are typed, with --speculate
+speculator: Optional[speculation.Speculator] = None
+
+
+# Requests that are already sway commands skip the LLM entirely
+fast_path: Optional[FastPath] = FastPath(grammars)
+# Requests the agent has handled before are replayed from the cache
+command_cache: Optional[CommandCache] = None
+path_counts = Counter()
+path_seconds = Counter()
+
+
+def stats() -> Dict[str, Any]:
+    """Return how many requests took each path, for measuring the fast path and cache hit rates."""
+    total = sum(path_counts.values())
+    return {
+        "requests": total,
+        "tool_mode": tool_mode,
+        "executor": executor_kind,
+        "paths": dict(path_counts),
+        "mean_seconds": {path: path_seconds[path] / count for path, count in path_counts.items()},
+        "fastpath_hit_rate": path_counts["fastpath"] / total if total else 0.0,
+        "cache_hit_rate": path_counts["cache"] / total if total else 0.0,
+        "cache_entries": len(command_cache.entries) if command_cache else 0,
+        "ipc": dict(pipeline.counts),
+        "scheduler": pipeline.scheduler.summary(),
+        "validator": dict(validator.counts),
+        "cascade": cascade.summary() if cascade else None,
+        "model": model_metrics.summary(),
+        "speculation": speculator.summary() if speculator else None,
+        "trace": tracer.summary() if tracer.enabled else None,
+    }
+
+
+def run_calls(calls: List[Tuple[str, ...]]) -> Optional[str]:
+    """Run tool calls as one IPC batch, returning an error message if any of them fails."""
+    errors = []
+    with pipeline.batch() as batch:
+        for call in calls:
+            error = execute_tool(*call)
+            if error:
+                errors.append(error)
+        if errors:
+            # Do not send half of the request
+            batch.commands.clear()
+    errors.extend(batch.errors)
+    return "; ".join(errors) or None
+
+
+async def arun_calls(calls: List[Tuple[str, ...]]) -> Optional[str]:
+    """run_calls() for the event loop."""
+    errors = []
+    async with pipeline.abatch() as batch:
+        for call in calls:
+            error = execute_tool(*call)
+            if error:
+                errors.append(error)
+        if errors:
+            batch.commands.clear()
+    errors.extend(batch.errors)
+    return "; ".join(errors) or None
+
+
+def _ran(calls: List[Tuple[str, ...]], path: str) -> Dict[str, Any]:
+    return {"ok": True, "output": "Ran " + "; ".join(call[1] or call[0] for call in calls), "path": path}
+
+
+def _record(result: Dict[str, Any], start: float) -> Dict[str, Any]:
+    elapsed = time.perf_counter() - start
+    tracer.flush()
+    path_counts[result["path"]] += 1
+    path_seconds[result["path"]] += elapsed
+    result["seconds"] = round(elapsed, 4)
+    return result
+
+
+def handle(text: str) -> Dict[str, Any]:
+    """Run a single natural language request, skipping the LLM when possible."""
+    tracer.begin_request()
+    start = time.perf_counter()
+    with tracer.span("request") as span:
+        resolved = None
+        if speculator is not None:
+            span["speculation"], resolved = speculator.finish(text)
+        result = _handle(text, resolved)
+        span["path"] = result["path"]
+        span["ok"] = result["ok"]
+    return _record(result, start)
+
+
+def _fast_match(text: str, resolved: Optional[speculation.Resolved]) -> Optional[Tuple[str, str]]:
+    if resolved is not None:
+        return resolved[1][0] if resolved[0] == "fastpath" else None
+    return fast_path.match(text) if fast_path else None
+
+
+def _cached_calls(text: str, resolved: Optional[speculation.Resolved]) -> Optional[List[Tuple[str, ...]]]:
+    if resolved is not None and resolved[0] == "cache":
+        return resolved[1]
+    return command_cache.get(text) if command_cache else None
+
+
+def _handle(text: str, resolved: Optional[speculation.Resolved] = None) -> Dict[str, Any]:
+    """handle() after speculation, which may have resolved the request's path and calls already."""
+    match = _fast_match(text, resolved)
+    if match:
+        tool_name, arguments = match
+        print(f"Fast path: {arguments or tool_name}")
+        error = run_calls([match])
+        if error:
+            return {"ok": False, "output": error, "path": "fastpath"}
+        return _ran([match], "fastpath")
+
+    calls = _cached_calls(text, resolved)
+    if calls:
+        print(f"Cache hit: {calls}")
+        error = run_calls(calls)
+        if not error:
+            return _ran(calls, "cache")
+        print(f"Cached calls failed, asking the agent: {error}")
+        command_cache.invalidate(text)
+
+    if cascade is not None:
+        calls, tier = cascade.propose(text, agent_inputs(text), config=agent_config, tool_names=relevant_tools(text))
+        if calls:
+            pipeline.begin_request()
+            error = run_calls(calls)
+            if not error:
+                return _accepted(text, calls, tier)
+            print(f"Calls proposed by {tier} failed, asking the agent: {error}")
+            cascade.rejected(tier)
+
+    start = time.perf_counter()
+    pipeline.begin_request()
+    result = agent_for(text).invoke(agent_inputs(text), config=agent_config)
+    return _answered(text, result, start)
+
+
+def _accepted(text: str, calls: List[Tuple[str, ...]], tier: str) -> Dict[str, Any]:
+    cascade.accepted(tier)
+    if command_cache:
+        command_cache.put(text, pipeline.succeeded)
+    return _ran(calls, f"cascade:{tier}")
+
+
+def _answered(text: str, result: Dict[str, Any], start: float) -> Dict[str, Any]:
+    if command_cache and pipeline.succeeded:
+        command_cache.put(text, pipeline.succeeded)
+    if cascade is not None:
+        cascade.record(model, bool(pipeline.succeeded), time.perf_counter() - start)
+    reply = {"ok": bool(pipeline.succeeded), "output": result.get("output", ""), "path": "agent"}
+    if "timings" in result:
+        reply["timings"] = result["timings"]
+    return reply
+
+
+# i3ipc.aio connection used by ahandle, set up by astart
+async_sway: Optional[aio.Connection] = None
+
+
+async def astart(follow_tree: bool = True):
+    """Connect to sway from the running event loop, and follow the tree there if follow_tree."""
+    global async_sway, tree_mirror, window_index
+    async_sway = await aio.Connection().connect()
+    pipeline.async_connection = async_sway
+    if follow_tree:
+        tree_mirror = TreeMirror(async_sway)
+        await tree_mirror.astart()
+        window_index = WindowIndex(tree_mirror)
+
+
+async def ahandle(text: str) -> Dict[str, Any]:
+    """handle() for the event loop, after astart().
+
+    Model calls and sway commands are awaited, so tree events and other
+    requests are processed meanwhile, and the request can be cancelled.
+    """
+    tracer.begin_request()
+    start = time.perf_counter()
+    try:
+        with tracer.span("request") as span:
+            span["path"] = "cancelled"
+            resolved = None
+            if speculator is not None:
+                span["speculation"], resolved = speculator.finish(text)
+            result = await _ahandle(text, resolved)
+            span["path"] = result["path"]
+            span["ok"] = result["ok"]
+    except asyncio.CancelledError:
+        print(f"Cancelled: {text}")
+        _record({"path": "cancelled"}, start)
+        raise
+    return _record(result, start)
+
+
+async def _ahandle(text: str, resolved: Optional[speculation.Resolved] = None) -> Dict[str, Any]:
+    match = _fast_match(text, resolved)
+    if match:
+        tool_name, arguments = match
+        print(f"Fast path: {arguments or tool_name}")
+        error = await arun_calls([match])
+        if error:
+            return {"ok": False, "output": error, "path": "fastpath"}
+        return _ran([match], "fastpath")
+
+    calls = _cached_calls(text, resolved)
+    if calls:
+        print(f"Cache hit: {calls}")
+        error = await arun_calls(calls)
+        if not error:
+            return _ran(calls, "cache")
+        print(f"Cached calls failed, asking the agent: {error}")
+        command_cache.invalidate(text)
+
+    if cascade is not None:
+        calls, tier = await cascade.apropose(text, agent_inputs(text), config=agent_config,
+                                             tool_names=relevant_tools(text))
+        if calls:
+            pipeline.begin_request()
+            error = await arun_calls(calls)
+            if not error:
+                return _accepted(text, calls, tier)
+            print(f"Calls proposed by {tier} failed, asking the agent: {error}")
+            cascade.rejected(tier)
+
+    start = time.perf_counter()
+    pipeline.begin_request()
+    result = await agent_for(text).ainvoke(agent_inputs(text), config=agent_config)
+    return _answered(text, result, start)
+
+
+async def serve_async(follow_tree: bool, path: Optional[str] = None, speculate: bool = False):
+    global speculator
+    await astart(follow_tree)
+    if speculate:
+        speculator = speculation.Speculator(speculative_stages, speculative_prefill, asyncio.get_running_loop())
+    await daemon.aserve(ahandle, path, stats=stats, speculate=speculator.update if speculator else None)
+
+
+def startup_profile() -> Dict[str, Any]:
+    """Time and memory taken to start, then what importing each of LAZY_MODULES would add."""
+    def usage(start: float) -> Dict[str, Any]:
+        return {"seconds": round(time.perf_counter() - start, 4), "modules": len(sys.modules),
+                # ru_maxrss is in kilobytes on Linux
+                "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+    profile = {"imports": {"seconds": round(_import_end - _import_start, 4)}, "startup": usage(_import_start)}
+    for name in LAZY_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            profile["+" + name] = {"error": str(e)}
+            continue
+        profile["+" + name] = usage(start)
+    return profile
+
+
+def read_input(frontend: str = "auto") -> Optional[str]:
+    with tracer.span("input", frontend=frontends.choose(frontend)):
+        return frontends.read_input(frontend, speculator.update if speculator else None)
+
+
+def main():
+    global agent_executor, cascade, command_cache, context_tokens, executor_kind, llm, max_seconds, max_steps, model
+    global card_budget, keep_alive, speculator, stream, verbose
+    global fast_path, tool_index, tool_mode, top_k, tree_mirror, window_index
+    parser = argparse.ArgumentParser(description="Control Sway/i3 with natural language.")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Stay resident and serve requests from client.py over a Unix socket.")
+    parser.add_argument("--frontend", choices=["auto", *frontends.FRONTENDS, "socket"], default="auto",
+                        help="How to ask for the request: auto picks fuzzel, dmenu, qt or stdin, whichever is "
+                             "available first; socket is the same as --daemon.")
+    parser.add_argument("--profile-imports", action="store_true",
+                        help="Print the start-up time and memory, and what each lazily imported module adds, "
+                             "then exit.")
+    parser.add_argument("--socket", help="Path of the daemon socket.")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Handle requests on an asyncio event loop: model calls, sway commands and tree events "
+                             "overlap, and a new daemon request cancels the one still in flight.")
+    parser.add_argument("--model", default=model, help="Ollama model of the agent.")
+    parser.add_argument("--cascade", metavar="MODELS",
+                        help="Comma-separated smaller models to try, in order, before the agent. Their tool calls "
+                             "are only run if they are valid and match the request, otherwise the next one is asked.")
+    parser.add_argument("--cascade-threshold", type=float, default=0.5,
+                        help="Confidence (0-1) a cascade tier's tool calls need to be run.")
+    parser.add_argument("--cascade-samples", type=int, default=2,
+                        help="Answers a cascade tier gives to a request, the first at temperature 0 and the others "
+                             "sampled; their agreement is part of the confidence (1 judges by the tool index alone).")
+    parser.add_argument("--tool-mode", choices=TOOL_MODES, default=tool_mode,
+                        help="docstring: look up a tool's docstring before calling it; "
+                             "typed: call tools with typed arguments in one step; "
+                             "grammar: write the sway command as JSON constrained to the command grammars.")
+    parser.add_argument("--executor", choices=["lean", "agent"], default=executor_kind,
+                        help="lean: a budget of --max-steps and --max-seconds per request, with the commands of a model "
+                             "turn sent together and no further model call once they all succeed; "
+                             "agent: LangChain's AgentExecutor.")
+    parser.add_argument("--max-steps", type=int, default=max_steps, help="Most LLM calls per request (lean executor).")
+    parser.add_argument("--max-seconds", type=float, default=max_seconds, help="Time budget per request (lean executor).")
+    parser.add_argument("--stream", action="store_true",
+                        help="Run a command as soon as the model has written it, without waiting for the rest of "
+                             "its answer (lean executor and grammar mode).")
+    parser.add_argument("--coalesce-window", type=float, default=scheduler.DEFAULT_WINDOW,
+                        help="Seconds within which repeated commands are combined, such as three 'resize grow' "
+                             "into one (0 turns it off).")
+    parser.add_argument("--rollback", action="store_true",
+                        help="Undo a batch of commands on the focused window if only some of them succeed.")
+    parser.add_argument("--no-tree", action="store_true",
+                        help="Do not follow the sway tree or tell the agent what is on screen.")
+    parser.add_argument("--context-tokens", type=int, default=context_tokens,
+                        help="Token budget of the window layout summary given to the agent.")
+    parser.add_argument("--top-k", type=int, default=top_k,
+                        help="Bind only the k tools most relevant to each request (default 0 binds all of them, "
+                             "which keeps the start of the prompt the same for the model's prefix cache).")
+    parser.add_argument("--verbose", action="store_true", help="Print the tools selected for every request and the commands the validator repaired.")
+    parser.add_argument("--verbosity", choices=VERBOSITIES, default=verbosity,
+                        help="full: document tools with their docstrings and described arguments; card: with "
+                             "grammar cards compiled from the docstrings instead; terse: with their synopsis lines "
+                             "and bare argument schemas, for the fewest prompt tokens.")
+    parser.add_argument("--card-budget", type=int, default=card_budget,
+                        help="Tokens a grammar card may take; hints that do not fit are left out.")
+    parser.add_argument("--tool-profile", metavar="FILE",
+                        help="Tool profile written by bench/tune.py (default: the one tuned for --model, if any).")
+    parser.add_argument("--no-tool-profile", action="store_true",
+                        help="Do not take the tool mode, top-k and verbosity from the model's tool profile.")
+    parser.add_argument("--no-fastpath", action="store_true",
+                        help="Send requests that read like sway commands to the models as well.")
+    parser.add_argument("--no-cache", action="store_true", help="Do not cache or replay agent results.")
+    parser.add_argument("--cache-file", default=cache.default_path(), help="Where the command cache is stored.")
+    parser.add_argument("--cache-size", type=int, default=256, help="Maximum number of cached requests.")
+    parser.add_argument("--cache-ttl", type=float, default=30.0, help="Days before a cached request expires.")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Append latency spans of every request to FILE; summarize with tracing.py FILE.")
+    parser.add_argument("--trace-format", choices=tracing.FORMATS, default="jsonl",
+                        help="jsonl, or chrome for chrome://tracing and Perfetto.")
+    parser.add_argument("--keep-alive", default=lifecycle.DEFAULT_KEEP_ALIVE,
+                        help="How long Ollama keeps the model loaded after a request, in seconds or as a duration "
+                             "like 10m; -1 keeps it loaded.")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="Do not load the model and cache the prompt at start-up; the first request will.")
+    parser.add_argument("--speculate", action="store_true",
+                        help="Whenever typing pauses, look the request up and have the model read it so far "
+                             "(qt and stdin frontends, and client.py --speculate).")
+    # The model's tool profile replaces the defaults, so options given on the command line still win
+    known, _ = parser.parse_known_args()
+    if not known.no_tool_profile:
+        path = known.tool_profile or profiles.default_path(known.model)
+        tuned = profiles.settings(profiles.load(path), {"tool_mode": TOOL_MODES, "verbosity": VERBOSITIES})
+        if tuned:
+            parser.set_defaults(**tuned)
+            print(f"Defaults from the tool profile {path}: " + ", ".join(f"{key}={value}" for key, value in tuned.items()))
+    args = parser.parse_args()
+    if args.profile_imports:
+        for stage, usage in startup_profile().items():
+            print(f"{stage:<20} " + "  ".join(f"{key}={value}" for key, value in usage.items()))
+        return
+    args.daemon = args.daemon or args.frontend == "socket"
+
+    if args.trace:
+        tracer.configure(args.trace, args.trace_format)
+        tracer.add("import", _import_start, _import_end)
+        agent_config["callbacks"].append(tracing.callback_handler())
+
+    if args.model != model:
+        model = args.model
+    keep_alive, llm = lifecycle.parse_keep_alive(args.keep_alive), None
+    tool_mode, executor_kind = args.tool_mode, args.executor
+    if args.verbosity != verbosity:
+        set_verbosity(args.verbosity)
+    card_budget = args.card_budget
+    max_steps, max_seconds, stream = args.max_steps, args.max_seconds, args.stream
+    agent_executor = None
+    pipeline.rollback = args.rollback
+    pipeline.scheduler.window = args.coalesce_window
+    context_tokens = args.context_tokens
+    if not args.no_tree and not args.use_async:
+        tree_mirror = TreeMirror(sway)
+        tree_mirror.start()
+        window_index = WindowIndex(tree_mirror)
+    top_k, verbose = args.top_k, args.verbose
+    validator.verbose = verbose
+    if 0 < top_k < len(full_tools):
+        tool_index = load_tool_index()
+    if args.cascade:
+        models = [name.strip() for name in args.cascade.split(",") if name.strip()]
+        cascade = build_cascade(models, args.cascade_threshold, tool_index or load_tool_index(), args.cascade_samples)
+    if args.no_fastpath:
+        fast_path = None
+    if not args.no_cache:
+        command_cache = CommandCache(args.cache_file, cache.fingerprint(full_tools),
+                                     max_entries=args.cache_size, ttl=args.cache_ttl * 24 * 3600)
+        command_cache.load()
+
+    if not args.no_warmup:
+        # Overlaps with waiting for the first request, or for it to be typed
+        start_warm_up()
+
+    if args.daemon and args.use_async:
+        try:
+            asyncio.run(serve_async(not args.no_tree, args.socket, args.speculate))
+        except KeyboardInterrupt:
+            pass
+        return
+    if args.speculate and not args.use_async:
+        speculator = speculation.Speculator(speculative_stages, speculative_prefill)
+    if args.daemon:
+        daemon.serve(handle, args.socket, stats=stats, speculate=speculator.update if speculator else None)
+        return
+
+    if args.use_async:
+        # Frontends like Qt need the main thread, so the event loop runs beside
+        # them and connects to sway and reads the tree while the request is typed
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name="swaytalk-loop", daemon=True).start()
+        if args.speculate:
+            speculator = speculation.Speculator(speculative_stages, speculative_prefill, loop)
+        started = asyncio.run_coroutine_threadsafe(astart(not args.no_tree), loop)
+        text = read_input(args.frontend)
+        started.result()
+        if text:
+            asyncio.run_coroutine_threadsafe(ahandle(text), loop).result()
+        else:
+            print("No input provided.")
+        tracer.flush()
+        return
+
+    text = read_input(args.frontend)
+    if text:
+        handle(text)
+    else:
+        print("No input provided.")
+    tracer.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# All sway commands go through a CommandPipeline. Inside a batch() the commands
+# are only collected, and sent together as one ';'-joined IPC message when the
+# batch ends. Sway answers with one reply per command, which is matched back
+# to the command that caused it. Messages are sent through a CommandScheduler,
+# which coalesces them with those of other requests.
+import asyncio
+import contextvars
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Iterator, List, Optional, Tuple
+
+from i3ipc import Connection, aio
+
+from scheduler import CommandScheduler
+
+
+@dataclass
+class CommandResult:
+    command: str
+    success: bool
+    error: Optional[str] = None
+    tag: Any = None
+
+
+@dataclass
+class Batch:
+    commands: List[Tuple[str, Any]] = field(default_factory=list)
+    results: List[CommandResult] = field(default_factory=list)
+    rolled_back: bool = False
+
+    @property
+    def errors(self) -> List[str]:
+        return [f"{r.command}: {r.error}" for r in self.results if not r.success]
+
+
+class CommandPipeline:
+    """Sends commands to sway, one by one or in batches.
+
+    Every command is sent with the current tag (set by whoever is running a
+    tool), and the tags of commands that succeeded are collected in
+    `succeeded`. The tag, the successes and the open batch belong to the
+    current context, so requests running concurrently in their own asyncio
+    tasks or threads do not see each other's; begin_request() starts a new
+    list of successes. With rollback enabled, the state of the focused container is
+    captured before a batch and restored if only part of the batch succeeded.
+
+    Once async_connection is set, abatch() sends the batch with i3ipc.aio
+    instead of blocking the event loop.
+    """
+
+    def __init__(self, connection: Connection, rollback: bool = False, scheduler: Optional[CommandScheduler] = None):
+        self.connection = connection
+        self.async_connection: Optional[aio.Connection] = None
+        self.rollback = rollback
+        self.scheduler = scheduler or CommandScheduler()
+        self._tag = contextvars.ContextVar("swaytalk_tag", default=None)
+        self._succeeded: contextvars.ContextVar = contextvars.ContextVar("swaytalk_succeeded", default=None)
+        self._open_batch: contextvars.ContextVar = contextvars.ContextVar("swaytalk_batch", default=None)
+        self.counts = Counter()
+
+    @property
+    def tag(self) -> Any:
+        return self._tag.get()
+
+    @tag.setter
+    def tag(self, tag: Any):
+        self._tag.set(tag)
+
+    @property
+    def succeeded(self) -> List[Any]:
+        succeeded = self._succeeded.get()
+        if succeeded is None:
+            succeeded = []
+            self._succeeded.set(succeeded)
+        return succeeded
+
+    def begin_request(self):
+        """Collect the successes of a new request, in the context that handles it."""
+        self._succeeded.set([])
+
+    @property
+    def _batch(self) -> Optional[Batch]:
+        return self._open_batch.get()
+
+    @_batch.setter
+    def _batch(self, batch: Optional[Batch]):
+        self._open_batch.set(batch)
+
+    def send(self, command: str):
+        """Send a command, or queue it if a batch is open. Raises RuntimeError if sway rejects it."""
+        if self._batch is not None:
+            self._batch.commands.append((command, self.tag))
+            return
+        results = self._run([(command, self.tag)])
+        errors = [r.error for r in results if not r.success]
+        if errors:
+            raise RuntimeError("; ".join(errors))
+
+    @contextmanager
+    def batch(self) -> Iterator[Batch]:
+        """Collect the commands sent inside the block and send them as one message at the end.
+
+        The results are available on the yielded Batch once the block exits.
+        Nested batches are merged into the outermost one.
+        """
+        if self._batch is not None:
+            yield self._batch
+            return
+        batch = self._batch = Batch()
+        try:
+            yield batch
+        finally:
+            self._batch = None
+        if batch.commands:
+            restore = self._snapshot(self.connection.get_tree()) if self._wants_rollback(batch) else []
+            batch.results = self._run(batch.commands)
+            if self._partial(batch, restore):
+                self._restore(restore)
+
+    @asynccontextmanager
+    async def abatch(self) -> AsyncIterator[Batch]:
+        """batch() for the event loop: the commands are sent with async_connection.
+
+        Once sent, the commands are not cancelled along with the request that
+        sent them, since sway would run them anyway; their results are dropped.
+        """
+        if self._batch is not None:
+            yield self._batch
+            return
+        batch = self._batch = Batch()
+        try:
+            yield batch
+        finally:
+            self._batch = None
+        if batch.commands:
+            restore = self._snapshot(await self.async_connection.get_tree()) if self._wants_rollback(batch) else []
+            replies = await asyncio.shield(self._asend(batch.commands))
+            batch.results = self._results(batch.commands, replies)
+            if self._partial(batch, restore):
+                await asyncio.shield(self._arestore(restore))
+
+    def _wants_rollback(self, batch: Batch) -> bool:
+        return self.rollback and len(batch.commands) > 1
+
+    def _partial(self, batch: Batch, restore: List[str]) -> bool:
+        """Mark the successes of a partly failed batch as rolled back, returning whether to restore."""
+        successes = [r for r in batch.results if r.success]
+        if not (restore and successes and len(successes) < len(batch.results)):
+            return False
+        batch.rolled_back = True
+        for result in successes:
+            result.success = False
+            result.error = "rolled back because another command in the batch failed"
+            if result.tag in self.succeeded:
+                self.succeeded.remove(result.tag)
+        return True
+
+    def _run(self, commands: List[Tuple[str, Any]]) -> List[CommandResult]:
+        replies = self.scheduler.submit(self.connection, [command for command, _ in commands])
+        self._count(commands)
+        return self._results(commands, replies)
+
+    async def _asend(self, commands: List[Tuple[str, Any]]) -> list:
+        replies = await self.scheduler.asubmit(self.async_connection, [command for command, _ in commands])
+        self._count(commands)
+        return replies
+
+    def _count(self, commands: List[Tuple[str, Any]]):
+        self.counts["commands"] += len(commands)
+        if len(commands) > 1:
+            self.counts["batches"] += 1
+
+    def _results(self, commands: List[Tuple[str, Any]], replies: list) -> List[CommandResult]:
+        results = []
+        for i, (command, tag) in enumerate(commands):
+            reply = replies[i] if i < len(replies) else None
+            if reply is not None:
+                result = CommandResult(command, bool(reply.success), reply.error, tag)
+            else:
+                # Sway stops at the first invalid command and does not reply for the rest
+                result = CommandResult(command, False, "not run because an earlier command was invalid", tag)
+            if result.success:
+                if tag is not None:
+                    self.succeeded.append(tag)
+            else:
+                self.counts["failures"] += 1
+            results.append(result)
+        return results
+
+    def _snapshot(self, tree) -> List[str]:
+        """Return the commands that put the focused container of the tree back the way it is now."""
+        focused = tree.find_focused()
+        if focused is None:
+            return []
+        target = f"[con_id={focused.id}]"
+        floating = focused.type == "floating_con" or focused.floating in ("user_on", "auto_on")
+        commands = []
+
+        workspace = focused.workspace()
+        if workspace is not None and workspace.name != "__i3_scratch":
+            commands.append(f"{target} move container to workspace {workspace.name}")
+        commands.append(f"{target} floating {'enable' if floating else 'disable'}")
+        if floating:
+            rect = focused.rect
+            commands.append(f"{target} resize set {rect.width} px {rect.height} px")
+            commands.append(f"{target} move absolute position {rect.x} px {rect.y} px")
+            commands.append(f"{target} sticky {'enable' if focused.sticky else 'disable'}")
+        commands.append(f"{target} fullscreen {'enable' if focused.fullscreen_mode else 'disable'}")
+        if focused.border in ("normal", "pixel"):
+            commands.append(f"{target} border {focused.border} {focused.current_border_width}")
+        elif focused.border:
+            commands.append(f"{target} border {focused.border}")
+        if focused.parent is not None and focused.parent.layout in ("splith", "splitv", "stacked", "tabbed"):
+            layout = "stacking" if focused.parent.layout == "stacked" else focused.parent.layout
+            commands.append(f"{target} layout {layout}")
+        commands.append(f"{target} focus")
+        return commands
+
+    def _restore(self, commands: List[str]):
+        self.counts["rollbacks"] += 1
+        # Resend whatever sway skipped after an invalid command
+        self.scheduler.submit(self.connection, commands, resend=True)
+
+    async def _arestore(self, commands: List[str]):
+        self.counts["rollbacks"] += 1
+        await self.scheduler.asubmit(self.async_connection, commands, resend=True)
@@ -0,0 +1,57 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Tool profiles written by bench/tune.py. A profile holds the tool mode,
+# number of bound tools and description verbosity that did best for one model
+# on the benchmark corpus, with what was measured for them, and main.py
+# starts with those settings unless they are given on the command line.
+import json
+import os
+import re
+from typing import Any, Collection, Dict, Optional
+
+PROFILE_VERSION = 1
+# The main.py options a profile sets
+SETTINGS = ("tool_mode", "top_k", "verbosity")
+
+
+def default_path(model: str) -> str:
+    config_dir = os.environ.get("XDG_CONFIG_HOME", os.path.expanduser("~/.config"))
+    # Model names look like "qwen2.5:7b" or "namespace/model:tag"
+    name = re.sub(r"[^\w.-]", "_", model)
+    return os.path.join(config_dir, "swaytalk", "profiles", f"{name}.json")
+
+
+def load(path: str) -> Optional[Dict[str, Any]]:
+    """Return the profile stored at path, or None if there is none or it cannot be read."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            profile = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Ignoring the tool profile {path}: {str(e)}")
+        return None
+    if not isinstance(profile, dict) or profile.get("version") != PROFILE_VERSION:
+        print(f"Ignoring the tool profile {path}: written by another version")
+        return None
+    return profile
+
+
+def settings(profile: Optional[Dict[str, Any]], choices: Dict[str, Collection[str]]) -> Dict[str, Any]:
+    """The valid settings of a profile, with choices giving the values allowed for some of them."""
+    tuned = {}
+    for key, value in ((profile or {}).get("settings") or {}).items():
+        if key not in SETTINGS or (key in choices and value not in choices[key]):
+            continue
+        if key == "top_k" and (not isinstance(value, int) or value < 0):
+            continue
+        tuned[key] = value
+    return tuned
+
+
+def save(profile: Dict[str, Any], path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": PROFILE_VERSION, **profile}, f, indent=2)
+    os.replace(tmp_path, path)
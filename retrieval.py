@@ -0,0 +1,174 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# BM25 index over the tool descriptions and docstrings. For every request only
+# the few most relevant tools are bound to the agent, so every sway command can
+# be available without overwhelming small models with a huge prompt.
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+K1 = 1.2
+B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "as", "be", "by", "can", "do", "for", "from", "if",
+    "in", "is", "it", "its", "me", "my", "no", "of", "on", "or", "please", "should",
+    "so", "than", "that", "the", "then", "this", "to", "with", "you", "your",
+}
+
+# Where a request asking for several things is split into the clauses asking for each
+CLAUSE_SEPARATORS = r"[,;]|\b(?:and then|and|then|after that|also)\b"
+
+# Everyday words for things the man page excerpts describe in sway terms.
+KEYWORDS = {
+    "focus": "go switch select jump activate",
+    "move": "send put throw place",
+    "fullscreen": "maximize full screen",
+    "exit": "quit logout log out leave",
+    "reload": "refresh restart config",
+    "split": "divide next below beside",
+    "floating": "float tile detach unfloat",
+    "layout": "tabs tabbed stack stacked arrange",
+    "border": "frame titlebar title bar decoration thick thin",
+    "gaps": "gap spacing space padding margin",
+    "inhibit_idle": "sleep screensaver lock awake idle dim video",
+    "max_render_time": "latency render frames lag",
+    "allow_tearing": "tearing vsync games",
+    "rename": "name call label",
+    "resize": "bigger smaller larger wider narrower taller shorter grow shrink size",
+    "scratchpad": "hide stash hidden show",
+    "shortcuts_inhibitor": "shortcuts keybindings keys virtual machine remote",
+    "sticky": "pin pinned every all workspaces always visible",
+    "swap": "exchange switch places trade",
+    "title_format": "title text caption",
+}
+
+
+def default_path(documents: Dict[str, str]) -> str:
+    """Return where the index of these documents is stored; it is rebuilt whenever they change."""
+    digest = hashlib.sha256(json.dumps(documents, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    cache_dir = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(cache_dir, "swaytalk", f"tool-index-{digest}.npz")
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into stemmed words plus character trigrams, so 'resizing' still meets 'resize'."""
+    tokens = []
+    for word in re.findall(r"[a-z]+", text.lower().replace("_", " ")):
+        if word in STOPWORDS:
+            continue
+        word = _stem(word)
+        tokens.append(word)
+        padded = f"#{word}#"
+        tokens.extend("~" + padded[i:i + 3] for i in range(len(padded) - 2))
+    return tokens
+
+
+class ToolIndex:
+    """Precomputed BM25 weights, one row per tool."""
+
+    def __init__(self, names: List[str], vocabulary: Dict[str, int], weights: np.ndarray):
+        self.names = names
+        self.vocabulary = vocabulary
+        self.weights = weights
+
+    @classmethod
+    def build(cls, documents: Dict[str, str]) -> "ToolIndex":
+        names = list(documents)
+        counts = [Counter(tokenize(documents[name])) for name in names]
+        vocabulary = {token: i for i, token in enumerate(sorted(set().union(*counts)))}
+
+        tf = np.zeros((len(names), len(vocabulary)), dtype=np.float32)
+        for row, doc_counts in enumerate(counts):
+            for token, count in doc_counts.items():
+                tf[row, vocabulary[token]] = count
+
+        doc_lengths = tf.sum(axis=1, keepdims=True)
+        doc_freq = (tf > 0).sum(axis=0)
+        idf = np.log(1 + (len(names) - doc_freq + 0.5) / (doc_freq + 0.5))
+        norm = K1 * (1 - B + B * doc_lengths / doc_lengths.mean())
+        weights = idf * tf * (K1 + 1) / (tf + norm)
+        return cls(names, vocabulary, weights.astype(np.float32))
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        vocabulary = sorted(self.vocabulary, key=self.vocabulary.get)
+        with open(path, "wb") as f:
+            np.savez(f, names=np.array(self.names), vocabulary=np.array(vocabulary), weights=self.weights)
+
+    @classmethod
+    def load(cls, path: str) -> "ToolIndex":
+        with np.load(path) as data:
+            names = [str(name) for name in data["names"]]
+            vocabulary = {str(token): i for i, token in enumerate(data["vocabulary"])}
+            return cls(names, vocabulary, data["weights"])
+
+    def scores(self, text: str) -> np.ndarray:
+        query = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for token in set(tokenize(text)):
+            i = self.vocabulary.get(token)
+            if i is not None:
+                query[i] = 1.0
+        return self.weights @ query
+
+    def _rank(self, text: str) -> List[str]:
+        """All tools, best first; those the text names outright come before the rest."""
+        words = set(re.findall(r"[a-z_]+", text.lower()))
+        ranked = [self.names[i] for i in np.argsort(-self.scores(text), kind="stable")]
+        return sorted(ranked, key=lambda name: name not in words)
+
+    def search(self, text: str, k: int) -> List[str]:
+        """Return the names of the k most relevant tools, best first.
+
+        Each clause of a compound request ("make this fullscreen and then
+        focus the terminal") is ranked on its own and the rankings are taken
+        in turns, so the best tool of every clause is returned, even if that
+        takes more than k.
+        """
+        clauses = [clause for clause in re.split(CLAUSE_SEPARATORS, text.lower()) if tokenize(clause)]
+        if len(clauses) < 2:
+            return self._rank(text)[:k]
+        rankings = [self._rank(clause) for clause in clauses]
+        selected: List[str] = []
+        for rank in range(len(self.names)):
+            for ranking in rankings:
+                if ranking[rank] not in selected:
+                    selected.append(ranking[rank])
+            if len(selected) >= k:
+                break
+        return selected[:max(k, len(rankings))]
+
+
+def tool_documents(tools: Dict[str, Callable], descriptions: Dict[str, str]) -> Dict[str, str]:
+    """Build the text indexed for each tool: its name, description, keywords and docstring."""
+    return {
+        name: " ".join([name] * 3 + [descriptions.get(name, ""), KEYWORDS.get(name, ""), function.__doc__ or ""])
+        for name, function in tools.items()
+    }
+
+
+def load_or_build(documents: Dict[str, str], path: Optional[str]) -> ToolIndex:
+    """Load the index from disk, building and saving it first if needed."""
+    if path and os.path.exists(path):
+        try:
+            index = ToolIndex.load(path)
+            if index.names == list(documents):
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+    index = ToolIndex.build(documents)
+    if path:
+        index.save(path)
+    return index
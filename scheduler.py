@@ -0,0 +1,215 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Every command the pipeline sends to sway goes through a CommandScheduler.
+# Whoever submits commands while no message is in flight sends everything that
+# was queued meanwhile as one IPC message, so messages never interleave and a
+# spammed request ("grow it", "grow it", "grow it") is sent once: additive
+# commands are added up ("resize grow width 10 ppt" three times becomes
+# "resize grow width 30 ppt") and a command that sets a state replaces an
+# earlier one setting the same state.
+import asyncio
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from grammar import split_criteria
+from tracing import tracer
+
+# Seconds that commands which can be coalesced wait for more on the event loop,
+# and within which a state command identical to the last one sent is dropped
+DEFAULT_WINDOW = 0.05
+
+# resize grow width 10 ppt, gaps inner all plus 5. "move left 20 px" is not
+# additive: it moves a floating window by 20 px, but a tiled one swaps places
+# with its neighbour whatever the amount, and the scheduler cannot tell them apart
+_ADDITIVE = re.compile(r"^(?P<head>resize (?:grow|shrink) (?:width|height|up|down|left|right)"
+                       r"|gaps \w+ \w+ (?:plus|minus)) (?P<amount>\d+)(?P<unit> px| ppt|)$")
+# Commands whose effect does not depend on the state before them, grouped by the state they set.
+# "resize set" sets the width and the height separately, so only its forms setting one of them are here.
+_IDEMPOTENT = re.compile(r"^(?P<key>floating|fullscreen|sticky|shortcuts_inhibitor|allow_tearing|border|layout"
+                         r"|inhibit_idle|max_render_time|title_format"
+                         r"|resize set (?:width|height)(?= -?\d+(?: px| ppt)?$)|gaps \w+ \w+ set) (?!toggle\b)\S")
+
+
+@dataclass
+class Reply:
+    """Stands in for sway's reply to a command that was coalesced away."""
+    success: bool = True
+    error: Optional[str] = None
+
+
+@dataclass(eq=False)
+class Submission:
+    commands: List[str]
+    # Keep sending the commands after one that sway could not parse
+    resend: bool = False
+    replies: List[Any] = field(default_factory=list)
+    done: bool = False
+
+
+@dataclass
+class _Entry:
+    command: str
+    sources: List[Tuple[Submission, int]]
+
+
+def merge(first: str, second: str) -> Optional[str]:
+    """The command doing what the two additive commands do one after the other, if there is one."""
+    criteria, command = split_criteria(first)
+    other_criteria, other = split_criteria(second)
+    a, b = _ADDITIVE.match(command), _ADDITIVE.match(other)
+    if criteria != other_criteria or not a or not b or (a["head"], a["unit"]) != (b["head"], b["unit"]):
+        return None
+    return f"{criteria} {a['head']} {int(a['amount']) + int(b['amount'])}{a['unit']}".strip()
+
+
+def coalescable(command: str) -> bool:
+    command = split_criteria(command)[1]
+    return bool(_ADDITIVE.match(command) or _IDEMPOTENT.match(command))
+
+
+def supersedes(later: str, earlier: str) -> bool:
+    """Whether later sets the same state as earlier, so that earlier need not be sent."""
+    criteria, command = split_criteria(later)
+    other_criteria, other = split_criteria(earlier)
+    a, b = _IDEMPOTENT.match(command), _IDEMPOTENT.match(other)
+    return criteria == other_criteria and bool(a and b) and a["key"] == b["key"]
+
+
+class CommandScheduler:
+    """Serializes and coalesces the commands sent on a connection.
+
+    submit() blocks and asubmit() awaits until the commands were sent, and
+    both return one reply per command, or None for commands sway did not
+    run because an earlier command of the same submission was invalid.
+    Commands queued behind an invalid command of another submission are
+    sent again. Only adjacent commands with the same criteria are coalesced.
+    """
+
+    def __init__(self, window: float = DEFAULT_WINDOW):
+        self.window = window
+        self.counts = Counter()
+        self.depths: List[int] = []
+        self._pending: List[Submission] = []
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._async_lock: Optional[asyncio.Lock] = None
+        self._last: Optional[Tuple[str, float]] = None
+
+    def submit(self, connection, commands: List[str], resend: bool = False) -> List[Any]:
+        submission = self._queue(commands, resend)
+        with self._send_lock:
+            if not submission.done:
+                entries = self._plan(self._take())
+                while entries:
+                    entries = self._apply(entries, self._message(connection, entries))
+        return submission.replies
+
+    async def asubmit(self, connection, commands: List[str], resend: bool = False) -> List[Any]:
+        """submit() for the event loop, with an i3ipc.aio connection."""
+        submission = self._queue(commands, resend)
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            if not submission.done:
+                if self.window and self._coalescable():
+                    # Give a spammed request the chance to catch up
+                    await asyncio.sleep(self.window)
+                entries = self._plan(self._take())
+                while entries:
+                    entries = self._apply(entries, await self._amessage(connection, entries))
+        return submission.replies
+
+    def _queue(self, commands: List[str], resend: bool) -> Submission:
+        submission = Submission(list(commands), resend, [None] * len(commands))
+        with self._lock:
+            self._pending.append(submission)
+            self.counts["submissions"] += 1
+            self.counts["commands_in"] += len(commands)
+        return submission
+
+    def _coalescable(self) -> bool:
+        with self._lock:
+            return any(coalescable(command) for submission in self._pending for command in submission.commands)
+
+    def _take(self) -> List[Submission]:
+        with self._lock:
+            group, self._pending = self._pending, []
+        for submission in group:
+            submission.done = True
+        self.depths.append(len(group))
+        return group
+
+    def _plan(self, group: List[Submission]) -> List[_Entry]:
+        """The commands to send for the queued submissions, coalesced."""
+        entries: List[_Entry] = []
+        for submission in group:
+            for i, command in enumerate(submission.commands):
+                entry = _Entry(command, [(submission, i)])
+                previous = entries[-1] if entries else None
+                merged = merge(previous.command, command) if previous else None
+                if merged:
+                    previous.command = merged
+                    previous.sources += entry.sources
+                    self.counts["merged"] += 1
+                elif previous and supersedes(command, previous.command):
+                    entry.sources = previous.sources + entry.sources
+                    entries[-1] = entry
+                    self.counts["superseded"] += 1
+                else:
+                    entries.append(entry)
+
+        # Nothing was sent since an identical state command, so sway is still in that state
+        if entries and self._last and time.perf_counter() - self._last[1] < self.window:
+            if entries[0].command == self._last[0] and _IDEMPOTENT.match(split_criteria(self._last[0])[1]):
+                for submission, i in entries.pop(0).sources:
+                    submission.replies[i] = Reply()
+                self.counts["deduplicated"] += 1
+        return entries
+
+    def _apply(self, entries: List[_Entry], replies: list) -> List[_Entry]:
+        """Hand out the replies, returning the commands that still have to be sent."""
+        for entry, reply in zip(entries, replies):
+            for submission, i in entry.sources:
+                submission.replies[i] = reply
+        if replies:
+            last = entries[len(replies) - 1]
+            self._last = (last.command, time.perf_counter()) if replies[-1].success else None
+        rest = entries[len(replies):]
+        if not rest or not replies:
+            return []
+        # Sway stops at a command it cannot parse: the rest of that submission is not run, unlike the others
+        failed = {submission for submission, _ in entries[len(replies) - 1].sources if not submission.resend}
+        rest = [entry for entry in rest if not any(submission in failed for submission, _ in entry.sources)]
+        self.counts["resent"] += len(rest)
+        return rest
+
+    def _message(self, connection, entries: List[_Entry]) -> list:
+        with tracer.span("ipc", commands=len(entries)) as span:
+            replies = connection.command("; ".join(entry.command for entry in entries))
+            span["failures"] = sum(1 for reply in replies if not reply.success) + len(entries) - len(replies)
+        self._sent(entries)
+        return replies
+
+    async def _amessage(self, connection, entries: List[_Entry]) -> list:
+        with tracer.span("ipc", commands=len(entries)) as span:
+            replies = await connection.command("; ".join(entry.command for entry in entries))
+            span["failures"] = sum(1 for reply in replies if not reply.success) + len(entries) - len(replies)
+        self._sent(entries)
+        return replies
+
+    def _sent(self, entries: List[_Entry]):
+        self.counts["ipc_messages"] += 1
+        self.counts["commands_out"] += len(entries)
+
+    def summary(self) -> Dict[str, Any]:
+        depths = self.depths or [0]
+        return {
+            **dict(self.counts),
+            "max_queue_depth": max(depths),
+            "mean_queue_depth": round(sum(depths) / len(depths), 3),
+            "coalesced": self.counts["merged"] + self.counts["superseded"] + self.counts["deduplicated"],
+        }
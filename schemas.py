@@ -0,0 +1,268 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Typed argument schemas for the tools in full_tools. In the "typed" tool mode
+# the model fills these in directly instead of reading the docstring first, so
+# a request needs a single tool call. Each schema knows how to turn itself
+# back into the sway command.
+from typing import Any, Dict, Literal, Optional, Type
+
+from pydantic import BaseModel, ConfigDict, Field
+
+Direction = Literal["left", "right", "up", "down"]
+State = Literal["enable", "disable", "toggle"]
+Unit = Literal["px", "ppt"]
+
+
+class ToolSchema(BaseModel):
+    # langchain-ollama parses tool arguments that look like JSON, so workspace "3" arrives as 3
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    def command(self) -> str:
+        raise NotImplementedError
+
+
+class WindowSchema(ToolSchema):
+    window: Optional[str] = Field(None, description="Name of the window to act on, e.g. 'the browser'; "
+                                                    "omit for the focused window")
+
+
+class NoArguments(ToolSchema):
+    def command(self) -> str:
+        return ""
+
+
+class BorderArgs(WindowSchema):
+    style: Literal["none", "normal", "csd", "pixel", "toggle"]
+    thickness: Optional[int] = Field(None, description="Border thickness in pixels, for normal or pixel")
+
+    def command(self) -> str:
+        if self.thickness is not None and self.style in ("normal", "pixel"):
+            return f"border {self.style} {self.thickness}"
+        return f"border {self.style}"
+
+
+class FloatingArgs(WindowSchema):
+    state: State
+
+    def command(self) -> str:
+        return f"floating {self.state}"
+
+
+class FocusArgs(WindowSchema):
+    target: Optional[Literal["left", "right", "up", "down", "prev", "next", "child", "parent",
+                             "tiling", "floating", "mode_toggle", "output"]] = Field(
+        None, description="Omit to focus the window given by window")
+    sibling: bool = Field(False, description="With prev/next, do not descend into the focused container")
+    output: Optional[str] = Field(None, description="With target=output: a direction or an output name")
+
+    def command(self) -> str:
+        if self.target is None:
+            return "focus"
+        if self.target == "output":
+            return f"focus output {self.output or 'right'}"
+        if self.sibling and self.target in ("prev", "next"):
+            return f"focus {self.target} sibling"
+        return f"focus {self.target}"
+
+
+class FullscreenArgs(WindowSchema):
+    state: State = "toggle"
+    all_outputs: bool = Field(False, description="Fullscreen across all outputs")
+
+    def command(self) -> str:
+        return f"fullscreen {self.state}" + (" global" if self.all_outputs else "")
+
+
+class GapsArgs(ToolSchema):
+    side: Literal["inner", "outer", "horizontal", "vertical", "top", "right", "bottom", "left"]
+    scope: Literal["all", "current"] = "current"
+    operation: Literal["set", "plus", "minus", "toggle"] = "set"
+    amount: int
+
+    def command(self) -> str:
+        return f"gaps {self.side} {self.scope} {self.operation} {self.amount}"
+
+
+class InhibitIdleArgs(WindowSchema):
+    mode: Literal["focus", "fullscreen", "open", "none", "visible"]
+
+    def command(self) -> str:
+        return f"inhibit_idle {self.mode}"
+
+
+class LayoutArgs(ToolSchema):
+    mode: Literal["default", "splith", "splitv", "stacking", "tabbed",
+                  "toggle", "toggle split", "toggle all"]
+
+    def command(self) -> str:
+        return f"layout {self.mode}"
+
+
+class MaxRenderTimeArgs(WindowSchema):
+    msec: Optional[int] = Field(None, description="Milliseconds before compositing; omit to turn off")
+
+    def command(self) -> str:
+        return f"max_render_time {self.msec if self.msec else 'off'}"
+
+
+class AllowTearingArgs(WindowSchema):
+    allow: bool
+
+    def command(self) -> str:
+        return f"allow_tearing {'yes' if self.allow else 'no'}"
+
+
+class MoveArgs(WindowSchema):
+    action: Literal["direction", "position", "center", "cursor", "workspace",
+                    "output", "scratchpad", "mark"]
+    direction: Optional[Direction] = Field(None, description="For action=direction, or an output direction")
+    amount: Optional[int] = Field(None, description="Pixels to move a floating window by")
+    x: Optional[int] = None
+    y: Optional[int] = None
+    unit: Unit = "px"
+    workspace: Optional[str] = Field(None, description="Number, name, prev, next or back_and_forth")
+    output: Optional[str] = Field(None, description="Output name, or use direction")
+    mark: Optional[str] = None
+    whole_workspace: bool = Field(False, description="Move the focused workspace instead of the window")
+
+    def command(self) -> str:
+        if self.action == "direction":
+            amount = f" {self.amount} px" if self.amount else ""
+            return f"move {self.direction or 'left'}{amount}"
+        if self.action == "position":
+            return f"move position {self.x or 0} {self.unit} {self.y or 0} {self.unit}"
+        if self.action == "center":
+            return "move position center"
+        if self.action == "cursor":
+            return "move position cursor"
+        if self.action == "workspace":
+            workspace = self.workspace or "next"
+            if workspace.isdigit():
+                workspace = f"number {workspace}"
+            return f"move container to workspace {workspace}"
+        if self.action == "output":
+            what = "workspace" if self.whole_workspace else "container"
+            return f"move {what} to output {self.output or self.direction or 'right'}"
+        if self.action == "mark":
+            return f"move container to mark {self.mark}"
+        return "move scratchpad"
+
+
+class RenameArgs(ToolSchema):
+    new_name: str
+    old_name: Optional[str] = Field(None, description="Workspace to rename; the focused one if omitted")
+
+    def command(self) -> str:
+        old_name = f" {self.old_name}" if self.old_name else ""
+        return f"rename workspace{old_name} to {self.new_name}"
+
+
+class ResizeArgs(WindowSchema):
+    action: Literal["grow", "shrink", "set"]
+    dimension: Literal["width", "height"] = Field("width", description="For grow/shrink")
+    amount: int = Field(10, description="For grow/shrink")
+    width: Optional[int] = Field(None, description="For set")
+    height: Optional[int] = Field(None, description="For set")
+    unit: Optional[Unit] = None
+
+    def command(self) -> str:
+        unit = f" {self.unit}" if self.unit else ""
+        if self.action != "set":
+            return f"resize {self.action} {self.dimension} {self.amount}{unit}"
+        parts = []
+        if self.width is not None:
+            parts.append(f"width {self.width}{unit}")
+        if self.height is not None:
+            parts.append(f"height {self.height}{unit}")
+        return "resize set " + " ".join(parts or [f"width 0{unit}"])
+
+
+class ShortcutsInhibitorArgs(WindowSchema):
+    state: Literal["enable", "disable"]
+
+    def command(self) -> str:
+        return f"shortcuts_inhibitor {self.state}"
+
+
+class SplitArgs(ToolSchema):
+    direction: Literal["vertical", "horizontal", "none", "toggle"]
+
+    def command(self) -> str:
+        return f"split {self.direction}"
+
+
+class StickyArgs(WindowSchema):
+    state: State
+
+    def command(self) -> str:
+        return f"sticky {self.state}"
+
+
+class SwapArgs(WindowSchema):
+    by: Literal["id", "con_id", "mark"]
+    target: str
+
+    def command(self) -> str:
+        return f"swap container with {self.by} {self.target}"
+
+
+class TitleFormatArgs(WindowSchema):
+    format: str = Field(description="Format using %title, %app_id, %class, %instance, %shell")
+
+    def command(self) -> str:
+        return f"title_format {self.format}"
+
+
+TOOL_SCHEMAS: Dict[str, Type[ToolSchema]] = {
+    "focus": FocusArgs,
+    "move": MoveArgs,
+    "fullscreen": FullscreenArgs,
+    "exit": NoArguments,
+    "reload": NoArguments,
+    "split": SplitArgs,
+    "floating": FloatingArgs,
+    "layout": LayoutArgs,
+    "border": BorderArgs,
+    "gaps": GapsArgs,
+    "inhibit_idle": InhibitIdleArgs,
+    "max_render_time": MaxRenderTimeArgs,
+    "allow_tearing": AllowTearingArgs,
+    "rename": RenameArgs,
+    "resize": ResizeArgs,
+    "scratchpad": NoArguments,
+    "shortcuts_inhibitor": ShortcutsInhibitorArgs,
+    "sticky": StickyArgs,
+    "swap": SwapArgs,
+    "title_format": TitleFormatArgs,
+}
+
+
+def _terse(node: Any) -> Any:
+    if isinstance(node, list):
+        return [_terse(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+    options = node.get("anyOf")
+    if options and {"type": "null"} in options and len(options) == 2 and node.get("default", 0) is None:
+        # Optional[X] = None: leaving the property out already means None
+        node = {**next(option for option in options if option != {"type": "null"}),
+                **{k: v for k, v in node.items() if k not in ("anyOf", "default")}}
+    terse = {}
+    for key, value in node.items():
+        if key in ("title", "description"):
+            continue
+        if key in ("properties", "$defs"):
+            terse[key] = {name: _terse(child) for name, child in value.items()}
+        else:
+            terse[key] = _terse(value)
+    return terse
+
+
+def terse_schema(schema: Type[ToolSchema]) -> Dict[str, Any]:
+    """The JSON schema of schema without titles, descriptions and null alternatives.
+
+    The model is sent every bound tool's schema with every request, so this
+    trades the hints in the descriptions for prompt tokens; the arguments are
+    still validated with schema itself.
+    """
+    return _terse(schema.model_json_schema())
@@ -0,0 +1,130 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Speculative work on a request that is still being typed. Whenever typing
+# pauses, the cheap stages (fast path, cache lookup, tool selection) run on the
+# partial text, and if the request would need a model, Ollama evaluates the
+# prompt with the partial text in it. When the request is submitted, its
+# prompt starts the same way, so only the rest of it and the answer remain,
+# and if the whole text was speculated on, the calls found for it without a
+# model are handed over. Work on text that has since changed is cancelled.
+import asyncio
+import threading
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from tracing import percentile
+
+# The path a request takes without a model, such as "fastpath" or "cache", and the tool calls it runs there
+Resolved = Tuple[str, List[Any]]
+
+
+class Speculator:
+    """Runs stages(text) and then, if it returned None, prefill(text) on every pause in typing.
+
+    stages returns the path a request would take without a model, such as
+    "fastpath" or "cache", with the tool calls it runs there. It runs in a
+    worker thread, so it does not hold up loop, on which prefill runs; loop
+    is started in a thread of its own if not given. update() may be called
+    from any thread.
+    """
+
+    def __init__(self, stages: Callable[[str], Optional[Resolved]], prefill: Callable[[str], Awaitable[Any]],
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.stages = stages
+        self.prefill = prefill
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="swaytalk-speculation", daemon=True).start()
+        self.loop = loop
+        self.text = ""
+        # Whether update() was called since the last submit
+        self.typing = False
+        self.task: Optional[asyncio.Task] = None
+        # Partial texts whose stages or prefill finished, since the last submit
+        self.ready: Dict[str, Optional[Resolved]] = {}
+        self.counts = Counter()
+        self.seconds: List[float] = []
+        self.lock = threading.Lock()
+
+    def update(self, text: str):
+        """Speculate on the text typed so far, cancelling the work on the text before it."""
+        text = text.strip()
+        with self.lock:
+            if not text or text == self.text:
+                return
+            self.text = text
+            self.typing = True
+            self.counts["pauses"] += 1
+        self.loop.call_soon_threadsafe(self._start, text)
+
+    def _cancel(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            self.counts["cancelled"] += 1
+        self.task = None
+
+    def _start(self, text: str):
+        self._cancel()
+        self.task = self.loop.create_task(self._speculate(text))
+
+    async def _speculate(self, text: str):
+        start = time.perf_counter()
+        try:
+            resolved = await asyncio.to_thread(self.stages, text)
+            if resolved is None:
+                await self.prefill(text)
+                self.counts["prefilled"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.counts["errors"] += 1
+            print(f"Speculation on '{text}' failed: {str(e)}")
+            return
+        with self.lock:
+            if text != self.text:
+                # Submitted or typed over while finishing
+                return
+            self.ready[text] = resolved
+            self.seconds.append(time.perf_counter() - start)
+
+    def finish(self, text: str) -> Tuple[str, Optional[Resolved]]:
+        """Stop speculating and return how much of the work applies to the submitted text, and what it resolved.
+
+        The outcome is "hit" if the work was done for the whole text,
+        "partial" if a prefill was done for text it starts with,
+        "unspeculated" if nothing was typed since the last submit (the text
+        came from fuzzel or the command line), otherwise "miss". On a hit,
+        the path and calls stages() found for the text are returned with it,
+        so the request need not look them up again.
+        """
+        text = text.strip()
+        self.loop.call_soon_threadsafe(self._cancel)
+        with self.lock:
+            ready, self.ready, self.text = self.ready, {}, ""
+            typing, self.typing = self.typing, False
+        if not typing:
+            outcome = "unspeculated"
+        elif text in ready:
+            outcome = "hit"
+        elif any(ready[partial] is None and text.startswith(partial) for partial in ready):
+            outcome = "partial"
+        else:
+            outcome = "miss"
+        resolved = ready[text] if outcome == "hit" else None
+        self.counts[outcome] += 1
+        if resolved is not None:
+            self.counts["resolved"] += 1
+        return outcome, resolved
+
+    def summary(self) -> Dict[str, Any]:
+        submitted = self.counts["hit"] + self.counts["partial"] + self.counts["miss"]
+        with self.lock:
+            seconds = list(self.seconds)
+        return {
+            **dict(self.counts),
+            "hit_rate": round(self.counts["hit"] / submitted, 4) if submitted else 0.0,
+            "partial_rate": round(self.counts["partial"] / submitted, 4) if submitted else 0.0,
+            "p50_seconds": round(percentile(seconds, 50), 4),
+            "p95_seconds": round(percentile(seconds, 95), 4),
+        }
@@ -0,0 +1,353 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Latency tracing. Spans are recorded for module import, the input dialog,
+# every LLM call and tool call (through LangChain callbacks) and every sway
+# IPC message, and written to a JSONL or Chrome trace file after each request.
+# Run this file on one or more traces to get the p50/p95 of every stage.
+import argparse
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional
+from uuid import UUID
+
+FORMATS = ("jsonl", "chrome")
+# Spans summary() covers, so a long-running daemon does not keep every span it has recorded
+RECENT_SPANS = 10000
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linearly interpolated percentile, q between 0 and 100."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = (len(values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+class Tracer:
+    """Collects timed spans and appends them to a trace file.
+
+    Does nothing until configure() is called, so code can open spans
+    unconditionally. Spans carry the number of the request they belong to
+    and the process id, which tells the runs in one file apart. The current
+    request is kept per asyncio task, so overlapping requests are told apart.
+    Spans are only kept until they are flushed, and the last RECENT_SPANS of
+    them for summary().
+    """
+
+    def __init__(self):
+        self.path: Optional[str] = None
+        self.format = "jsonl"
+        self.enabled = False
+        self.request = 0
+        self._current = contextvars.ContextVar("swaytalk_request", default=0)
+        # Recorded since the last flush
+        self.spans: List[Dict[str, Any]] = []
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=RECENT_SPANS)
+        self.lock = threading.Lock()
+        self._appendable = False
+        # perf_counter() is only meaningful relative to itself, this turns it into wall clock time
+        self._epoch = time.time() - time.perf_counter()
+
+    def configure(self, path: str, format: str = "jsonl"):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown trace format '{format}', use one of {', '.join(FORMATS)}")
+        self.path = path
+        self.format = format
+        self.enabled = True
+
+    def begin_request(self) -> int:
+        self.request += 1
+        self._current.set(self.request)
+        return self.request
+
+    def add(self, name: str, start: float, end: float, **attrs: Any):
+        """Record a span from two perf_counter() readings."""
+        if not self.enabled:
+            return
+        span = {
+            "name": name,
+            "start": self._epoch + start,
+            "seconds": end - start,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "request": self._current.get(),
+        }
+        if attrs:
+            span["attrs"] = attrs
+        with self.lock:
+            self.spans.append(span)
+            self.recent.append(span)
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+        """Time the block. The yielded dict can be filled with more attributes."""
+        if not self.enabled:
+            yield attrs
+            return
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except Exception as e:
+            attrs["error"] = str(e) or type(e).__name__
+            raise
+        finally:
+            self.add(name, start, time.perf_counter(), **attrs)
+
+    def flush(self):
+        """Write the spans recorded since the last flush."""
+        if not self.enabled or not self.path:
+            return
+        with self.lock:
+            spans, self.spans = self.spans, []
+        if not spans:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.format == "jsonl":
+            with open(self.path, "a", encoding="utf-8") as f:
+                for span in spans:
+                    f.write(json.dumps(span) + "\n")
+            return
+        # The JSON array form of a Chrome trace may leave out the closing ']', so
+        # events are appended; a trace in the object form is converted once
+        if not self._appendable:
+            if os.path.exists(self.path) and os.path.getsize(self.path) and not _is_array(self.path):
+                events = read_chrome(self.path)
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write("[\n" + "".join(json.dumps(event) + ",\n" for event in events))
+                os.replace(tmp_path, self.path)
+            self._appendable = True
+        with open(self.path, "a", encoding="utf-8") as f:
+            if f.tell() == 0:
+                f.write("[\n")
+            for span in spans:
+                f.write(json.dumps(chrome_event(span)) + ",\n")
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self.lock:
+            return summarize(list(self.recent))
+
+
+def chrome_event(span: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a span into a complete ('X') event of the Chrome trace event format."""
+    args = dict(span.get("attrs", {}))
+    args["request"] = span["request"]
+    return {
+        "name": span["name"],
+        "cat": span["name"].split(":", 1)[0],
+        "ph": "X",
+        "ts": span["start"] * 1e6,
+        "dur": span["seconds"] * 1e6,
+        "pid": span["pid"],
+        "tid": span["tid"],
+        "args": args,
+    }
+
+
+def _is_array(path: str) -> bool:
+    with open(path, encoding="utf-8") as f:
+        return f.read(64).lstrip().startswith("[")
+
+
+def _load_chrome(text: str) -> Any:
+    """Parse a Chrome trace, including an array whose closing ']' was left out."""
+    text = text.strip()
+    if text.startswith("[") and not text.endswith("]"):
+        text = text.rstrip(",") + "]"
+    return json.loads(text)
+
+
+def read_chrome(path: str) -> List[Dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = _load_chrome(f.read())
+    except (OSError, ValueError):
+        return []
+    return data.get("traceEvents", []) if isinstance(data, dict) else data
+
+
+def read_spans(path: str) -> List[Dict[str, Any]]:
+    """Read the spans of a trace file in either format."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    try:
+        data = _load_chrome(text)
+    except ValueError:
+        # More than one JSON document, so this is JSONL
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(data, dict) and "traceEvents" not in data:
+        # JSONL with a single span
+        return [data]
+    events = data.get("traceEvents", []) if isinstance(data, dict) else data
+    spans = []
+    for event in events:
+        if event.get("ph") != "X":
+            continue
+        attrs = dict(event.get("args", {}))
+        spans.append({
+            "name": event["name"],
+            "start": event["ts"] / 1e6,
+            "seconds": event["dur"] / 1e6,
+            "pid": event.get("pid"),
+            "tid": event.get("tid"),
+            "request": attrs.pop("request", 0),
+            "attrs": attrs,
+        })
+    return spans
+
+
+def summarize(spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Count, p50 and p95 in milliseconds of every stage.
+
+    LLM calls also get 'llm.ttft', 'llm.load' and 'llm.prefill' stages for
+    the time to the first token, to load the model and to evaluate the
+    prompt, and the mean number of prompt tokens.
+    """
+    seconds: Dict[str, List[float]] = {}
+    prompt_tokens: Dict[str, List[int]] = {}
+    for span in spans:
+        seconds.setdefault(span["name"], []).append(span["seconds"])
+        attrs = span.get("attrs", {})
+        for stage in ("ttft", "load", "prefill"):
+            if attrs.get(stage) is not None:
+                seconds.setdefault(f"{span['name']}.{stage}", []).append(attrs[stage])
+        if attrs.get("prompt_tokens") is not None:
+            prompt_tokens.setdefault(span["name"], []).append(attrs["prompt_tokens"])
+
+    summary = {}
+    for name in sorted(seconds):
+        values = seconds[name]
+        summary[name] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+        }
+        if name in prompt_tokens:
+            summary[name]["mean_prompt_tokens"] = round(sum(prompt_tokens[name]) / len(prompt_tokens[name]), 1)
+    return summary
+
+
+# The tracer used by the whole program
+tracer = Tracer()
+
+
+def callback_handler(tracer: Tracer = tracer):
+    """Return a LangChain callback handler that records LLM and tool spans.
+
+    LangChain is imported here so that summarizing traces does not need it.
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class TracingCallbackHandler(BaseCallbackHandler):
+        """Records every chat model call (prompt tokens, first token, load, prefill and total time) and tool call."""
+
+        # Called on the event loop rather than in a thread by ainvoke, so the times are not delayed
+        run_inline = True
+
+        def __init__(self):
+            self.runs: Dict[UUID, Dict[str, Any]] = {}
+
+        def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id: UUID, **kwargs: Any):
+            params = kwargs.get("invocation_params") or {}
+            model = (params.get("model") or (kwargs.get("metadata") or {}).get("ls_model_name")
+                     or (serialized or {}).get("kwargs", {}).get("model"))
+            self.runs[run_id] = {"start": time.perf_counter(), "model": model,
+                                 "messages": sum(len(batch) for batch in messages)}
+
+        def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any):
+            run = self.runs.get(run_id)
+            if run is not None and "first_token" not in run:
+                run["first_token"] = time.perf_counter()
+
+        def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any):
+            run = self.runs.pop(run_id, None)
+            if run is None:
+                return
+            end = time.perf_counter()
+            attrs = {"model": run["model"], "messages": run["messages"]}
+            usage = None
+            if response.generations and response.generations[0]:
+                info = response.generations[0][0].generation_info or {}
+                # Ollama's durations are in nanoseconds
+                if info.get("load_duration") is not None:
+                    attrs["load"] = info["load_duration"] / 1e9
+                if info.get("prompt_eval_duration") is not None:
+                    attrs["prefill"] = info["prompt_eval_duration"] / 1e9
+                message = getattr(response.generations[0][0], "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                tool_calls = getattr(message, "tool_calls", None)
+                if tool_calls is not None:
+                    attrs["tool_calls"] = len(tool_calls)
+            if usage:
+                attrs["prompt_tokens"] = usage.get("input_tokens")
+                attrs["completion_tokens"] = usage.get("output_tokens")
+            if "first_token" in run:
+                attrs["ttft"] = run["first_token"] - run["start"]
+            tracer.add("llm", run["start"], end, **attrs)
+
+        def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+            run = self.runs.pop(run_id, None)
+            if run is None:
+                return
+            if isinstance(error, GeneratorExit):
+                # The caller stopped reading the stream once it had what it needed
+                attrs = {"model": run["model"], "messages": run["messages"], "abandoned": True}
+                if "first_token" in run:
+                    attrs["ttft"] = run["first_token"] - run["start"]
+                tracer.add("llm", run["start"], time.perf_counter(), **attrs)
+            else:
+                tracer.add("llm", run["start"], time.perf_counter(), model=run["model"], error=str(error))
+
+        def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any):
+            name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+            self.runs[run_id] = {"start": time.perf_counter(), "name": name}
+
+        def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any):
+            run = self.runs.pop(run_id, None)
+            if run is not None:
+                tracer.add(f"tool:{run['name']}", run["start"], time.perf_counter())
+
+        def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+            run = self.runs.pop(run_id, None)
+            if run is not None:
+                tracer.add(f"tool:{run['name']}", run["start"], time.perf_counter(), error=str(error))
+
+    return TracingCallbackHandler()
+
+
+def print_summary(summary: Dict[str, Dict[str, float]]):
+    width = max([len(name) for name in summary] + [5])
+    print(f"{'stage':<{width}}  {'count':>6}  {'p50 ms':>10}  {'p95 ms':>10}")
+    for name, row in summary.items():
+        extra = f"  ({row['mean_prompt_tokens']} prompt tokens)" if "mean_prompt_tokens" in row else ""
+        print(f"{name:<{width}}  {row['count']:>6}  {row['p50_ms']:>10.2f}  {row['p95_ms']:>10.2f}{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize SwayTalk latency traces.")
+    parser.add_argument("traces", nargs="+", help="Trace files written with main.py --trace.")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+    args = parser.parse_args()
+
+    spans = []
+    for path in args.traces:
+        spans.extend(read_spans(path))
+    summary = summarize(spans)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Keeps a small copy of the sway tree up to date from window, workspace and
+# output events, so the agent can be told what is on screen without calling
+# get_tree() while a request is being handled.
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Union
+
+from i3ipc import Connection, Event, aio
+
+# Rough number of characters per token, used to keep the summary within budget
+CHARS_PER_TOKEN = 4
+TITLE_LENGTH = 40
+
+
+@dataclass
+class Window:
+    id: int
+    app_id: Optional[str] = None
+    window_class: Optional[str] = None
+    instance: Optional[str] = None
+    title: Optional[str] = None
+    marks: List[str] = field(default_factory=list)
+    workspace: Optional[str] = None
+    floating: bool = False
+    last_focus: float = 0.0
+
+    @property
+    def app(self) -> str:
+        return self.app_id or self.window_class or self.instance or "window"
+
+    def describe(self) -> str:
+        title = (self.title or "")[:TITLE_LENGTH]
+        extra = " floating" if self.floating else ""
+        marks = f" marks={','.join(self.marks)}" if self.marks else ""
+        return f'{self.app} "{title}" (con_id={self.id}{extra}{marks})'
+
+
+@dataclass
+class Workspace:
+    name: str
+    output: Optional[str] = None
+    visible: bool = False
+    focused: bool = False
+
+
+def _window_from_con(con, workspace: Optional[str]) -> Window:
+    return Window(
+        id=con.id,
+        app_id=con.app_id,
+        window_class=con.window_class,
+        instance=con.window_instance,
+        title=con.name,
+        marks=list(con.marks or []),
+        workspace=workspace,
+        floating=con.type == "floating_con" or con.floating in ("user_on", "auto_on"),
+    )
+
+
+class TreeMirror:
+    """In-memory copy of the windows and workspaces, updated from sway events.
+
+    Events that carry enough information (new, close, focus, title, mark,
+    floating, workspace focus) are applied directly. The others mark the
+    mirror as stale and a background thread takes a fresh snapshot.
+    With an i3ipc.aio connection, astart() does the same on the event loop.
+    """
+
+    def __init__(self, connection: Union[Connection, aio.Connection]):
+        self.connection = connection
+        self.windows: Dict[int, Window] = {}
+        self.workspaces: Dict[str, Workspace] = {}
+        self.focused_id: Optional[int] = None
+        self.version = 0
+        self.lock = threading.Lock()
+        self._stale = threading.Event()
+
+    def start(self):
+        """Take the initial snapshot and start following events in the background."""
+        self.refresh()
+        self.connection.on(Event.WINDOW, self._on_window)
+        self.connection.on(Event.WORKSPACE, self._on_workspace)
+        self.connection.on(Event.OUTPUT, self._on_output)
+        threading.Thread(target=self.connection.main, name="swaytalk-events", daemon=True).start()
+        threading.Thread(target=self._refresh_loop, name="swaytalk-refresh", daemon=True).start()
+
+    async def astart(self):
+        """start() for an i3ipc.aio connection: events are applied on the running event loop."""
+        await self.arefresh()
+        self._stale = asyncio.Event()
+        self.connection.on(Event.WINDOW, self._on_window)
+        self.connection.on(Event.WORKSPACE, self._on_workspace)
+        self.connection.on(Event.OUTPUT, self._on_output)
+        self._refresh_task = asyncio.ensure_future(self._arefresh_loop())
+
+    def refresh(self):
+        """Replace the mirror with a full snapshot of the tree."""
+        self._replace(self.connection.get_tree(), self.connection.get_workspaces())
+
+    async def arefresh(self):
+        self._replace(await self.connection.get_tree(), await self.connection.get_workspaces())
+
+    def _replace(self, root, workspace_replies):
+        workspaces = {
+            reply.name: Workspace(reply.name, reply.output, reply.visible, reply.focused)
+            for reply in workspace_replies
+        }
+        windows = {}
+        focused_id = None
+        for con in root.leaves():
+            workspace = con.workspace()
+            window = _window_from_con(con, workspace.name if workspace else None)
+            windows[con.id] = window
+            if con.focused:
+                focused_id = con.id
+        with self.lock:
+            # Keep focus history across snapshots, it is what ranks windows by recency
+            for window_id, window in windows.items():
+                if window_id in self.windows:
+                    window.last_focus = self.windows[window_id].last_focus
+            if focused_id is not None and focused_id in windows:
+                windows[focused_id].last_focus = max(windows[focused_id].last_focus, time.monotonic())
+            self.windows = windows
+            self.workspaces = workspaces
+            self.focused_id = focused_id
+            self.version += 1
+
+    def _refresh_loop(self):
+        while True:
+            self._stale.wait()
+            # Let bursts of events settle before taking the snapshot
+            time.sleep(0.05)
+            self._stale.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Could not refresh the sway tree: {str(e)}")
+
+    async def _arefresh_loop(self):
+        while True:
+            await self._stale.wait()
+            await asyncio.sleep(0.05)
+            self._stale.clear()
+            try:
+                await self.arefresh()
+            except Exception as e:
+                print(f"Could not refresh the sway tree: {str(e)}")
+
+    def _focused_workspace(self) -> Optional[str]:
+        for workspace in self.workspaces.values():
+            if workspace.focused:
+                return workspace.name
+        return None
+
+    def _on_window(self, connection: Connection, event):
+        con = event.container
+        with self.lock:
+            window = self.windows.get(con.id)
+            if event.change == "close":
+                self.windows.pop(con.id, None)
+                if self.focused_id == con.id:
+                    self.focused_id = None
+            elif event.change == "move" or (window is None and event.change != "new"):
+                # The event does not say where the window went
+                self._stale.set()
+            elif event.change == "new":
+                self.windows[con.id] = _window_from_con(con, self._focused_workspace())
+            elif event.change == "focus":
+                self.focused_id = con.id
+                window.last_focus = time.monotonic()
+            elif event.change == "title":
+                window.title = con.name
+                window.app_id = con.app_id or window.app_id
+            elif event.change == "mark":
+                window.marks = list(con.marks or [])
+            elif event.change == "floating":
+                window.floating = con.type == "floating_con" or con.floating in ("user_on", "auto_on")
+            self.version += 1
+
+    def _on_workspace(self, connection: Connection, event):
+        with self.lock:
+            if event.change == "focus" and event.current is not None:
+                for workspace in self.workspaces.values():
+                    workspace.focused = False
+                current = self.workspaces.setdefault(event.current.name, Workspace(event.current.name))
+                current.focused = current.visible = True
+                if event.old is not None and event.old.name in self.workspaces:
+                    old = self.workspaces[event.old.name]
+                    # Still visible when the old workspace is on another output
+                    old.visible = old.output is not None and old.output != current.output
+            elif event.change == "init" and event.current is not None:
+                self.workspaces.setdefault(event.current.name, Workspace(event.current.name))
+            elif event.change == "empty" and event.current is not None:
+                self.workspaces.pop(event.current.name, None)
+            else:
+                self._stale.set()
+            self.version += 1
+
+    def _on_output(self, connection: Connection, event):
+        self._stale.set()
+
+    def summary(self, max_tokens: int = 200) -> str:
+        """Describe the focused window, the workspaces and the windows on them, within max_tokens."""
+        with self.lock:
+            focused = self.windows.get(self.focused_id) if self.focused_id is not None else None
+            workspaces = sorted(self.workspaces.values(), key=lambda w: (not w.focused, not w.visible, w.name))
+            windows = sorted(self.windows.values(), key=lambda w: -w.last_focus)
+
+            visible = {w.name for w in workspaces if w.visible}
+            lines = []
+            if focused is not None:
+                lines.append(f"Focused: {focused.describe()} on workspace {focused.workspace}")
+            lines.append("Workspaces: " + ", ".join(
+                w.name + (" (focused)" if w.focused else " (visible)" if w.visible else "")
+                for w in workspaces
+            ))
+            lines.append("Visible windows:")
+            lines.extend(f"- {w.describe()} on {w.workspace}" for w in windows
+                         if w.workspace in visible and w is not focused)
+            lines.append("Other windows:")
+            lines.extend(f"- {w.describe()} on {w.workspace}" for w in windows
+                         if w.workspace not in visible and w is not focused)
+
+        budget = max_tokens * CHARS_PER_TOKEN
+        kept = []
+        for line in lines:
+            if budget - len(line) - 1 < 0:
+                break
+            budget -= len(line) + 1
+            kept.append(line)
+        # Drop headings that ended up without any windows under them
+        return "\n".join(line for i, line in enumerate(kept)
+                         if not line.endswith(":") or (i + 1 < len(kept) and kept[i + 1].startswith("- ")))
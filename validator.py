@@ -0,0 +1,118 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Checks every command against its tool's grammar before it is sent to sway.
+# Common mistakes (a missing or glued keyword, quotes around the whole
+# command, glued units, "on" instead of "enable", keywords in the wrong case)
+# are repaired, leaving names as they were written; commands that cannot be
+# repaired are rejected with a message saying where they went wrong, so the
+# model gets a precise error without a round-trip to sway.
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from fastpath import as_typed, normalize as normalize_words, rewrite
+from grammar import Grammar, split_criteria, split_words
+
+# Word replacements tried when a command does not match as written
+SYNONYMS = {
+    "on": "enable", "off": "disable", "true": "enable", "false": "disable",
+    "enabled": "enable", "disabled": "disable", "switch": "toggle",
+    "vertically": "vertical", "horizontally": "horizontal",
+    "tabs": "tabbed", "tab": "tabbed", "stacked": "stacking", "stack": "stacking",
+    "pixels": "px", "pixel": "px", "percent": "ppt", "%": "ppt",
+    "ws": "workspace", "monitor": "output", "screen": "output",
+}
+
+_QUOTES = "\"'`"
+_GLUED_UNIT = re.compile(r"(-?\d+)(px|ppt|%)(?=\s|$)")
+
+
+def unquote(text: str) -> str:
+    """Drop quotes around the whole of text, but not quotes around a part of it."""
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in _QUOTES and text[0] not in text[1:-1]:
+        return text[1:-1].strip()
+    return text
+
+
+def _keyword(word: str, keywords: Set[str]) -> str:
+    lowered = word.lower()
+    for candidate in (lowered, SYNONYMS.get(lowered, lowered)):
+        if candidate in keywords:
+            return candidate
+    return word
+
+
+class Validator:
+    """Repairs or rejects commands using the grammars from the tool docstrings.
+
+    Results are memoized, so a command is only checked once. With verbose,
+    every repair is printed.
+    """
+
+    def __init__(self, grammars: Dict[str, Grammar], verbose: bool = False):
+        self.grammars = grammars
+        self.verbose = verbose
+        self.counts = Counter()
+        self._cached = lru_cache(maxsize=1024)(self._repair)
+
+    def _candidates(self, tool_name: str, command: str) -> Iterator[str]:
+        command = unquote(command.strip()).rstrip(".;,").strip()
+        if command.startswith("swaymsg "):
+            command = unquote(command[len("swaymsg "):].strip())
+        first, _, rest = command.partition(" ")
+        if first != tool_name:
+            # "tabbed" and "layouttabbed" both mean "layout tabbed", "Focus left" is "focus left"
+            rest = command[len(tool_name):] if first.lower().startswith(tool_name) else command
+            command = f"{tool_name} {rest.strip()}".strip()
+        yield command
+
+        command = _GLUED_UNIT.sub(lambda m: f"{m.group(1)} {'ppt' if m.group(2) == '%' else m.group(2)}", command)
+        yield command
+        # Case and synonyms are only fixed in keywords, names are sent as written
+        keywords = self.grammars[tool_name].keywords
+        words = split_words(command)
+        yield " ".join(word.lower() if word.lower() in keywords else word for word in words)
+        yield " ".join(_keyword(word, keywords) for word in words)
+        # The same rewrites the fast path applies to natural language, with the names put back
+        rewritten = rewrite(normalize_words(command))
+        roles = self.grammars[tool_name].roles(rewritten)
+        if roles is not None:
+            rewritten = as_typed(command, rewritten, roles)
+            if rewritten is not None:
+                yield rewritten
+        if command == tool_name:
+            yield f"{tool_name} toggle"
+
+    def _repair(self, tool_name: str, arguments: str, bare: bool) -> Tuple[Optional[str], Optional[str]]:
+        tool_grammar = self.grammars[tool_name]
+        if not tool_grammar.takes_arguments:
+            return "", None
+        criteria, command = split_criteria(arguments)
+        original = " ".join(command.split())
+        if bare and original in ("", tool_name):
+            return f"{criteria} {tool_name}".strip(), None
+
+        seen = set()
+        for candidate in self._candidates(tool_name, command):
+            if candidate not in seen and tool_grammar.matches(candidate):
+                return f"{criteria} {candidate}".strip(), None
+            seen.add(candidate)
+        keyword = original if original.startswith(tool_name) else f"{tool_name} {original}".strip()
+        return None, tool_grammar.explain(keyword)
+
+    def check(self, tool_name: str, arguments: str, bare: bool = False) -> Tuple[Optional[str], Optional[str]]:
+        """Return the command to send for a tool's arguments, or an error message.
+
+        bare allows the keyword alone, which is valid when criteria pick the window.
+        """
+        command, error = self._cached(tool_name, arguments, bare)
+        if error:
+            self.counts["rejected"] += 1
+        elif command != " ".join(arguments.split()):
+            self.counts["repaired"] += 1
+            if self.verbose:
+                print(f"Repaired '{arguments}' to '{command}'")
+        else:
+            self.counts["valid"] += 1
+        return command, error
@@ -0,0 +1,126 @@
+# SwayTalk - © Sarthak Shah (matchcase), 2025
+# Licensed under GPLv3 or Later.
+# Resolves informal window names ("the browser", "my second terminal", "the
+# spotify one") to sway criteria, using the windows in the TreeMirror.
+import re
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+from tree import TreeMirror, Window
+
+FILLER_WORDS = {"the", "my", "a", "an", "this", "that", "one", "window", "app", "application", "on", "with", "called"}
+
+ORDINALS = {
+    "first": 0, "1st": 0, "second": 1, "2nd": 1, "third": 2, "3rd": 2,
+    "fourth": 3, "4th": 3, "fifth": 4, "5th": 4, "last": -1, "other": 1,
+}
+
+# Generic names and the app ids / classes they usually refer to
+CATEGORIES = {
+    "browser": {"firefox", "chromium", "chrome", "google-chrome", "brave", "brave-browser", "librewolf",
+                "qutebrowser", "epiphany", "vivaldi", "zen", "microsoft-edge"},
+    "terminal": {"foot", "footclient", "alacritty", "kitty", "wezterm", "org.wezfurlong.wezterm",
+                 "gnome-terminal", "org.gnome.terminal", "konsole", "xterm", "urxvt", "st", "terminator",
+                 "ghostty", "com.mitchellh.ghostty"},
+    "editor": {"code", "code-oss", "emacs", "nvim", "gvim", "gedit", "org.gnome.texteditor", "kate", "zed",
+               "dev.zed.zed", "sublime_text", "jetbrains-idea", "jetbrains-pycharm"},
+    "music": {"spotify", "rhythmbox", "lollypop", "elisa", "amberol", "tidal-hifi"},
+    "chat": {"slack", "discord", "vesktop", "telegramdesktop", "org.telegram.desktop", "signal",
+             "element", "teams"},
+    "mail": {"thunderbird", "evolution", "geary", "org.gnome.geary"},
+    "files": {"nautilus", "org.gnome.nautilus", "thunar", "dolphin", "pcmanfm", "nemo"},
+    "video": {"mpv", "vlc", "celluloid", "io.github.celluloid_player.celluloid"},
+}
+SYNONYMS = {
+    "web": "browser", "internet": "browser", "term": "terminal", "shell": "terminal", "console": "terminal",
+    "code": "editor", "spotify": "music", "player": "video", "email": "mail", "file": "files",
+    "manager": "files", "messenger": "chat",
+}
+
+MIN_SCORE = 0.5
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[\w.\-]+", text.lower())
+
+
+class WindowIndex:
+    """Fuzzy lookup of windows by app_id, class, instance, title and marks.
+
+    The searchable fields are rebuilt lazily whenever the mirror changes.
+    Matches are ranked by score, then by how recently they were focused.
+    """
+
+    def __init__(self, mirror: TreeMirror):
+        self.mirror = mirror
+        self._version = -1
+        self._entries: List[Tuple[Window, List[str], List[str]]] = []
+
+    def _refresh(self):
+        if self._version == self.mirror.version:
+            return
+        with self.mirror.lock:
+            windows = list(self.mirror.windows.values())
+            self._version = self.mirror.version
+        entries = []
+        for window in windows:
+            names = [n.lower() for n in (window.app_id, window.window_class, window.instance) if n]
+            names += [mark.lower() for mark in window.marks]
+            entries.append((window, names, _words(window.title or "")))
+        self._entries = entries
+
+    def _score_word(self, word: str, names: List[str], title: List[str]) -> float:
+        category = CATEGORIES.get(SYNONYMS.get(word, word))
+        best = 0.0
+        for name in names:
+            if word == name or word == name.split(".")[-1]:
+                return 1.0
+            if category and name in category:
+                best = max(best, 0.9)
+            elif name.startswith(word) or name.split(".")[-1].startswith(word):
+                best = max(best, 0.8)
+            else:
+                best = max(best, 0.7 * SequenceMatcher(None, word, name).ratio())
+        for title_word in title:
+            if word == title_word:
+                best = max(best, 0.7)
+            elif len(word) >= 3 and title_word.startswith(word):
+                best = max(best, 0.6)
+        return best
+
+    def search(self, phrase: str) -> List[Tuple[float, Window]]:
+        """Return the windows matching a phrase, best match first."""
+        self._refresh()
+        words = [w for w in _words(phrase) if w not in FILLER_WORDS and w not in ORDINALS]
+        if not words:
+            return []
+        matches = []
+        for window, names, title in self._entries:
+            score = sum(self._score_word(word, names, title) for word in words) / len(words)
+            if score >= MIN_SCORE:
+                matches.append((score, window))
+        matches.sort(key=lambda m: (-round(m[0], 2), -m[1].last_focus))
+        return matches
+
+    def lookup(self, phrase: str) -> Optional[Window]:
+        matches = self.search(phrase)
+        if not matches:
+            return None
+        ordinal = next((ORDINALS[w] for w in _words(phrase) if w in ORDINALS), None)
+        if ordinal is None:
+            return matches[0][1]
+        # "my second terminal" counts the equally good matches in the order they were opened
+        best = round(matches[0][0], 2)
+        candidates = sorted((w for s, w in matches if round(s, 2) == best), key=lambda w: w.id)
+        if ordinal >= len(candidates):
+            return None
+        return candidates[ordinal]
+
+    def resolve(self, phrase: str) -> Optional[str]:
+        """Return the '[con_id=...]' criteria of the window a phrase refers to."""
+        window = self.lookup(phrase)
+        return f"[con_id={window.id}]" if window else None
+
+    def names(self) -> Dict[int, str]:
+        self._refresh()
+        return {window.id: window.app for window, _, _ in self._entries}